@@ -1,600 +1,4280 @@
-from flask import Flask, render_template, request, send_file, url_for
-import feedparser
-import pandas as pd
-from datetime import datetime
-import matplotlib
-
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-from io import BytesIO
+from flask import (
+    Flask,
+    Response,
+    before_render_template,
+    g,
+    jsonify,
+    render_template,
+    request,
+    send_file,
+    stream_with_context,
+    template_rendered,
+    url_for,
+)
+from datetime import datetime, timedelta, timezone
+from email.utils import mktime_tz, parsedate_tz
+from io import BytesIO, StringIO
+import calendar
+import contextvars
+import csv
+import gzip
+import hashlib
+import html
+import importlib
+import importlib.util
+import json
+import math
+import multiprocessing
 import os
+import random
+import re
+import signal
+import socket
+import sqlite3
+import sys
+import threading
+import time
 import traceback
+import uuid
+import xml.etree.ElementTree as ET
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from multiprocessing.connection import Connection
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit, urlunsplit
+
+import urllib3
 
 try:
-    from wordcloud import WordCloud, STOPWORDS
+    import fcntl
+except ImportError:  # Windows 沒有 fcntl，重複請求只在同一個行程內合併
+    fcntl = None
+
+# 🔧 延遲匯入的模組實際載入時的耗時（秒），供啟動報告使用
+LAZY_IMPORT_TIMES = OrderedDict()
+
+
+class LazyModule:
+    """
+    第一次存取屬性時才匯入模組
+    matplotlib、wordcloud、snownlp、jieba 等套件匯入很慢，延遲到真正用到的階段，
+    讓 worker 啟動時不必付出這些成本
+    """
+
+    def __init__(self, name, before_import=None, after_import=None):
+        """
+        :param name: 模組名稱（可含子模組，如 matplotlib.pyplot）
+        :param before_import: 匯入前呼叫的函式（如設定 matplotlib 後端）
+        :param after_import: 匯入後以模組為參數呼叫的函式
+        """
+        self._name = name
+        self._before_import = before_import
+        self._after_import = after_import
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    if self._before_import:
+                        self._before_import()
+                    module = importlib.import_module(self._name)
+                    if self._after_import:
+                        self._after_import(module)
+                    LAZY_IMPORT_TIMES[self._name] = time.perf_counter() - started
+                    self._module = module
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def module_available(name):
+    """只檢查模組是否已安裝，不實際匯入"""
+    return importlib.util.find_spec(name) is not None
+
+
+# RSS 以 parse_feed() 的串流解析器處理，只有格式有問題的 feed 才交給 feedparser
+feedparser = LazyModule("feedparser")
+
+# 批次情感分析以 NumPy 陣列計算（pandas 與 matplotlib 也依賴 numpy）
+numpy = LazyModule("numpy")
+
+# 必須在匯入 pyplot 之前切換成不需要顯示器的 Agg 後端
+plt = LazyModule(
+    "matplotlib.pyplot",
+    before_import=lambda: importlib.import_module("matplotlib").use("Agg"),
+)
+
+WORDCLOUD_AVAILABLE = module_available("wordcloud")
+if WORDCLOUD_AVAILABLE:
+    wordcloud_lib = LazyModule("wordcloud")
+else:
+    print("⚠️ 未安裝 wordcloud 模組，詞雲功能將被禁用")
+
+SENTIMENT_AVAILABLE = module_available("snownlp")
+if SENTIMENT_AVAILABLE:
+    # 匯入 snownlp 時會一併載入情感分析模型
+    snownlp = LazyModule("snownlp")
+else:
+    print("⚠️ 未安裝 snownlp 模組，情感分析功能將被禁用")
+
+JIEBA_AVAILABLE = module_available("jieba")
+if JIEBA_AVAILABLE:
+    jieba = LazyModule("jieba", after_import=lambda module: module.setLogLevel(60))
+
+# 安裝 brotli 時 API 回應可使用 br 壓縮，否則只提供 gzip
+BROTLI_AVAILABLE = module_available("brotli")
+if BROTLI_AVAILABLE:
+    brotli = LazyModule("brotli")
+
+app = Flask(__name__)
+
+# 🔧 效能指標設定
+# full：每個回應都帶 Server-Timing 並記錄每個請求；low：只記錄慢請求與抽樣的請求，不輸出 Server-Timing（正式環境）；
+# off：完全不計時
+METRICS_MODE = os.environ.get("METRICS_MODE", "full").lower()
+METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join("cache", "metrics"))  # 各 worker 的指標快照
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "5"))  # 寫出快照的最短間隔（秒）
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "1000"))  # low 模式下一定記錄的慢請求門檻
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "0.01"))  # low 模式下一般請求的記錄比例
+
+# 耗時 histogram 的區間上限（秒）
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_HELP = {
+    "news_stage_duration_seconds": ("histogram", "各處理階段的耗時"),
+    "news_http_request_duration_seconds": ("histogram", "HTTP 請求的總耗時"),
+    "news_http_requests_total": ("counter", "HTTP 請求數"),
+    "news_upstream_requests_total": ("counter", "對 RSS 來源的請求數（依結果分類）"),
+    "news_cache_requests_total": ("counter", "快取查詢次數（依快取與結果分類）"),
+    "news_cache_hit_ratio": ("gauge", "快取命中率"),
+    "news_singleflight_total": ("counter", "合併請求的次數（依角色分類）"),
+    "news_jobs_total": ("counter", "背景擷取工作數（依結果分類）"),
+}
+
+
+def _metric_labels(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class MetricsRegistry:
+    """
+    行程內的 Prometheus 指標（counter 與 histogram）
+    gunicorn 有多個 worker 時，每個 worker 定期把快照寫到 METRICS_DIR，/metrics 合併所有快照後輸出
+    """
+
+    def __init__(self, buckets, directory):
+        self.buckets = buckets
+        self.directory = directory
+        self._counters = {}  # (名稱, 標籤) -> 數值
+        self._histograms = {}  # (名稱, 標籤) -> [各區間次數..., 總和, 次數]
+        self._lock = threading.Lock()
+        self._flushed_at = 0.0
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _metric_labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_counter(self, name, value, **labels):
+        """直接設定 counter 的值（用於由其他物件統計的數值，例如快取命中次數）"""
+        with self._lock:
+            self._counters[(name, _metric_labels(labels))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, _metric_labels(labels))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                "histograms": [
+                    [name, list(labels), list(series)]
+                    for (name, labels), series in self._histograms.items()
+                ],
+            }
+
+    def flush_due(self):
+        return time.monotonic() - self._flushed_at >= METRICS_FLUSH_INTERVAL
+
+    def flush(self):
+        """把快照寫到 METRICS_DIR/<pid>.json，供其他 worker 的 /metrics 合併"""
+        self._flushed_at = time.monotonic()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{os.getpid()}.json")
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ 寫出效能指標快照失敗: {e}")
+
+    def collect(self):
+        """合併本行程與其他 worker 快照中的指標，回傳 (counters, histograms)"""
+        snapshots = [self.snapshot()]
+        own = f"{os.getpid()}.json"
+        stale = time.time() - 24 * 3600
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name == own or not name.endswith(".json"):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    # 超過一天沒有更新的快照屬於已結束的 worker，刪除
+                    if os.path.getmtime(path) < stale:
+                        os.remove(path)
+                        continue
+                    with open(path, encoding="utf-8") as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, series in snapshot["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.get(key)
+                if merged is None or len(merged) != len(series):
+                    histograms[key] = list(series)
+                else:
+                    histograms[key] = [a + b for a, b in zip(merged, series)]
+        return counters, histograms
+
+    def render(self):
+        """輸出 Prometheus 文字格式"""
+        counters, histograms = self.collect()
+
+        # 快取命中率由合併後的查詢次數計算
+        by_cache = {}
+        for (name, labels), value in counters.items():
+            if name == "news_cache_requests_total":
+                label_map = dict(labels)
+                stats = by_cache.setdefault(label_map["cache"], Counter())
+                stats[label_map["result"]] += value
+        gauges = {
+            ("news_cache_hit_ratio", (("cache", cache),)): (
+                stats["hit"] / sum(stats.values()) if sum(stats.values()) else 0.0
+            )
+            for cache, stats in by_cache.items()
+        }
+
+        lines = []
+        families = {}
+        for (name, labels), value in list(counters.items()) + list(gauges.items()):
+            families.setdefault(name, []).append((labels, value))
+        for (name, labels), series in histograms.items():
+            families.setdefault(name, []).append((labels, series))
+
+        for name in sorted(families):
+            kind, help_text = METRIC_HELP.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(families[name], key=lambda item: item[0]):
+                if kind != "histogram":
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+                    continue
+                for bound, count in zip(self.buckets, value):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', f'{bound:g}')])} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {value[-1]}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {value[-2]:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry(METRIC_BUCKETS, METRICS_DIR)
+
+
+class StageTimings:
+    """單一請求（或背景工作）中各階段的累計耗時，多個執行緒可以同時加入"""
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self._stages = {}  # 階段 -> [累計秒數, 次數]
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            total = self._stages.setdefault(stage, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        """{階段: {"ms": 累計毫秒, "count": 次數}}"""
+        with self._lock:
+            return {
+                stage: {"ms": round(seconds * 1000, 2), "count": count}
+                for stage, (seconds, count) in self._stages.items()
+            }
+
+    def server_timing(self, total):
+        """組成 Server-Timing 標頭；並行執行的階段（例如各關鍵字的 fetch）是累計值，可能超過 total"""
+        parts = [
+            f'{stage};dur={value["ms"]:.1f};desc="x{value["count"]}"'
+            for stage, value in self.as_dict().items()
+        ]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+# 目前請求（或背景工作）的階段耗時；在執行緒池中執行的工作透過 submit_with_context 帶入
+_current_timings = contextvars.ContextVar("current_timings", default=None)
+
+
+def record_stage(stage, seconds):
+    """記錄一個處理階段的耗時到 /metrics 的 histogram 與目前請求的 Server-Timing"""
+    metrics.observe("news_stage_duration_seconds", seconds, stage=stage)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage):
+    """量測一個處理階段（也可以當作函式的裝飾器使用）"""
+    if METRICS_MODE == "off":
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def submit_with_context(executor, fn, *args):
+    """提交到執行緒池時帶上目前的 contextvars，讓背景執行緒的階段耗時也算進同一個請求"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def log_event(event, **fields):
+    """輸出一行 JSON 格式的結構化紀錄"""
+    record = {
+        "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "event": event,
+        **fields,
+    }
+    # 一次寫出整行，避免多個執行緒同時輸出時混在同一行
+    sys.stdout.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    sys.stdout.flush()
+
+
+def should_log(duration):
+    """full 模式記錄每個請求；low 模式只記錄慢請求與抽樣的請求"""
+    if METRICS_MODE == "full":
+        return True
+    if METRICS_MODE == "low":
+        return duration * 1000 >= SLOW_REQUEST_MS or random.random() < LOG_SAMPLE_RATE
+    return False
+
+
+# 🔧 RSS 抓取設定（可透過環境變數調整）
+FETCH_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", "8"))  # 同時抓取的 feed 上限
+FETCH_TIMEOUT = float(os.environ.get("FETCH_TIMEOUT", "10"))  # 單一 feed 的逾時秒數
+
+# 共用的 keep-alive 連線池，所有關鍵字的請求都重用同一組連線
+_http = urllib3.PoolManager(
+    maxsize=FETCH_MAX_WORKERS,
+    block=True,
+    timeout=urllib3.Timeout(total=FETCH_TIMEOUT),
+    retries=urllib3.Retry(total=1, backoff_factor=0.3),
+    headers={"User-Agent": "Mozilla/5.0 (compatible; google-news-scraper)"},
+)
+
+# 執行緒池延遲建立，避免 gunicorn fork 前就啟動執行緒
+_fetch_executor = None
+_fetch_executor_lock = threading.Lock()
+
+
+def _get_fetch_executor():
+    global _fetch_executor
+    with _fetch_executor_lock:
+        if _fetch_executor is None:
+            _fetch_executor = ThreadPoolExecutor(
+                max_workers=FETCH_MAX_WORKERS, thread_name_prefix="rss-fetch"
+            )
+        return _fetch_executor
+
+
+# 🔧 RSS 快取設定
+FEED_CACHE_TTL = float(os.environ.get("FEED_CACHE_TTL", "300"))  # 秒
+FEED_CACHE_MAX_ENTRIES = int(os.environ.get("FEED_CACHE_MAX_ENTRIES", "256"))
+FEED_CACHE_MAX_BYTES = int(os.environ.get("FEED_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+class FeedCache:
+    """
+    以 RSS 網址為鍵的 feed 快取
+    - TTL 內直接回傳已解析的結果
+    - 過期的項目保留 ETag / Last-Modified，用於條件式請求重新驗證
+    - 依筆數與位元組數做 LRU 淘汰
+    """
+
+    def __init__(self, ttl, max_entries, max_bytes):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # url -> dict(feed, etag, modified, size, fetched_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    def lookup(self, url):
+        """回傳 (項目, 是否仍在 TTL 內)，找不到時回傳 (None, False)"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None, False
+            self._entries.move_to_end(url)
+            fresh = time.monotonic() - entry["fetched_at"] < self.ttl
+            if fresh:
+                self.hits += 1
+            return entry, fresh
+
+    def store(self, url, feed, etag, modified, size):
+        with self._lock:
+            old = self._entries.pop(url, None)
+            if old is not None:
+                self._bytes -= old["size"]
+            self.misses += 1
+            if size > self.max_bytes:
+                return
+            self._entries[url] = {
+                "feed": feed,
+                "etag": etag,
+                "modified": modified,
+                "size": size,
+                "fetched_at": time.monotonic(),
+            }
+            self._bytes += size
+            self._evict()
+
+    def revalidated(self, url):
+        """伺服器回應 304 時呼叫，重設該項目的 TTL"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                entry["fetched_at"] = time.monotonic()
+                self._entries.move_to_end(url)
+            self.revalidations += 1
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry["size"]
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.revalidations
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+feed_cache = FeedCache(FEED_CACHE_TTL, FEED_CACHE_MAX_ENTRIES, FEED_CACHE_MAX_BYTES)
+
+
+# 🔧 Google News 版本（地區與語言）：代碼 → 網址參數與顯示名稱
+NEWS_EDITIONS = {
+    "TW": {"hl": "zh-TW", "gl": "TW", "ceid": "TW:zh-Hant", "label": "台灣"},
+    "HK": {"hl": "zh-HK", "gl": "HK", "ceid": "HK:zh-Hant", "label": "香港"},
+    "US": {"hl": "en-US", "gl": "US", "ceid": "US:en", "label": "美國（英文）"},
+    "GB": {"hl": "en-GB", "gl": "GB", "ceid": "GB:en", "label": "英國（英文）"},
+    "SG": {"hl": "en-SG", "gl": "SG", "ceid": "SG:en", "label": "新加坡（英文）"},
+}
+# 加入多版本之前只抓台灣版，文章庫中台灣版的資料沿用原本的鍵
+LEGACY_EDITION = "TW"
+# 沒有指定版本時搜尋的版本（逗號分隔，例如 TW,HK,US）
+DEFAULT_EDITIONS = tuple(
+    code
+    for code in os.environ.get("DEFAULT_EDITIONS", LEGACY_EDITION).upper().replace(" ", "").split(",")
+    if code in NEWS_EDITIONS
+) or (LEGACY_EDITION,)
+
+
+def parse_editions(values):
+    """
+    解析新聞版本代碼，依出現順序去除重複
+    :param values: 逗號分隔的字串，或字串列表（例如表單中多個勾選的欄位）
+    :return: (版本代碼 tuple, 錯誤訊息)；沒有指定時回傳 DEFAULT_EDITIONS
+    """
+    if isinstance(values, str):
+        values = [values]
+    codes = []
+    for value in values or []:
+        for code in value.split(","):
+            code = code.strip().upper()
+            if not code:
+                continue
+            if code not in NEWS_EDITIONS:
+                return None, f"不支援的新聞版本：{code}（可用：{', '.join(NEWS_EDITIONS)}）"
+            if code not in codes:
+                codes.append(code)
+    return tuple(codes) or DEFAULT_EDITIONS, None
+
+
+def edition_store_key(key, edition):
+    """文章庫中區分版本用的鍵：台灣版沿用原本的鍵，其他版本加上版本代碼"""
+    return key if edition == LEGACY_EDITION else f"{key} @{edition}"
+
+
+# 🔧 文章庫設定
+ARTICLE_STORE_PATH = os.environ.get("ARTICLE_STORE_PATH", os.path.join("cache", "articles.sqlite3"))
+ARTICLE_STORE_REFRESH = float(os.environ.get("ARTICLE_STORE_REFRESH", "300"))  # 同一關鍵字補抓的最短間隔（秒）
+# 已結束（早於昨天）的時間窗內容很少變動，補抓間隔可以拉長
+ARTICLE_STORE_CLOSED_REFRESH = float(os.environ.get("ARTICLE_STORE_CLOSED_REFRESH", str(24 * 3600)))
+
+
+class ArticleStore:
+    """
+    以 SQLite（WAL 模式）保存抓取過的新聞，讓日期範圍不受即時 RSS 內容的限制
+    - articles：以 GUID（沒有時為連結）為鍵，依來源與發布時間建立索引
+    - article_keywords：文章與關鍵字的對應，依關鍵字建立索引
+    - fetch_log：每個查詢（關鍵字或關鍵字加上時間窗）最後一次補抓的時間
+    同一則新聞可能出現在多個版本，article_keywords 與 fetch_log 以 edition_store_key() 區分版本
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS articles (
+            article_id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            link TEXT NOT NULL,
+            source TEXT NOT NULL,
+            published_ts INTEGER NOT NULL,
+            updated_at INTEGER NOT NULL,
+            summary TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS idx_articles_published ON articles (published_ts);
+        CREATE INDEX IF NOT EXISTS idx_articles_source ON articles (source, published_ts);
+        CREATE TABLE IF NOT EXISTS article_keywords (
+            keyword TEXT NOT NULL,
+            article_id TEXT NOT NULL,
+            PRIMARY KEY (keyword, article_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_article_keywords_article ON article_keywords (article_id);
+        CREATE TABLE IF NOT EXISTS fetch_log (
+            keyword TEXT PRIMARY KEY,
+            fetched_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path, refresh_interval):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            with self._lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(self.SCHEMA)
+                # 舊版文章庫沒有摘要欄位，補上
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(articles)")}
+                if "summary" not in columns:
+                    conn.execute(
+                        "ALTER TABLE articles ADD COLUMN summary TEXT NOT NULL DEFAULT ''"
+                    )
+                self._initialized = True
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def is_fresh(self, keyword, max_age=None, edition=LEGACY_EDITION):
+        """
+        該查詢是否在補抓間隔內抓過（抓過就直接由文章庫回答）
+        :param keyword: 關鍵字，或 upsert_feed() 的 fetch_key
+        :param max_age: 補抓間隔（秒），預設為 refresh_interval
+        :param edition: 新聞版本代碼
+        """
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT fetched_at FROM fetch_log WHERE keyword = ?",
+                    (edition_store_key(keyword, edition),),
+                ).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ 讀取文章庫失敗: {e}")
+            return False
+        if max_age is None:
+            max_age = self.refresh_interval
+        return row is not None and time.time() - row[0] < max_age
+
+    def upsert_feed(self, keyword, feed, fetch_key=None, edition=LEGACY_EDITION):
+        """
+        將 feed 的所有項目寫入文章庫（已存在的文章則更新內容）
+        :param fetch_key: 記錄補抓時間用的鍵（例如含時間窗的查詢字串），預設為關鍵字
+        :param edition: feed 所屬的新聞版本代碼
+        """
+        now = int(time.time())
+        entries = list(iter_feed_entries(feed))
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO articles"
+                    " (article_id, title, link, published_ts, source, summary, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT(article_id) DO UPDATE SET"
+                    " title = excluded.title, link = excluded.link, source = excluded.source,"
+                    " published_ts = excluded.published_ts, summary = excluded.summary,"
+                    " updated_at = excluded.updated_at",
+                    [(*entry, now) for entry in entries],
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO article_keywords (keyword, article_id) VALUES (?, ?)",
+                    [(edition_store_key(keyword, edition), entry[0]) for entry in entries],
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO fetch_log (keyword, fetched_at) VALUES (?, ?)",
+                    (edition_store_key(fetch_key or keyword, edition), time.time()),
+                )
+        finally:
+            conn.close()
+        return len(entries)
+
+    def query(self, keyword, start_date, end_date, edition=LEGACY_EDITION):
+        """查詢關鍵字在某個版本、日期範圍內的新聞，依發布時間由新到舊排列"""
+        start_ts, end_ts = date_range_to_timestamps(start_date, end_date)
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT a.title, a.link, a.published_ts, a.source, a.summary, a.article_id"
+                " FROM article_keywords k JOIN articles a ON a.article_id = k.article_id"
+                " WHERE k.keyword = ? AND a.published_ts >= ? AND a.published_ts < ?"
+                " ORDER BY a.published_ts DESC, a.article_id",
+                (edition_store_key(keyword, edition), start_ts, end_ts),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [
+            make_news_item(title, link, published_ts, source, summary, keyword, article_id, edition)
+            for title, link, published_ts, source, summary, article_id in rows
+        ]
+
+
+article_store = ArticleStore(ARTICLE_STORE_PATH, ARTICLE_STORE_REFRESH)
+
+
+# RSS 搜尋網址，可改指向本機的測試伺服器（例如 benchmark.py 的 RSS 模擬伺服器）
+RSS_BASE_URL = os.environ.get("RSS_BASE_URL", "https://news.google.com/rss/search")
+
+
+# 🔧 時間窗設定：Google News 每次查詢最多回傳約 100 則，長的日期範圍要拆成多個時間窗分別查詢
+RSS_ITEM_CAP = int(os.environ.get("RSS_ITEM_CAP", "100"))  # 回傳筆數達到此值視為時間窗已滿，需要再細分
+RSS_WINDOW_DAYS = int(os.environ.get("RSS_WINDOW_DAYS", "7"))  # 初始時間窗的天數
+RSS_MAX_WINDOWS = int(os.environ.get("RSS_MAX_WINDOWS", "64"))  # 每個關鍵字最多查詢的時間窗數
+
+
+def build_search_query(keyword, start_date=None, end_date=None):
+    """
+    組成 Google News 的查詢字串，日期範圍（含首尾）以 after: / before: 運算子交給上游篩選
+    after: / before: 都不包含指定的那天，所以前後各多留一天；時區造成的邊界誤差由文章庫查詢時再篩選
+    """
+    terms = [keyword]
+    if start_date is not None:
+        terms.append(f"after:{(start_date - timedelta(days=1)).isoformat()}")
+    if end_date is not None:
+        terms.append(f"before:{(end_date + timedelta(days=1)).isoformat()}")
+    return " ".join(terms)
+
+
+def build_rss_url(keyword, start_date=None, end_date=None, edition=LEGACY_EDITION):
+    query = build_search_query(keyword, start_date, end_date)
+    params = NEWS_EDITIONS[edition]
+    return (
+        f"{RSS_BASE_URL}?q={quote(query)}"
+        f"&hl={params['hl']}&gl={params['gl']}&ceid={params['ceid']}"
+    )
+
+
+def fetch_feed(rss_url):
+    """
+    透過共用連線池下載並解析單一 RSS feed（經由 feed 快取）
+    :param rss_url: RSS 網址
+    :return: parse_feed() 的解析結果，失敗時回傳 None
+    """
+    cached, fresh = feed_cache.lookup(rss_url)
+    if fresh:
+        return cached["feed"]
+
+    # 🔧 快取過期時帶上 ETag / Last-Modified 做條件式請求，304 時直接沿用舊的解析結果
+    # 傳入的 headers 會整個取代連線池的預設標頭，因此以預設標頭（User-Agent）為基礎再加上條件式標頭
+    headers = dict(_http.headers)
+    if cached is not None:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["modified"]:
+            headers["If-Modified-Since"] = cached["modified"]
+
+    try:
+        with timed("fetch"):
+            response = _http.request("GET", rss_url, headers=headers)
+        if response.status == 304 and cached is not None:
+            metrics.inc("news_upstream_requests_total", result="not_modified")
+            feed_cache.revalidated(rss_url)
+            return cached["feed"]
+        if response.status != 200:
+            metrics.inc("news_upstream_requests_total", result="http_error")
+            print(f"⚠️ RSS 回應異常 ({response.status}): {rss_url}")
+            return None
+        metrics.inc("news_upstream_requests_total", result="ok")
+        with timed("parse"):
+            feed = parse_feed(response.data)
+        feed_cache.store(
+            rss_url,
+            feed,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            len(response.data),
+        )
+        return feed
+    except Exception as e:
+        metrics.inc("news_upstream_requests_total", result="error")
+        print(f"❌ 抓取 RSS 失敗: {rss_url} ({e})")
+        return None
+
+
+def parse_keywords(keyword):
+    """將逗號或空格分隔的關鍵字字串拆成列表"""
+    return [k.strip() for k in keyword.replace(",", " ").split() if k.strip()]
+
+
+def parse_query(keyword):
+    """
+    拆解查詢字串
+    :return: (要抓取的關鍵字列表, 要排除的關鍵字列表)，以 - 開頭的詞為排除詞（NOT）
+    """
+    include, exclude = [], []
+    for term in parse_keywords(keyword):
+        if term.startswith("-") and len(term) > 1:
+            exclude.append(term[1:])
+        else:
+            include.append(term)
+    return include, exclude
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick 多模式比對器，每次查詢建立一次
+    掃描一段文字的成本只與文字長度有關，不隨關鍵字數量增加
+    """
+
+    # 要比對的新聞欄位
+    FIELDS = ("標題", "摘要")
+
+    def __init__(self, include, exclude=()):
+        self.include = list(dict.fromkeys(include))
+        self.exclude = list(dict.fromkeys(exclude))
+        self._goto = [{}]  # 狀態 -> {字元: 下一個狀態}
+        self._fail = [0]
+        self._output = [set()]  # 狀態 -> 在此結束的關鍵字
+        for pattern in self.include + self.exclude:
+            self._add(pattern)
+        self._build_failure_links()
+
+    def _add(self, pattern):
+        state = 0
+        for char in pattern.casefold():
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+            state = next_state
+        self._output[state].add(pattern)
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+    def scan(self, text):
+        """回傳文字中出現的所有關鍵字（不分大小寫）"""
+        found = set()
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for char in (text or "").casefold():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+    def match_item(self, item):
+        """回傳 {欄位: 該欄位出現的關鍵字集合}"""
+        return {field: self.scan(item.get(field, "")) for field in self.FIELDS}
+
+
+def date_range_to_timestamps(start_date, end_date):
+    """將日期範圍（含首尾）轉成 [起, 迄) 的 UTC 時間戳記"""
+    start_ts = calendar.timegm(start_date.timetuple())
+    end_ts = calendar.timegm((end_date + timedelta(days=1)).timetuple())
+    return start_ts, end_ts
+
+
+def format_timestamp(ts):
+    """UTC 時間戳記 → 'YYYY-MM-DD HH:MM:SS'"""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ts))
+
+
+# 中文欄位名稱 → NewsArticle 屬性名稱
+ARTICLE_FIELDS = {
+    "標題": "title",
+    "連結": "link",
+    "發布時間": "published_ts",
+    "來源": "source",
+    "摘要": "summary",
+    "關鍵字": "keywords",
+    "情感分數": "sentiment_score",
+    "情感分類": "sentiment_label",
+    "命中": "hits",
+    "版本": "editions",
+}
+
+
+@dataclass(slots=True)
+class NewsArticle:
+    """
+    單則新聞
+    發布時間以整數時間戳記保存，只在輸出（樣板、匯出、JSON）時才格式化成字串。
+    除了屬性之外也支援以中文欄位名稱存取（article["標題"]），與原本的 dict 相容；
+    其中 article["發布時間"] 回傳格式化後的字串
+    """
+
+    title: str
+    link: str
+    published_ts: int
+    source: str
+    summary: str = ""
+    keywords: list = field(default_factory=list)
+    sentiment_score: float | None = None
+    sentiment_label: str | None = None
+    hits: dict | None = None
+    guid: str | None = None  # feed 中的 GUID（沒有時為連結），不輸出到樣板與匯出
+    editions: list | None = None  # 抓到這則新聞的 Google News 版本代碼
+
+    def __getitem__(self, key):
+        if key == "發布時間":
+            return format_timestamp(self.published_ts)
+        return getattr(self, ARTICLE_FIELDS[key])
+
+    def __setitem__(self, key, value):
+        if key == "發布時間":
+            raise KeyError("發布時間為唯讀欄位，請設定 published_ts")
+        setattr(self, ARTICLE_FIELDS[key], value)
+
+    def __contains__(self, key):
+        return key in ARTICLE_FIELDS and getattr(self, ARTICLE_FIELDS[key]) is not None
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def to_dict(self):
+        """轉成以中文欄位名稱為鍵的 dict（略過沒有值的欄位），供樣板、JSON 與匯出使用"""
+        return {key: self[key] for key in ARTICLE_FIELDS if key in self}
+
+
+def make_news_item(title, link, published_ts, source, summary, kw, guid=None, edition=None):
+    editions = [edition] if edition else None
+    return NewsArticle(
+        title, link, published_ts, source, summary or "", [kw], guid=guid, editions=editions
+    )
+
+
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def strip_html(text):
+    """移除 RSS 摘要中的 HTML 標籤並還原實體字元"""
+    return " ".join(html.unescape(_HTML_TAG_RE.sub(" ", text or "")).split())
+
+
+_RFC822_DATE_RE = re.compile(
+    r"^(?:[A-Za-z]{3},\s*)?(\d{1,2})\s+([A-Za-z]{3})\s+(\d{4})\s+(\d{1,2}):(\d{2})(?::(\d{2}))?"
+    r"\s*(GMT|UTC?|Z|[+-]\d{4})?$"
+)
+_MONTHS = {
+    name: i
+    for i, name in enumerate(
+        ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1
+    )
+}
+
+
+def parse_pub_date(text):
+    """將 RSS 的 pubDate（RFC 822）直接轉成 UTC 時間戳記，無法解析時回傳 None"""
+    if not text:
+        return None
+    text = text.strip()
+    match = _RFC822_DATE_RE.match(text)
+    if match:
+        day, month, year, hour, minute, second, zone = match.groups()
+        month = _MONTHS.get(month.lower())
+        if month is not None:
+            ts = calendar.timegm(
+                (int(year), month, int(day), int(hour), int(minute), int(second or 0))
+            )
+            if zone and zone[0] in "+-":
+                offset = int(zone[1:3]) * 3600 + int(zone[3:5]) * 60
+                ts -= offset if zone[0] == "+" else -offset
+            return ts
+    # 其他格式（例如時區縮寫）交給標準函式庫
+    parsed = parsedate_tz(text)
+    if parsed is not None:
+        return mktime_tz(parsed)
+    return None
+
+
+def parse_feed(data, start_ts=None, end_ts=None):
+    """
+    以 iterparse 串流解析 Google News RSS，只取出用到的欄位
+    每個 <item> 解析完就釋放，先檢查發布時間，不在 [start_ts, end_ts) 內的項目不再處理其他欄位
+    XML 格式錯誤或不是 RSS（例如 Atom）時改用 feedparser
+    :param data: RSS 原始內容（bytes）
+    :return: (文章 ID, 標題, 連結, 發布時間戳記, 來源, 摘要) 的列表
+    """
+    entries = []
+    try:
+        context = ET.iterparse(BytesIO(data), events=("start", "end"))
+        _, root = next(context)
+        if root.tag != "rss":
+            raise ValueError(f"不是 RSS feed（根元素為 {root.tag}）")
+        parent = root
+        for event, elem in context:
+            if event == "start":
+                if elem.tag == "channel":
+                    parent = elem
+                continue
+            if elem.tag != "item":
+                continue
+            published_ts = parse_pub_date(elem.findtext("pubDate"))
+            link = (elem.findtext("link") or "").strip()
+            if (
+                published_ts is not None
+                and link
+                and (start_ts is None or published_ts >= start_ts)
+                and (end_ts is None or published_ts < end_ts)
+            ):
+                entries.append(
+                    (
+                        (elem.findtext("guid") or "").strip() or link,
+                        (elem.findtext("title") or "").strip(),
+                        link,
+                        published_ts,
+                        (elem.findtext("source") or "").strip() or "未知",
+                        strip_html(elem.findtext("description")),
+                    )
+                )
+            # 處理完就從 <channel> 移除，避免整份文件留在記憶體中
+            parent.clear()
+    except (ET.ParseError, ValueError, StopIteration) as e:
+        print(f"⚠️ RSS 串流解析失敗，改用 feedparser: {e}")
+        return [
+            entry
+            for entry in iter_feed_entries(feedparser.parse(data))
+            if (start_ts is None or entry[3] >= start_ts) and (end_ts is None or entry[3] < end_ts)
+        ]
+    return entries
+
+
+def iter_feed_entries(feed):
+    """
+    產生 feed 中每個項目的 (文章 ID, 標題, 連結, 發布時間戳記, 來源, 摘要)，略過沒有發布時間的項目
+    :param feed: parse_feed() 的結果或 feedparser 的解析結果
+    """
+    if feed is None:
+        return
+    if isinstance(feed, list):
+        yield from feed
+        return
+    for entry in feed.entries:
+        if not entry.get("published_parsed"):
+            continue
+        yield (
+            entry.get("id") or entry.link,
+            entry.title,
+            entry.link,
+            calendar.timegm(entry.published_parsed),
+            entry.source.title if "source" in entry else "未知",
+            strip_html(entry.get("summary")),
+        )
+
+
+def feed_to_news_items(feed, kw, start_date, end_date, edition=None):
+    """將單一 feed 中落在日期範圍內的項目轉成 NewsArticle 列表"""
+    start_ts, end_ts = date_range_to_timestamps(start_date, end_date)
+    return [
+        make_news_item(title, link, published_ts, source, summary, kw, guid, edition)
+        for guid, title, link, published_ts, source, summary in iter_feed_entries(feed)
+        if start_ts <= published_ts < end_ts
+    ]
+
+
+# 正規化連結時要移除的追蹤參數
+TRACKING_PARAMS = {"oc", "fbclid", "gclid", "ref", "ref_src"}
+
+
+def normalize_link(link):
+    """正規化新聞連結：統一大小寫、移除追蹤參數、片段與結尾斜線"""
+    parts = urlsplit(link.strip())
+    query = [
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k not in TRACKING_PARAMS and not k.startswith("utm_")
+    ]
+    return urlunsplit(
+        (
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            parts.path.rstrip("/") or "/",
+            urlencode(sorted(query)),
+            "",
+        )
+    )
+
+
+def dedup_news_items(items, seen=None):
+    """
+    依正規化後的連結去除重複新聞，並將重複新聞的關鍵字（與版本）合併成列表
+    :param items: 新聞列表
+    :param seen: 已出現過的 {正規化連結: 新聞}，串流時用於跨批次去重
+    :return: (去重後的新聞列表, 被合併的重複筆數)
+    """
+    if seen is None:
+        seen = {}
+    unique = []
+    dropped = 0
+    for item in items:
+        keywords = item["關鍵字"] if isinstance(item["關鍵字"], list) else [item["關鍵字"]]
+        key = normalize_link(item["連結"])
+        existing = seen.get(key)
+        editions = item.get("版本")
+        if existing is None:
+            item["關鍵字"] = list(keywords)
+            if editions:
+                item["版本"] = list(editions)
+            seen[key] = item
+            unique.append(item)
+        else:
+            for kw in keywords:
+                if kw not in existing["關鍵字"]:
+                    existing["關鍵字"].append(kw)
+            if editions:
+                merged = existing.get("版本") or []
+                existing["版本"] = merged + [code for code in editions if code not in merged]
+            dropped += 1
+    return unique, dropped
+
+
+def filter_by_logic(items, matcher, logic):
+    """
+    根據邏輯運算符過濾結果，並在每則新聞記錄命中的關鍵字與位置
+    - AND：多個關鍵字時，標題或摘要必須包含所有關鍵字
+    - OR：保留所有抓到的新聞
+    - NOT：標題或摘要包含任一排除詞的新聞一律移除
+    """
+    require_all = logic == "AND" and len(matcher.include) > 1
+    results = []
+    for item in items:
+        hits = matcher.match_item(item)
+        found = set().union(*hits.values())
+        if any(kw in found for kw in matcher.exclude):
+            continue
+        if require_all and not all(kw in found for kw in matcher.include):
+            continue
+        item["命中"] = {
+            field: [kw for kw in matcher.include if kw in hits[field]]
+            for field in matcher.FIELDS
+        }
+        results.append(item)
+    return results
+
+
+def split_date_range(start_date, end_date, days):
+    """將日期範圍（含首尾）切成每段最多 days 天的時間窗，回傳 [(起, 迄), ...]"""
+    windows = []
+    window_start = start_date
+    while window_start <= end_date:
+        window_end = min(window_start + timedelta(days=days - 1), end_date)
+        windows.append((window_start, window_end))
+        window_start = window_end + timedelta(days=1)
+    return windows
+
+
+def fetch_window(kw, window_start, window_end, edition=LEGACY_EDITION):
+    """
+    抓取單一關鍵字在某個版本、一個時間窗內的 feed 並寫入文章庫
+    :return: feed 的項目列表，抓取失敗時回傳 None
+    """
+    feed = fetch_feed(build_rss_url(kw, window_start, window_end, edition))
+    if feed is None:
+        return None
+    entries = list(iter_feed_entries(feed))
+    try:
+        with timed("store"):
+            article_store.upsert_feed(
+                kw,
+                entries,
+                fetch_key=build_search_query(kw, window_start, window_end),
+                edition=edition,
+            )
+    except sqlite3.Error as e:
+        print(f"⚠️ 寫入文章庫失敗: {e}")
+    return entries
+
+
+def refresh_keyword_news(keywords, start_date, end_date, editions=DEFAULT_EDITIONS):
+    """
+    依需要補抓各關鍵字在各版本、日期範圍內的新聞並寫入文章庫
+    - 每個（關鍵字 × 版本）各自是一組 feed，所有 feed 的時間窗一起並行抓取，
+      同時進行的請求數由共用的抓取執行緒池（FETCH_MAX_WORKERS）限制
+    - 範圍超過 RSS_WINDOW_DAYS 天時切成多個時間窗；範圍很長時加寬時間窗，
+      讓每組 feed 一開始的時間窗數也不超過 RSS_MAX_WINDOWS
+    - 回傳筆數達到 RSS_ITEM_CAP 的時間窗代表可能還有新聞沒拿到，對半切開後再抓
+    - 補抓間隔內抓過的時間窗直接略過（已結束的時間窗使用較長的 ARTICLE_STORE_CLOSED_REFRESH）
+    細分的時間窗由呼叫端的執行緒提交，執行緒池中的工作不會等待其他工作，避免互相卡住
+    :return: 產生 (關鍵字, 版本代碼, 這次抓到的 feed 項目) 的 generator，
+             該關鍵字在該版本的所有時間窗都完成時才產生
+    """
+    executor = _get_fetch_executor()
+    closed_before = datetime.now(timezone.utc).date() - timedelta(days=1)
+    pending = {}  # future -> ((關鍵字, 版本), 起, 迄)
+    remaining = Counter()
+    window_counts = Counter()
+    fetched = {}
+    capped = set()
+
+    def describe(feed_key):
+        kw, edition = feed_key
+        return f"「{kw}」" if len(editions) == 1 else f"「{kw}」（{edition}）"
+
+    def submit(feed_key, window_start, window_end):
+        kw, edition = feed_key
+        max_age = ARTICLE_STORE_CLOSED_REFRESH if window_end < closed_before else None
+        query = build_search_query(kw, window_start, window_end)
+        if article_store.is_fresh(query, max_age, edition):
+            return
+        future = submit_with_context(executor, fetch_window, kw, window_start, window_end, edition)
+        pending[future] = (feed_key, window_start, window_end)
+        remaining[feed_key] += 1
+        window_counts[feed_key] += 1
+
+    total_days = (end_date - start_date).days + 1
+    window_days = max(RSS_WINDOW_DAYS, math.ceil(total_days / RSS_MAX_WINDOWS))
+    for kw in dict.fromkeys(keywords):
+        for edition in dict.fromkeys(editions):
+            feed_key = (kw, edition)
+            fetched[feed_key] = []
+            for window_start, window_end in split_date_range(start_date, end_date, window_days):
+                submit(feed_key, window_start, window_end)
+            if not remaining[feed_key]:
+                yield kw, edition, fetched[feed_key]
+
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            feed_key, window_start, window_end = pending.pop(future)
+            entries = future.result()
+            if entries:
+                fetched[feed_key].extend(entries)
+                if len(entries) >= RSS_ITEM_CAP:
+                    if window_start == window_end:
+                        print(
+                            f"⚠️ {describe(feed_key)}{window_start} 單日的新聞超過 "
+                            f"{RSS_ITEM_CAP} 則，可能有遺漏"
+                        )
+                    elif window_counts[feed_key] + 2 > RSS_MAX_WINDOWS:
+                        if feed_key not in capped:
+                            capped.add(feed_key)
+                            print(
+                                f"⚠️ {describe(feed_key)}的時間窗已達上限 {RSS_MAX_WINDOWS} 個，不再細分"
+                            )
+                    else:
+                        middle = window_start + (window_end - window_start) // 2
+                        submit(feed_key, window_start, middle)
+                        submit(feed_key, middle + timedelta(days=1), window_end)
+            remaining[feed_key] -= 1
+            if not remaining[feed_key]:
+                if window_counts[feed_key] > 1:
+                    print(f"🪟 {describe(feed_key)}共查詢 {window_counts[feed_key]} 個時間窗")
+                yield (*feed_key, fetched[feed_key])
+
+
+def query_keyword_news(kw, start_date, end_date, fetched, edition=LEGACY_EDITION):
+    """
+    由文章庫查詢單一關鍵字在某個版本、日期範圍內的新聞（可查到已不在即時 feed 中的舊新聞）
+    文章庫無法使用時退回這次抓到的 feed 項目
+    """
+    try:
+        with timed("filter"):
+            return article_store.query(kw, start_date, end_date, edition)
+    except sqlite3.Error as e:
+        print(f"⚠️ 查詢文章庫失敗: {e}")
+        items = feed_to_news_items(fetched, kw, start_date, end_date, edition)
+        return dedup_news_items(items)[0]
+
+
+def fetch_rss_news(keyword, start_date, end_date, logic="AND", editions=DEFAULT_EDITIONS):
+    """
+    抓取 RSS 新聞，支援多關鍵字、多個 Google News 版本和 AND/OR 邏輯
+    :param keyword: 關鍵字（可為逗號或空格分隔的多個關鍵字，以 - 開頭的為排除詞）
+    :param start_date: 開始日期
+    :param end_date: 結束日期
+    :param logic: 邏輯運算符（AND/OR）
+    :param editions: 要搜尋的版本代碼（NEWS_EDITIONS 的鍵）
+    :return: 新聞列表
+    """
+    keywords, excluded = parse_query(keyword)
+    matcher = KeywordMatcher(keywords, excluded)
+    results = []
+
+    # 🔧 並行抓取所有（關鍵字 × 版本）與時間窗的 feed，總耗時取決於最慢的一個
+    # 依關鍵字、版本順序合併結果，確保順序固定
+    by_feed = {
+        (kw, edition): query_keyword_news(kw, start_date, end_date, fetched, edition)
+        for kw, edition, fetched in refresh_keyword_news(keywords, start_date, end_date, editions)
+    }
+    for kw in keywords:
+        for edition in editions:
+            results.extend(by_feed[kw, edition])
+
+    with timed("filter"):
+        # 🔧 同一則新聞可能被多個關鍵字或版本抓到，合併成一筆再往下處理
+        results, dropped = dedup_news_items(results)
+        if dropped:
+            print(f"🔁 已合併 {dropped} 筆重複新聞（剩餘 {len(results)} 筆）")
+
+        return filter_by_logic(results, matcher, logic)
+
+
+def iter_rss_news(keyword, start_date, end_date, logic="AND", editions=DEFAULT_EDITIONS):
+    """
+    與 fetch_rss_news 相同，但依 feed 完成的先後順序逐批產生結果
+    先前批次已出現過的新聞不會再次產生，只會把關鍵字與版本合併到先前產生的那一筆
+    :return: 產生 (關鍵字, 該 feed 的新聞列表, 本批合併的重複筆數) 的 generator
+    """
+    keywords, excluded = parse_query(keyword)
+    matcher = KeywordMatcher(keywords, excluded)
+    seen = {}
+    for kw, edition, fetched in refresh_keyword_news(keywords, start_date, end_date, editions):
+        items = query_keyword_news(kw, start_date, end_date, fetched, edition)
+        with timed("filter"):
+            items, dropped = dedup_news_items(items, seen)
+            items = filter_by_logic(items, matcher, logic)
+        yield kw, items, dropped
+
+
+# 🔧 產出檔（圖表、詞雲、匯出檔）管理設定
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", os.path.join("cache", "artifacts"))
+ARTIFACT_MAX_BYTES = int(os.environ.get("ARTIFACT_MAX_BYTES", str(500 * 1024 * 1024)))
+ARTIFACT_MAX_AGE = float(os.environ.get("ARTIFACT_MAX_AGE", str(7 * 24 * 3600)))  # 秒
+ARTIFACT_SWEEP_INTERVAL = float(os.environ.get("ARTIFACT_SWEEP_INTERVAL", "300"))
+
+_ARTIFACT_NAME_RE = re.compile(r"^[A-Za-z0-9_-]+\.[a-z0-9]+$")
+
+
+class ArtifactManager:
+    """
+    管理產生出來的檔案
+    - 以內容雜湊值命名，相同內容只存一份，同時產生也不會互相覆蓋
+    - 先寫入暫存檔再改名（原子寫入），不會讀到寫到一半的檔案
+    - 背景執行緒定期刪除超過保存期限的檔案，並在超過容量上限時依最近使用時間（LRU）淘汰
+    結果集、鎖檔與共用結果等其他快取目錄也交由它清除過期檔案，不各自掃描目錄
+    """
+
+    def __init__(self, directory, max_bytes, max_age, sweep_interval, label="產出檔"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self.label = label
+        self._sweeper = None
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        """回傳檔案路徑；檔名不合法時回傳 None（避免路徑穿越）"""
+        if not _ARTIFACT_NAME_RE.match(name):
+            return None
+        return os.path.join(self.directory, name)
+
+    @staticmethod
+    def content_name(prefix, data, ext):
+        return f"{prefix}_{hashlib.sha1(data).hexdigest()[:16]}.{ext}"
+
+    def exists(self, name):
+        path = self.path(name)
+        return path is not None and os.path.exists(path)
+
+    def touch(self, name):
+        """更新最近使用時間，供 LRU 淘汰使用"""
+        try:
+            os.utime(self.path(name))
+            return True
+        except (OSError, TypeError):
+            return False
+
+    def temp_path(self, name):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f".{name}.{uuid.uuid4().hex}.tmp")
+
+    def commit(self, tmp_path, name):
+        os.replace(tmp_path, self.path(name))
+        self._start_sweeper()
+
+    @contextmanager
+    def writing(self, name):
+        """以暫存檔寫入，離開區塊時才改名為正式檔名"""
+        tmp_path = self.temp_path(name)
+        try:
+            yield tmp_path
+            self.commit(tmp_path, name)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def write_bytes(self, prefix, data, ext):
+        """以內容雜湊值命名並寫入檔案，回傳檔名"""
+        name = self.content_name(prefix, data, ext)
+        if self.touch(name):
+            return name
+        with self.writing(name) as tmp_path:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        return name
+
+    def serve(self, name, **kwargs):
+        """以 send_file 回傳檔案；檔案不存在（例如已被淘汰）時回傳 None"""
+        path = self.path(name)
+        if path is None or not os.path.exists(path):
+            return None
+        self.touch(name)
+        return send_file(os.path.abspath(path), **kwargs)
+
+    def sweep(self, max_age=None):
+        """
+        刪除過期檔案，並在超過容量上限時從最久未使用的檔案開始刪除
+        socket 等非一般檔案不處理
+        :param max_age: 保存期限（秒），預設為 max_age
+        """
+        if not os.path.isdir(self.directory):
+            return 0
+        max_age = self.max_age if max_age is None else max_age
+        now = time.time()
+        files = []
+        removed = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            if now - stat.st_mtime > max_age:
+                removed += self._remove(entry.path)
+            elif not entry.name.startswith("."):
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            removed += self._remove(path)
+            total -= size
+        if removed:
+            print(f"🧹 已清除 {removed} 個過期或超出容量的{self.label}")
+        return removed
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return 1
+        except OSError:
+            return 0
+
+    def _start_sweeper(self):
+        # 延遲啟動背景清除執行緒，避免 gunicorn fork 前就建立執行緒；sweep_interval 為 None 時不啟動
+        if self.sweep_interval is None:
+            return
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(
+                    target=self._sweep_loop, name="artifact-sweeper", daemon=True
+                )
+                self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️ 清除{self.label}失敗: {e}")
+            time.sleep(self.sweep_interval)
+
+
+artifacts = ArtifactManager(ARTIFACT_DIR, ARTIFACT_MAX_BYTES, ARTIFACT_MAX_AGE, ARTIFACT_SWEEP_INTERVAL)
+
+
+# 圖表使用的中文字體（依序嘗試）
+CHART_FONT_FAMILIES = [
+    "Microsoft JhengHei",
+    "SimHei",
+    "Arial Unicode MS",
+    "sans-serif",
+]
+
+
+def save_figure(fig, prefix):
+    """將 matplotlib 圖表存成 PNG 並交由產出檔管理，回傳檔名"""
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", dpi=120, bbox_inches="tight", facecolor="white")
+    return artifacts.write_bytes(prefix, buffer.getvalue(), "png")
+
+
+def generate_pie_chart(source_counts):
+    """
+    生成圓餅圖並返回檔案名稱（由產出檔管理，透過 /artifacts/<檔名> 存取）
+    :param source_counts: {來源: 篇數}，依篇數由多到少排列
+    """
+    try:
+        print("🎨 開始生成圓餅圖...")
+
+        print(f"📊 統計資料: {source_counts}")
+
+        # 建立圖表
+        fig = plt.figure(figsize=(12, 8))
+        ax = fig.add_subplot(111)
+
+        # 設定中文字體
+        plt.rcParams["font.sans-serif"] = CHART_FONT_FAMILIES
+        plt.rcParams["axes.unicode_minus"] = False
+
+        # 生成顏色方案
+        colors = plt.cm.Set3(range(len(source_counts)))
+
+        # 繪製圓餅圖
+        wedges, texts, autotexts = ax.pie(
+            list(source_counts.values()),
+            labels=list(source_counts),
+            autopct="%1.1f%%",
+            startangle=90,
+            colors=colors,
+            textprops={"fontsize": 11},
+            pctdistance=0.85,
+        )
+
+        # 設定標題
+        ax.set_title("各新聞來源篇數統計", fontsize=18, pad=20, fontweight="bold")
+
+        # 美化百分比文字
+        for autotext in autotexts:
+            autotext.set_color("white")
+            autotext.set_fontweight("bold")
+            autotext.set_fontsize(11)
+
+        # 添加圖例
+        legend_labels = [f"{source}: {count}篇" for source, count in source_counts.items()]
+        ax.legend(
+            legend_labels, loc="center left", bbox_to_anchor=(1, 0.5), fontsize=11
+        )
+
+        # 確保圓餅圖是正圓形
+        ax.axis("equal")
+
+        plt.tight_layout()
+
+        # 🔧 修改：以內容雜湊值命名並原子寫入，避免同一秒內的請求互相覆蓋
+        chart_filename = save_figure(fig, "chart")
+        plt.close(fig)
+        print(f"✅ 圓餅圖已成功生成: {chart_filename}")
+        return chart_filename
+
+    except Exception as e:
+        print(f"❌ 生成圓餅圖時發生錯誤: {str(e)}")
+        print(f"詳細錯誤訊息:\n{traceback.format_exc()}")
+        return None
+
+
+# def generate_trend_chart(df):
+#     """生成時間趨勢圖並返回檔案名稱（相對於 static 資料夾）"""
+#     try:
+#         print("📈 開始生成時間趨勢圖...")
+
+#         # 將發布時間轉換為日期格式
+#         df["日期"] = pd.to_datetime(df["發布時間"]).dt.date
+
+#         # 統計每日新聞數量
+#         trend_data = df["日期"].value_counts().sort_index()
+#         print(f"📊 時間趨勢資料: {trend_data.to_dict()}")
+
+#         # 建立圖表
+#         fig = plt.figure(figsize=(12, 6))
+#         ax = fig.add_subplot(111)
+
+#         # 繪製折線圖
+#         ax.plot(
+#             trend_data.index, trend_data.values, marker="o", linestyle="-", color="b"
+#         )
+#         ax.set_title("新聞數量時間趨勢")
+#         ax.set_xlabel("日期")
+#         ax.set_ylabel("新聞數量")
+#         plt.xticks(rotation=45)
+
+#         # 儲存圖表
+#         chart_filename = "trend_chart.png"
+#         chart_path = os.path.join("static", chart_filename)
+#         plt.savefig(chart_path, bbox_inches="tight")
+#         plt.close()
+
+#         # 返回相對於 static 的檔案名稱
+#         return chart_filename
+#     except Exception as e:
+#         print(f"❌ 生成時間趨勢圖失敗: {e}")
+#         traceback.print_exc()
+#         return None
+
+
+# 🔧 詞雲設定：停用詞與字體只在啟動時建立一次
+# 🔧 修復：正確建立停用詞集合
+# STOPWORDS.update() 返回 None，應該使用集合運算
+CHINESE_STOPWORDS = frozenset(
+    {
+        "的",
+        "是",
+        "在",
+        "了",
+        "和",
+        "有",
+        "也",
+        "為",
+        "與",
+        "等",
+        "將",
+        "及",
+        "或",
+        "但",
+        "而",
+        "對",
+        "於",
+        "以",
+        "中",
+        "到",
+        "從",
+        "被",
+        "把",
+        "讓",
+        "使",
+        "由",
+        "向",
+        "就",
+        "都",
+        "要",
+        "會",
+        "能",
+        "可",
+        "不",
+        "沒",
+        "很",
+        "更",
+        "最",
+        "非",
+        "再",
+        "又",
+        "還",
+        "已",
+        "曾",
+        "正",
+        "該",
+        "此",
+        "其",
+        "這",
+        "那",
+        "些",
+        "個",
+        "位",
+        "名",
+    }
+)
+
+_wordcloud_stopwords = None
+
+
+def get_wordcloud_stopwords():
+    """合併英文和中文停用詞；英文停用詞來自 wordcloud，第一次產生詞雲時才載入"""
+    global _wordcloud_stopwords
+    if _wordcloud_stopwords is None:
+        if WORDCLOUD_AVAILABLE:
+            _wordcloud_stopwords = frozenset(wordcloud_lib.STOPWORDS | CHINESE_STOPWORDS)
+        else:
+            _wordcloud_stopwords = CHINESE_STOPWORDS
+    return _wordcloud_stopwords
+
+
+# 🎨 嘗試多個可能的中文字體路徑（跨平台兼容）
+WORDCLOUD_FONT_PATHS = [
+    "C:\\Windows\\Fonts\\msjh.ttc",  # Windows - 微軟正黑體
+    "C:\\Windows\\Fonts\\msyh.ttc",  # Windows - 微軟雅黑
+    "/System/Library/Fonts/PingFang.ttc",  # macOS - 蘋方
+    "/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf",  # Linux
+    "msyh.ttc",  # 相對路徑
+]
+WORDCLOUD_MAX_WORDS = 100
+
+
+def resolve_font_path():
+    for path in WORDCLOUD_FONT_PATHS:
+        if os.path.exists(path):
+            print(f"✅ 找到字體檔案: {path}")
+            return path
+    print("⚠️ 未找到中文字體，使用預設字體（可能無法正確顯示中文）")
+    return None
+
+
+WORDCLOUD_FONT_PATH = resolve_font_path() if WORDCLOUD_AVAILABLE else None
+
+_NON_WORD_RE = re.compile(r"^[\W\d_]+$")
+
+
+def segment_text(text):
+    """
+    中文分詞：優先使用 jieba，沒有 jieba 時改用 snownlp 分詞
+    兩者的詞典都以簡體為主，因此先轉成簡體分詞，再依每個詞在簡體字串中的位置切回原本的繁體字
+    """
+    if SENTIMENT_AVAILABLE:
+        # 直接使用 snownlp 的繁簡轉換，不必為每個標題建立 SnowNLP 物件（會一併建立 BM25 索引）
+        from snownlp import normal
+
+        simplified = normal.zh2hans(text)
+    else:
+        simplified = text
+    if len(simplified) != len(text):
+        simplified = text
+
+    if JIEBA_AVAILABLE:
+        words = jieba.lcut(simplified)
+    elif SENTIMENT_AVAILABLE:
+        from snownlp import seg
+
+        words = seg.seg(simplified)
+    else:
+        return re.findall(r"\w+", text)
+
+    # 分詞器可能略過空白等字元，以搜尋位置對應，繁體的停用詞才比對得到
+    original = []
+    offset = 0
+    for word in words:
+        start = simplified.find(word, offset)
+        if start < 0:
+            original.append(word)
+            continue
+        original.append(text[start : start + len(word)])
+        offset = start + len(word)
+    return original
+
+
+def compute_word_frequencies(titles):
+    """計算標題的詞頻（去除停用詞、單字與純符號/數字），回傳前 WORDCLOUD_MAX_WORDS 個詞"""
+    stopwords = get_wordcloud_stopwords()
+    counts = Counter()
+    for title in titles:
+        for word in segment_text(title):
+            word = word.strip()
+            if len(word) < 2 or word.lower() in stopwords or _NON_WORD_RE.match(word):
+                continue
+            counts[word] += 1
+    return dict(counts.most_common(WORDCLOUD_MAX_WORDS))
+
+
+@timed("wordcloud")
+def generate_word_cloud(titles):
+    """
+    生成關鍵字雲並返回檔案名稱（由產出檔管理，透過 /artifacts/<檔名> 存取）
+    檔名取自詞頻表的雜湊值，相同的詞頻表直接沿用已產生的圖片
+    :param titles: 新聞標題列表
+    """
+    if not WORDCLOUD_AVAILABLE:
+        print("⚠️ 詞雲功能未啟用，請安裝 wordcloud 模組")
+        return None
+    try:
+        print("☁️ 開始生成關鍵字雲...")
+
+        frequencies = compute_word_frequencies(titles)
+        if not frequencies:
+            print("⚠️ 沒有可用於詞雲的詞彙")
+            return None
+
+        # 🔧 以詞頻表與字體計算雜湊值作為檔名（內容定址快取）
+        digest = hashlib.sha1(
+            json.dumps(
+                [WORDCLOUD_FONT_PATH, sorted(frequencies.items())], ensure_ascii=False
+            ).encode("utf-8")
+        ).hexdigest()[:16]
+        wordcloud_filename = f"wordcloud_{digest}.png"
+
+        if artifacts.touch(wordcloud_filename):
+            print(f"✅ 詞雲快取命中: {wordcloud_filename}")
+            return wordcloud_filename
+
+        render_word_cloud(frequencies, wordcloud_filename)
+        print(f"✅ 詞雲已成功生成: {wordcloud_filename}")
+        return wordcloud_filename
+
+    except Exception as e:
+        print(f"❌ 生成關鍵字雲失敗: {e}")
+        traceback.print_exc()
+        return None
+
+
+def render_word_cloud(frequencies, name, manager=None):
+    """依詞頻表排版詞雲，並以產出檔名稱 name 寫入 PNG 圖片（manager 預設為 artifacts）"""
+    manager = manager or artifacts
+    # 使用 wordcloud 生成詞雲
+    wordcloud_params = {
+        "width": 1200,
+        "height": 600,
+        "background_color": "white",
+        "max_words": WORDCLOUD_MAX_WORDS,
+        "relative_scaling": 0.3,
+        "min_font_size": 10,
+    }
+
+    # 只在找到字體時才設定 font_path
+    if WORDCLOUD_FONT_PATH:
+        wordcloud_params["font_path"] = WORDCLOUD_FONT_PATH
+
+    wordcloud = wordcloud_lib.WordCloud(**wordcloud_params).generate_from_frequencies(frequencies)
+
+    # 先寫入暫存檔再改名，避免同時請求讀到寫到一半的圖片
+    with manager.writing(name) as tmp_path:
+        wordcloud.to_image().save(tmp_path, format="PNG")
+
+
+# 🔧 詞雲延遲渲染設定：結果頁只放詞雲網址，圖片在第一次請求時才由獨立行程產生
+WORDCLOUD_RENDER_WORKERS = int(os.environ.get("WORDCLOUD_RENDER_WORKERS", "2"))  # 同時渲染的行程數上限
+WORDCLOUD_RENDER_TIMEOUT = float(os.environ.get("WORDCLOUD_RENDER_TIMEOUT", "30"))  # 單次渲染的逾時（秒）
+WORDCLOUD_FAILURE_TTL = float(os.environ.get("WORDCLOUD_FAILURE_TTL", "60"))  # 失敗後多久才重新嘗試（秒）
+# 跨 worker 協調用的鎖檔與渲染結果標記
+WORDCLOUD_LOCK_DIR = os.environ.get("WORDCLOUD_LOCK_DIR", os.path.join("cache", "wordcloud"))
+WORDCLOUD_LOCK_PURGE_AGE = 3600  # 超過此秒數未使用的鎖檔與標記會被刪除
+# 渲染行程的結束代碼：沒有可用於詞雲的詞彙
+WORDCLOUD_EMPTY_EXIT = 3
+
+WORDCLOUD_PLACEHOLDER_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="1200" height="600" viewBox="0 0 1200 600">'
+    '<rect width="1200" height="600" fill="#f8f9fa"/>'
+    '<text x="600" y="300" font-size="40" fill="#6c757d" text-anchor="middle"'
+    ' dominant-baseline="middle">☁️ 關鍵字雲產生中…</text></svg>'
+)
+
+
+def _render_result_wordcloud(titles, name, directory):
+    """
+    在渲染行程中執行：計算詞頻並寫入詞雲圖片，沒有可用詞彙時以 WORDCLOUD_EMPTY_EXIT 結束
+    渲染行程重新載入模組，不會繼承呼叫端的 artifacts，因此產出檔目錄以參數傳入
+    """
+    frequencies = compute_word_frequencies(titles)
+    if not frequencies:
+        sys.exit(WORDCLOUD_EMPTY_EXIT)
+    # 渲染行程很快就結束，過期清除交給 web worker 的 artifacts，這裡不啟動清除執行緒
+    manager = ArtifactManager(directory, ARTIFACT_MAX_BYTES, ARTIFACT_MAX_AGE, sweep_interval=None)
+    render_word_cloud(frequencies, name, manager)
+
+
+def _serve_render(client):
+    """渲染伺服器 fork 出的渲染行程：讀取參數並回報 PID，完成後回報結束代碼"""
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    code = 1
+    try:
+        client.setblocking(True)
+        conn = Connection(client.detach())
+        args = conn.recv()
+        conn.send(os.getpid())
+        try:
+            _render_result_wordcloud(*args)
+            code = 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except Exception:
+            traceback.print_exc()
+        conn.send(code)
+    finally:
+        sys.stdout.flush()
+        os._exit(code)
+
+
+def _render_server_loop(sock, master_pid):
+    """渲染伺服器的主迴圈：每個連線 fork 一個渲染行程，master 結束後自行結束"""
+    # 不沿用 gunicorn master 的訊號處理
+    for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP, signal.SIGQUIT):
+        signal.signal(sig, signal.SIG_DFL)
+    # 渲染行程結束時由系統自動回收，不留下殭屍行程
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    sock.settimeout(1)
+    try:
+        while os.getppid() == master_pid:
+            try:
+                client, _ = sock.accept()
+            except OSError:
+                continue
+            if os.fork() == 0:
+                sock.close()
+                _serve_render(client)
+            client.close()
+    finally:
+        try:
+            os.remove(sock.getsockname())
+        except OSError:
+            pass
+        os._exit(0)
+
+
+class _RemoteRender:
+    """渲染伺服器建立的行程，提供與 multiprocessing.Process 相同的 is_alive / join / terminate / exitcode"""
+
+    def __init__(self, address, args):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.connect(address)
+        except OSError:
+            client.close()
+            raise
+        self._conn = Connection(client.detach())
+        try:
+            self._conn.send(args)
+            self.pid = self._conn.recv()
+        except BaseException:
+            self._conn.close()
+            raise
+        self.exitcode = None
+
+    def is_alive(self):
+        if self.exitcode is None and self._conn.poll():
+            try:
+                self.exitcode = self._conn.recv()
+            except EOFError:
+                self.exitcode = 1  # 行程在回報結束代碼前就被終止
+            self._conn.close()
+        return self.exitcode is None
+
+    def join(self, timeout=None):
+        if self.exitcode is None:
+            self._conn.poll(timeout)
+        self.is_alive()
+
+    def terminate(self):
+        try:
+            os.kill(self.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+
+class WordCloudRenderer:
+    """
+    在獨立行程中產生結果集的詞雲，CPU 密集的排版不佔用 web worker 的 GIL
+    - 同一個結果集只渲染一次；同時執行的行程數不超過 max_workers，其餘依序排隊
+    - 跨 gunicorn worker：以 fcntl 鎖檔協調，每個結果集的鎖檔確保只有一個 worker 渲染，
+      max_workers 個渲染名額的鎖檔讓所有 worker 合計的行程數也不超過上限；
+      empty / failed 寫成標記檔，其他 worker 的請求直接沿用
+    - 超過 timeout 秒的渲染行程會被終止並視為失敗，failure_ttl 秒內不再重試
+    - 由背景執行緒監看行程狀態（第一次排程時才啟動，gunicorn fork 之前不會建立）
+    - web worker 有多個執行緒，直接 fork 可能複製到其他執行緒持有中的鎖：
+      gunicorn 下由 master 啟動的渲染伺服器（start_server）建立渲染行程，所有 worker 共用；
+      沒有渲染伺服器時（例如 python app.py）改由 forkserver（不支援時用 spawn）建立
+    """
+
+    def __init__(self, directory, max_workers, timeout, failure_ttl):
+        self.directory = directory
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.failure_ttl = failure_ttl
+        self._running = {}  # 結果集 ID -> (行程, 開始時間, 持有中的鎖檔)
+        self._queue = OrderedDict()  # 結果集 ID -> 標題列表
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._monitor = None
+        self.server_address = None
+        # 鎖檔與標記的過期清除（渲染伺服器的 socket 不是一般檔案，不會被刪除）
+        self.files = ArtifactManager(
+            directory, float("inf"), WORDCLOUD_LOCK_PURGE_AGE, None, label="詞雲鎖檔與標記"
+        )
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self._context = multiprocessing.get_context("forkserver")
+            # forkserver 先載入本模組，之後每個渲染行程由它 fork，不必各自重新載入
+            self._context.set_forkserver_preload([__name__])
+        else:
+            self._context = multiprocessing.get_context("spawn")
+        self.rendered = 0
+        self.failed = 0
+        self.timed_out = 0
+
+    @staticmethod
+    def artifact_name(result_id):
+        return f"wordcloud_{result_id}.png"
+
+    def request(self, result_id, titles):
+        """
+        取得結果集詞雲的狀態，還沒開始渲染時排入佇列
+        :return: ready / rendering / queued / empty / failed
+        """
+        if artifacts.exists(self.artifact_name(result_id)):
+            return "ready"
+        with self._lock:
+            if result_id in self._running:
+                return "rendering"
+            if result_id in self._queue:
+                return "queued"
+            status = self._read_status(result_id)
+            if status is not None:
+                return status
+            self._queue[result_id] = titles
+            self._start_queued()
+            status = "rendering" if result_id in self._running else "queued"
+            if self._monitor is None:
+                self._monitor = threading.Thread(
+                    target=self._monitor_loop, name="wordcloud-renderer", daemon=True
+                )
+                self._monitor.start()
+        self._wakeup.set()
+        return status
+
+    def _start_queued(self):
+        """在行程數上限內啟動排隊中的渲染（呼叫端需持有 _lock）"""
+        os.makedirs(self.directory, exist_ok=True)
+        while self._queue and len(self._running) < self.max_workers:
+            result_id, titles = next(iter(self._queue.items()))
+            result_lock = self._try_lock(f"{result_id}.lock")
+            if result_lock is None:
+                # 其他 worker 正在渲染，完成後圖片或標記檔就會出現
+                del self._queue[result_id]
+                continue
+            # 取得鎖時其他 worker 可能剛渲染完
+            if artifacts.exists(self.artifact_name(result_id)) or self._read_status(result_id):
+                result_lock.close()
+                del self._queue[result_id]
+                continue
+            slot_lock = self._acquire_slot()
+            if slot_lock is None:
+                # 所有 worker 合計的渲染行程已達上限，由監看執行緒稍後再試
+                result_lock.close()
+                break
+            del self._queue[result_id]
+            try:
+                process = self._spawn(result_id, titles)
+            except Exception:
+                result_lock.close()
+                slot_lock.close()
+                raise
+            self._running[result_id] = (process, time.monotonic(), (result_lock, slot_lock))
+
+    def _spawn(self, result_id, titles):
+        args = (titles, self.artifact_name(result_id), artifacts.directory)
+        if self.server_address:
+            try:
+                return _RemoteRender(self.server_address, args)
+            except (OSError, EOFError) as e:
+                print(f"⚠️ 無法連線詞雲渲染伺服器，改由本行程建立渲染行程: {e}")
+        process = self._context.Process(
+            target=_render_result_wordcloud,
+            args=args,
+            name=f"wordcloud-{result_id[:8]}",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def start_server(self):
+        """
+        fork 出所有 worker 共用的渲染伺服器（由 gunicorn.conf.py 的 when_ready 在 master 中呼叫）
+        - worker 經由 Unix socket 請它 fork 渲染行程，不必各自啟動 forkserver
+        - 在預熱與 gc.freeze 之後 fork，渲染行程以 copy-on-write 共用已載入的分詞詞典與字體
+        :return: socket 路徑；不支援 fork 的平台回傳 None
+        """
+        if not hasattr(os, "fork") or not hasattr(socket, "AF_UNIX"):
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        # 刪除先前的 master 留下的 socket（渲染伺服器被訊號終止時來不及刪除）
+        for name in os.listdir(self.directory):
+            match = re.match(r"^render-(\d+)\.sock$", name)
+            if match and not JobManager._owner_alive(int(match.group(1))):
+                os.remove(os.path.join(self.directory, name))
+        master_pid = os.getpid()
+        address = os.path.abspath(os.path.join(self.directory, f"render-{master_pid}.sock"))
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(address)
+        sock.listen(64)
+        if os.fork() == 0:
+            _render_server_loop(sock, master_pid)
+        sock.close()
+        self.server_address = address
+        print(f"☁️ 詞雲渲染伺服器已啟動: {address}")
+        return address
+
+    def _try_lock(self, name):
+        """以非阻塞方式取得鎖檔的排他鎖，回傳開啟中的鎖檔；已被其他 worker 持有時回傳 None"""
+        lock_file = open(os.path.join(self.directory, name), "a")
+        if fcntl is None:
+            return lock_file
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        os.utime(lock_file.name)
+        return lock_file
+
+    def _acquire_slot(self):
+        if fcntl is None:
+            # Windows 沒有 fcntl，行程數上限只在同一個 worker 內計算
+            return self._try_lock("slot-0.lock")
+        for slot in range(self.max_workers):
+            lock_file = self._try_lock(f"slot-{slot}.lock")
+            if lock_file is not None:
+                return lock_file
+        return None
+
+    def _status_path(self, result_id):
+        return os.path.join(self.directory, f"{result_id}.status")
+
+    def _read_status(self, result_id):
+        """讀取任一 worker 記錄的 empty / failed 標記；failed 超過 failure_ttl 秒後視為可重試"""
+        path = self._status_path(result_id)
+        try:
+            finished_at = os.path.getmtime(path)
+            with open(path, encoding="utf-8") as f:
+                status = f.read()
+        except OSError:
+            return None
+        if status == "empty" or time.time() - finished_at < self.failure_ttl:
+            return status
+        return None
+
+    def _write_status(self, result_id, status):
+        path = self._status_path(result_id)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(status)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ 無法記錄詞雲渲染狀態: {e}")
+
+    def _monitor_loop(self):
+        while True:
+            self._wakeup.wait(0.1 if self._running or self._queue else None)
+            self._wakeup.clear()
+            with self._lock:
+                for result_id, (process, started, _) in list(self._running.items()):
+                    elapsed = time.monotonic() - started
+                    if process.is_alive():
+                        if elapsed < self.timeout:
+                            continue
+                        process.terminate()
+                        process.join(1)
+                        self.timed_out += 1
+                        print(f"⚠️ 詞雲渲染逾時（{self.timeout:g} 秒），已終止: {result_id}")
+                        self._finish(result_id, "failed")
+                        continue
+                    process.join()
+                    if process.exitcode == 0:
+                        self.rendered += 1
+                        self._finish(result_id)
+                        if METRICS_MODE != "off":
+                            record_stage("wordcloud", elapsed)
+                    elif process.exitcode == WORDCLOUD_EMPTY_EXIT:
+                        self._finish(result_id, "empty")
+                    else:
+                        print(f"❌ 詞雲渲染失敗（結束代碼 {process.exitcode}）: {result_id}")
+                        self._finish(result_id, "failed")
+                self._start_queued()
+
+    def _finish(self, result_id, status=None):
+        """記錄 empty / failed 標記後才釋放鎖檔，等待中的 worker 取得鎖時一定看得到結果"""
+        _, _, locks = self._running.pop(result_id)
+        if status == "failed":
+            self.failed += 1
+        if status is not None:
+            self._write_status(result_id, status)
+        for lock_file in locks:
+            lock_file.close()
+        # 渲染中的鎖檔在取得時已更新時間，不會被當成過期
+        self.files.sweep()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rendering": len(self._running),
+                "queued": len(self._queue),
+                "rendered": self.rendered,
+                "failed": self.failed,
+                "timed_out": self.timed_out,
+            }
+
+
+wordcloud_renderer = WordCloudRenderer(
+    WORDCLOUD_LOCK_DIR, WORDCLOUD_RENDER_WORKERS, WORDCLOUD_RENDER_TIMEOUT, WORDCLOUD_FAILURE_TTL
+)
+
+
+# 🔧 情感分析快取與平行運算設定
+SENTIMENT_CACHE_PATH = os.environ.get("SENTIMENT_CACHE_PATH", os.path.join("cache", "sentiment.sqlite3"))
+SENTIMENT_WORKERS = int(os.environ.get("SENTIMENT_WORKERS", str(os.cpu_count() or 1)))
+SENTIMENT_BATCH_SIZE = int(os.environ.get("SENTIMENT_BATCH_SIZE", "64"))
+# vector：以 NumPy 整批計算（預設）；snownlp：逐筆建立 SnowNLP（與原本的計算方式相同）
+SENTIMENT_ENGINE = os.environ.get("SENTIMENT_ENGINE", "vector").lower()
+SENTIMENT_SEG_CACHE_SIZE = int(os.environ.get("SENTIMENT_SEG_CACHE_SIZE", "50000"))  # 分詞快取的片段數
+
+_sentiment_model_version = None
+
+
+def sentiment_model_version():
+    """以 snownlp 版本與情感模型檔的雜湊值作為模型版本，模型更新時快取自動失效"""
+    global _sentiment_model_version
+    if _sentiment_model_version is None:
+        import importlib.metadata
+        import snownlp.sentiment
+
+        digest = hashlib.sha1()
+        model_path = snownlp.sentiment.data_path + ".3"
+        if os.path.exists(model_path):
+            with open(model_path, "rb") as f:
+                digest.update(f.read())
+        version = importlib.metadata.version("snownlp")
+        _sentiment_model_version = f"snownlp-{version}-{digest.hexdigest()[:12]}"
+    return _sentiment_model_version
+
+
+class SentimentCache:
+    """以「標題雜湊 + 模型版本」為鍵，將情感分數永久保存在 SQLite 檔案中"""
+
+    def __init__(self, path):
+        self.path = path
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self._initialized:
+            with self._lock:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS sentiment_scores ("
+                    " title_hash TEXT NOT NULL,"
+                    " model_version TEXT NOT NULL,"
+                    " score REAL NOT NULL,"
+                    " PRIMARY KEY (title_hash, model_version))"
+                )
+                self._initialized = True
+        return conn
+
+    @staticmethod
+    def title_hash(title):
+        return hashlib.sha1(title.encode("utf-8")).hexdigest()
+
+    def get_many(self, titles, model_version):
+        """回傳 {標題: 分數}，只包含快取中已有的標題"""
+        hashes = {self.title_hash(t): t for t in titles}
+        found = {}
+        conn = self._connect()
+        try:
+            keys = list(hashes)
+            # SQLite 參數數量有上限，分批查詢
+            for i in range(0, len(keys), 500):
+                chunk = keys[i : i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT title_hash, score FROM sentiment_scores"
+                    f" WHERE model_version = ? AND title_hash IN ({placeholders})",
+                    [model_version, *chunk],
+                )
+                for title_hash, score in rows:
+                    found[hashes[title_hash]] = score
+        finally:
+            conn.close()
+        return found
+
+    def put_many(self, scores, model_version):
+        rows = [
+            (self.title_hash(title), model_version, score)
+            for title, score in scores.items()
+            if score is not None
+        ]
+        if not rows:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO sentiment_scores"
+                    " (title_hash, model_version, score) VALUES (?, ?, ?)",
+                    rows,
+                )
+        finally:
+            conn.close()
+
+
+sentiment_cache = SentimentCache(SENTIMENT_CACHE_PATH)
+
+# 行程池延遲建立，只有在快取未命中的標題夠多時才會用到
+_sentiment_pool = None
+_sentiment_pool_lock = threading.Lock()
+
+
+def _get_sentiment_pool():
+    global _sentiment_pool
+    with _sentiment_pool_lock:
+        if _sentiment_pool is None:
+            _sentiment_pool = ProcessPoolExecutor(max_workers=SENTIMENT_WORKERS)
+        return _sentiment_pool
+
+
+def analyze_sentiment(text):
+    """
+    分析文本的情感傾向
+    :param text: 要分析的文本
+    :return: 情感分數 (0-1)，越接近1表示越正面
+    """
+    if not SENTIMENT_AVAILABLE:
+        return None
+    try:
+        s = snownlp.SnowNLP(text)
+        return s.sentiments
+    except Exception as e:
+        print(f"❌ 情感分析失敗: {e}")
+        return None
+
+
+class BayesSentimentScorer:
+    """
+    以 NumPy 陣列重現 snownlp 的情感 Bayes 模型，一次計算整批標題的分數
+    snownlp 對每個詞計算 log P(詞|類別) 並逐筆加總；兩個類別時分數只取決於
+    各詞 log P(詞|neg) - log P(詞|pos) 的總和，因此載入模型時先算好每個詞的差值，
+    計算時只需查表、依標題分組加總，再代入 logistic 函數
+    詞表以排序過的詞雜湊值陣列保存（以 searchsorted 查詢），沒有逐詞的 Python 物件，
+    gunicorn master 預熱建立後，worker 查表只會讀取共用的 NumPy 緩衝區，不會因參考計數而複製記憶體分頁
+    分詞與 snownlp 相同（seg + 停用詞過濾），並以中文片段為單位快取分詞結果
+    """
+
+    def __init__(self, classifier, stopwords, segment):
+        """
+        :param classifier: snownlp.classification.bayes.Bayes（已載入的情感模型）
+        :param stopwords: 停用詞集合
+        :param segment: 中文片段的分詞函數（snownlp.seg.single_seg）
+        """
+        if sorted(classifier.d) != ["neg", "pos"]:
+            raise ValueError(f"情感模型的類別不是 neg/pos: {sorted(classifier.d)}")
+        neg, pos = classifier.d["neg"], classifier.d["pos"]
+        words = list(neg.d.keys() | pos.d.keys())
+        hashes = numpy.fromiter((self.word_hash(word) for word in words), numpy.int64, len(words))
+        order = numpy.argsort(hashes)
+        self.hashes = hashes[order]
+        if len(self.hashes) > 1 and not (self.hashes[1:] != self.hashes[:-1]).all():
+            raise ValueError("情感模型詞表的雜湊值重複，無法建立查詢表")
+        # 最後一格給模型中沒有的詞（AddOneProb 對未出現的詞計數為 1）
+        neg_counts = numpy.full(len(words) + 1, float(neg.none))
+        pos_counts = numpy.full(len(words) + 1, float(pos.none))
+        for i, index in enumerate(order.tolist()):
+            word = words[index]
+            neg_counts[i] = neg.d.get(word, neg.none)
+            pos_counts[i] = pos.d.get(word, pos.none)
+        self.weights = (numpy.log(neg_counts) - numpy.log(neg.getsum())) - (
+            numpy.log(pos_counts) - numpy.log(pos.getsum())
+        )
+        self.weights.flags.writeable = False
+        self.hashes.flags.writeable = False
+        self.bias = math.log(neg.getsum()) - math.log(pos.getsum())
+        self.unknown = len(words)
+        self.stopwords = stopwords
+        self._segment = lru_cache(maxsize=SENTIMENT_SEG_CACHE_SIZE)(
+            lambda chunk: tuple(segment(chunk))
+        )
+
+    @staticmethod
+    def word_hash(word):
+        """
+        詞的 64 位元雜湊值
+        不直接用 hash(word)：CPython 依字元寬度雜湊字串的內部緩衝區，「灰」與「pp」會得到相同的值；
+        UTF-8 編碼對每個字串都不同，只剩一般的雜湊碰撞機率
+        """
+        return hash(word.encode("utf-8"))
+
+    @classmethod
+    def from_snownlp(cls):
+        """由 snownlp 目前載入的情感模型建立（會觸發 snownlp 的模型載入）"""
+        from snownlp import normal, seg, sentiment
+
+        return cls(sentiment.classifier.classifier, normal.stop, seg.single_seg)
+
+    def tokenize(self, text):
+        """與 snownlp.sentiment.Sentiment.handle 相同的分詞：中文片段用 seg 分詞、其餘以空白切開、去除停用詞"""
+        words = []
+        for part in _ZH_CHUNK_RE.split(text):
+            part = part.strip()
+            if not part:
+                continue
+            if _ZH_CHUNK_RE.match(part):
+                words.extend(self._segment(part))
+            else:
+                words.extend(part.split())
+        return [word for word in words if word not in self.stopwords]
+
+    def score_tokens(self, token_lists):
+        """
+        計算多個已分詞標題的分數
+        :param token_lists: 每個標題的詞列表
+        :return: 正面機率（0-1）的 NumPy 陣列
+        """
+        lengths = numpy.fromiter((len(tokens) for tokens in token_lists), numpy.intp, len(token_lists))
+        token_hashes = numpy.fromiter(
+            (self.word_hash(word) for tokens in token_lists for word in tokens),
+            numpy.int64,
+            int(lengths.sum()),
+        )
+        # 以雜湊值查詢詞表位置，找不到的詞使用最後一格（模型中沒有的詞）
+        ids = numpy.minimum(numpy.searchsorted(self.hashes, token_hashes), self.unknown - 1)
+        ids[self.hashes[ids] != token_hashes] = self.unknown
+        rows = numpy.repeat(numpy.arange(len(token_lists)), lengths)
+        totals = numpy.bincount(rows, weights=self.weights[ids], minlength=len(token_lists))
+        with numpy.errstate(over="ignore"):
+            return 1.0 / (1.0 + numpy.exp(self.bias + totals))
+
+    def score(self, texts):
+        """計算多個標題的分數，回傳 float 列表（空字串與逐筆計算時一樣回傳 None）"""
+        scores = self.score_tokens([self.tokenize(text) for text in texts]).tolist()
+        return [score if text else None for text, score in zip(texts, scores)]
+
+
+# snownlp.seg 切分中文片段用的規則
+_ZH_CHUNK_RE = re.compile("([\u4E00-\u9FA5]+)")
+
+# 第一次用到時才建立；gunicorn 預熱時在 master 建立，worker 經 fork 共用同一份
+_sentiment_scorer = None
+_sentiment_scorer_lock = threading.Lock()
+
+
+def get_sentiment_scorer():
+    global _sentiment_scorer
+    with _sentiment_scorer_lock:
+        if _sentiment_scorer is None:
+            _sentiment_scorer = BayesSentimentScorer.from_snownlp()
+        return _sentiment_scorer
+
+
+def _score_batch(titles):
+    """在子行程中計算一批標題的情感分數"""
+    if SENTIMENT_ENGINE == "vector":
+        try:
+            return get_sentiment_scorer().score(titles)
+        except Exception as e:
+            print(f"⚠️ 批次情感分析失敗，改為逐筆計算: {e}")
+    return [analyze_sentiment(title) for title in titles]
+
+
+@timed("sentiment")
+def score_titles(titles):
+    """
+    批次計算多個標題的情感分數
+    先查永久快取，未命中的標題再以 BayesSentimentScorer 整批計算
+    （SENTIMENT_ENGINE=snownlp 時分批交給行程池逐筆計算）
+    :param titles: 標題列表
+    :return: 與 titles 順序對應的分數列表
+    """
+    model_version = sentiment_model_version()
+    unique_titles = list(dict.fromkeys(titles))
+    try:
+        scores = sentiment_cache.get_many(unique_titles, model_version)
+    except sqlite3.Error as e:
+        print(f"⚠️ 讀取情感分析快取失敗: {e}")
+        scores = {}
+
+    misses = [t for t in unique_titles if t not in scores]
+    print(f"💾 情感分析快取命中 {len(unique_titles) - len(misses)}/{len(unique_titles)}")
+    metrics.inc("news_cache_requests_total", len(unique_titles) - len(misses), cache="sentiment", result="hit")
+    metrics.inc("news_cache_requests_total", len(misses), cache="sentiment", result="miss")
+
+    if misses:
+        # 🔧 向量化計算在本行程內一次算完，沿用本行程已載入的模型陣列與分詞快取；
+        # 逐筆計算時才分批交給行程池
+        if SENTIMENT_ENGINE == "vector":
+            batches = [misses]
+        else:
+            batches = [
+                misses[i : i + SENTIMENT_BATCH_SIZE]
+                for i in range(0, len(misses), SENTIMENT_BATCH_SIZE)
+            ]
+        if len(batches) > 1 and SENTIMENT_WORKERS > 1:
+            try:
+                batch_results = list(_get_sentiment_pool().map(_score_batch, batches))
+            except Exception as e:
+                print(f"⚠️ 行程池執行失敗，改為逐筆計算: {e}")
+                batch_results = [_score_batch(batch) for batch in batches]
+        else:
+            batch_results = [_score_batch(batch) for batch in batches]
+
+        new_scores = {}
+        for batch, results in zip(batches, batch_results):
+            new_scores.update(zip(batch, results))
+        scores.update(new_scores)
+        try:
+            sentiment_cache.put_many(new_scores, model_version)
+        except sqlite3.Error as e:
+            print(f"⚠️ 寫入情感分析快取失敗: {e}")
+
+    return [scores.get(t) for t in titles]
+
+
+# 情感分類的固定顯示順序，與 classify_sentiment 的分類一致
+SENTIMENT_LABELS = ["正面", "中立", "負面", "未知"]
+
+
+def classify_sentiment(score):
+    """
+    根據情感分數分類
+    :param score: 情感分數 (0-1)
+    :return: 情感分類 ('正面', '中立', '負面')
+    """
+    if score is None:
+        return "未知"
+    if score >= 0.6:
+        return "正面"
+    elif score <= 0.4:
+        return "負面"
+    else:
+        return "中立"
+
+
+def analyze_news_sentiment(articles):
+    """
+    分析新聞列表的情感傾向，結果直接寫入每則新聞的 sentiment_score / sentiment_label
+    :param articles: NewsArticle 列表
+    :return: 同一個列表
+    """
+    if not SENTIMENT_AVAILABLE:
+        print("⚠️ 情感分析功能未啟用")
+        return articles
+
+    try:
+        print("💭 開始進行情感分析...")
+
+        # 🔧 批次分析（快取 + 行程池），取代逐筆建立 SnowNLP
+        sentiment_scores = score_titles([article.title for article in articles])
+        distribution = Counter()
+        for article, score in zip(articles, sentiment_scores):
+            article.sentiment_score = score
+            article.sentiment_label = classify_sentiment(score)
+            distribution[article.sentiment_label] += 1
+
+        print(f"✅ 情感分析完成")
+        print(f"📊 情感分佈: {dict(distribution.most_common())}")
+
+        return articles
+    except Exception as e:
+        print(f"❌ 情感分析失敗: {e}")
+        traceback.print_exc()
+        return articles
+
+
+def generate_sentiment_chart(sentiment_counts):
+    """
+    生成情感分析圖表並返回檔案名稱
+    :param sentiment_counts: {情感分類: 篇數}
+    """
+    if not SENTIMENT_AVAILABLE or not sentiment_counts:
+        print("⚠️ 無法生成情感分析圖表")
+        return None
+
+    try:
+        print("📊 開始生成情感分析圖表...")
+
+        print(f"📊 情感統計: {sentiment_counts}")
+
+        # 建立圖表
+        fig = plt.figure(figsize=(10, 6))
+        ax = fig.add_subplot(111)
+
+        # 設定中文字體
+        plt.rcParams["font.sans-serif"] = CHART_FONT_FAMILIES
+        plt.rcParams["axes.unicode_minus"] = False
+
+        # 定義顏色
+        colors = {
+            "正面": "#2ecc71",
+            "中立": "#f39c12",
+            "負面": "#e74c3c",
+            "未知": "#95a5a6",
+        }
+        bar_colors = [colors.get(label, "#95a5a6") for label in sentiment_counts]
+
+        # 繪製柱狀圖
+        bars = ax.bar(
+            list(sentiment_counts),
+            list(sentiment_counts.values()),
+            color=bar_colors,
+            edgecolor="black",
+            linewidth=1.5,
+        )
+
+        # 設定標題和標籤
+        ax.set_title("新聞情感分析分佈", fontsize=16, fontweight="bold", pad=20)
+        ax.set_xlabel("情感分類", fontsize=12, fontweight="bold")
+        ax.set_ylabel("新聞數量", fontsize=12, fontweight="bold")
+
+        # 在柱子上添加數值
+        for bar in bars:
+            height = bar.get_height()
+            ax.text(
+                bar.get_x() + bar.get_width() / 2.0,
+                height,
+                f"{int(height)}",
+                ha="center",
+                va="bottom",
+                fontweight="bold",
+                fontsize=11,
+            )
+
+        # 添加網格
+        ax.grid(axis="y", alpha=0.3, linestyle="--")
+        ax.set_axisbelow(True)
+
+        plt.tight_layout()
+
+        # 🔧 修改：以內容雜湊值命名並原子寫入
+        chart_filename = save_figure(fig, "sentiment")
+        plt.close(fig)
+        print(f"✅ 情感分析圖表已成功生成: {chart_filename}")
+        return chart_filename
+
+    except Exception as e:
+        print(f"❌ 生成情感分析圖表時發生錯誤: {str(e)}")
+        print(f"詳細錯誤訊息:\n{traceback.format_exc()}")
+        return None
+
+
+@app.context_processor
+def inject_editions():
+    """搜尋表單（含錯誤時重新顯示的首頁）需要的版本選項"""
+    return {"news_editions": NEWS_EDITIONS, "default_editions": DEFAULT_EDITIONS}
+
+
+@app.route("/")
+def index():
+    return render_template("index.html")
+
+
+# 🔧 結果集與匯出設定
+RESULT_SET_DIR = os.environ.get("RESULT_SET_DIR", os.path.join("cache", "results"))
+RESULT_SET_TTL = float(os.environ.get("RESULT_SET_TTL", str(24 * 3600)))  # 結果集保留秒數
+RESULT_SET_MAX_BYTES = int(os.environ.get("RESULT_SET_MAX_BYTES", str(200 * 1024 * 1024)))
+
+_RESULT_ID_RE = re.compile(r"^[0-9a-f]{20}$")
+
+
+class ResultSetStore:
+    """
+    保存每次搜尋的結果集，供之後下載匯出
+    結果集以內容雜湊值為 ID 寫成 JSON 檔，多個 gunicorn worker 之間可以共用
+    檔案由 ArtifactManager 管理，超過 ttl 或容量上限時由它的背景執行緒刪除
+    """
+
+    def __init__(
+        self,
+        directory,
+        ttl,
+        max_bytes=RESULT_SET_MAX_BYTES,
+        sweep_interval=ARTIFACT_SWEEP_INTERVAL,
+        memory_size=32,
+    ):
+        self.directory = directory
+        self.files = ArtifactManager(directory, max_bytes, ttl, sweep_interval, label="結果集")
+        self.memory_size = memory_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _name(result_id):
+        return f"{result_id}.json"
+
+    @timed("save")
+    def save(self, rows):
+        data = json.dumps(rows, ensure_ascii=False, default=str).encode("utf-8")
+        result_id = hashlib.sha1(data).hexdigest()[:20]
+        name = self._name(result_id)
+        # 相同的結果集已存在時只更新修改時間，保留時間從最後一次產生起算
+        if not self.files.touch(name):
+            with self.files.writing(name) as tmp_path:
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+        self._remember(result_id, rows)
+        return result_id
+
+    def load(self, result_id):
+        """讀取結果集，ID 不合法或已過期時回傳 None"""
+        if not _RESULT_ID_RE.match(result_id):
+            return None
+        with self._lock:
+            rows = self._memory.get(result_id)
+            if rows is not None:
+                self._memory.move_to_end(result_id)
+                return rows
+        try:
+            with open(self.files.path(self._name(result_id)), "rb") as f:
+                rows = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        self._remember(result_id, rows)
+        return rows
+
+    def _remember(self, result_id, rows):
+        with self._lock:
+            self._memory[result_id] = rows
+            self._memory.move_to_end(result_id)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+
+result_sets = ResultSetStore(RESULT_SET_DIR, RESULT_SET_TTL)
+
+# 匯出的欄位與順序
+EXPORT_COLUMNS = ["標題", "連結", "發布時間", "來源", "摘要", "關鍵字", "版本", "情感分數", "情感分類"]
+
+EXPORT_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def iter_export_rows(rows):
+    """依 EXPORT_COLUMNS 的順序產生每一列的值（關鍵字與版本列表以頓號合併）"""
+    for row in rows:
+        values = []
+        for column in EXPORT_COLUMNS:
+            value = row.get(column)
+            if isinstance(value, list):
+                value = "、".join(value)
+            elif isinstance(value, float) and value != value:  # NaN
+                value = None
+            values.append(value)
+        yield values
+
+
+def write_xlsx(rows, path):
+    """以 openpyxl 的 write-only 模式逐列寫入，不在記憶體中保留整個工作表"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("新聞")
+    sheet.append(EXPORT_COLUMNS)
+    for values in iter_export_rows(rows):
+        sheet.append(values)
+    workbook.save(path)
+
+
+def write_parquet(rows, path, batch_size=1000):
+    """分批寫入 Parquet（需要 pyarrow）"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [
+            (column, pa.float64() if column == "情感分數" else pa.string())
+            for column in EXPORT_COLUMNS
+        ]
+    )
+
+    def to_table(batch):
+        return pa.Table.from_pylist([dict(zip(EXPORT_COLUMNS, values)) for values in batch], schema)
+
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for values in iter_export_rows(rows):
+            batch.append(values)
+            if len(batch) >= batch_size:
+                writer.write_table(to_table(batch))
+                batch = []
+        if batch:
+            writer.write_table(to_table(batch))
+
+
+def iter_csv(rows, name, flush_every=500):
+    """
+    逐批產生 CSV 內容（UTF-8 BOM，Excel 可直接開啟）
+    同時寫入暫存檔，完整產生後才改名為產出檔
+    """
+    tmp_path = artifacts.temp_path(name)
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    try:
+        with open(tmp_path, "wb") as f:
+
+            def flush(prefix=""):
+                data = (prefix + buffer.getvalue()).encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+                f.write(data)
+                return data
+
+            writer.writerow(EXPORT_COLUMNS)
+            yield flush("\ufeff")
+            for i, values in enumerate(iter_export_rows(rows), 1):
+                writer.writerow(values)
+                if i % flush_every == 0:
+                    yield flush()
+            yield flush()
+        artifacts.commit(tmp_path, name)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+@timed("export")
+def build_export(rows, fmt, name):
+    """產生 xlsx / parquet 匯出檔：先寫入暫存檔再改名，避免讀到寫到一半的檔案"""
+    with artifacts.writing(name) as tmp_path:
+        if fmt == "xlsx":
+            write_xlsx(rows, tmp_path)
+        else:
+            write_parquet(rows, tmp_path)
+
+
+# 🔧 結果分頁設定
+RESULTS_PAGE_SIZE = int(os.environ.get("RESULTS_PAGE_SIZE", "50"))  # 每頁筆數（結果頁直接輸出第一頁）
+RESULTS_MAX_PAGE_SIZE = 200
+
+# 可排序的欄位 → 排序鍵
+RESULT_SORT_KEYS = {
+    "time": lambda row: row["發布時間"],
+    "source": lambda row: row["來源"],
+    "sentiment": lambda row: row.get("情感分數") if row.get("情感分數") is not None else -1.0,
+}
+
+# 分頁回應中每則新聞包含的欄位（摘要、命中等頁面用不到的欄位不回傳）
+RESULT_PAGE_FIELDS = ["標題", "連結", "發布時間", "來源", "情感分類"]
+
+
+def parse_results_query(args):
+    """
+    解析並驗證結果查詢參數（/api/results/<結果集 ID>）
+    :param args: request.args 或其他類似 dict 的物件
+    :return: (query_result_set 的參數 dict, 錯誤訊息)，驗證失敗時參數為 None
+    """
+    try:
+        page = max(int(args.get("page", 1)), 1)
+        per_page = int(args.get("per_page", RESULTS_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return None, "page 與 per_page 必須是整數"
+    if not 0 <= per_page <= RESULTS_MAX_PAGE_SIZE:
+        return None, f"per_page 必須介於 0 到 {RESULTS_MAX_PAGE_SIZE} 之間"
+
+    sort = args.get("sort", "time")
+    order = args.get("order", "desc")
+    if sort not in RESULT_SORT_KEYS or order not in ("asc", "desc"):
+        return None, "不支援的排序方式"
+
+    try:
+        excluded = {int(i) for i in args.get("exclude", "").split(",") if i.strip()}
+    except ValueError:
+        return None, "exclude 必須是以逗號分隔的列編號"
+
+    return {
+        "page": page,
+        "per_page": per_page,
+        "sort": sort,
+        "order": order,
+        "source": args.get("source") or None,
+        "sentiment": args.get("sentiment") or None,
+        "date": args.get("date") or None,
+        "excluded": excluded,
+    }, None
+
+
+@timed("aggregate")
+def query_result_set(
+    rows,
+    page=1,
+    per_page=RESULTS_PAGE_SIZE,
+    sort="time",
+    order="desc",
+    source=None,
+    sentiment=None,
+    date=None,
+    excluded=(),
+):
+    """
+    篩選、排序並分頁結果集，同時計算圖表用的分面統計
+    分面統計與篩選在同一次走訪中完成；每個分面套用其他篩選條件、但不套用自己的
+    （例如點選某個來源後，來源圓餅圖仍顯示所有來源，情感與日期統計只計算該來源）
+    :param rows: 結果集（dict 列表），每列的編號就是它在結果集中的索引
+    :param per_page: 每頁筆數，0 表示只回傳筆數與分面統計
+    :param excluded: 使用者手動排除的列編號，不列入結果也不列入統計
+    :return: 可直接轉成 JSON 的 dict
+    """
+    source_counts = Counter()
+    sentiment_counts = Counter()
+    date_counts = Counter()
+    matched = []
+    for index, row in enumerate(rows):
+        if index in excluded:
+            continue
+        row_source = row["來源"]
+        row_sentiment = row.get("情感分類")
+        row_date = row["發布時間"][:10]
+        source_ok = source is None or row_source == source
+        sentiment_ok = sentiment is None or row_sentiment == sentiment
+        date_ok = date is None or row_date == date
+        if sentiment_ok and date_ok:
+            source_counts[row_source] += 1
+        if source_ok and date_ok and row_sentiment is not None:
+            sentiment_counts[row_sentiment] += 1
+        if source_ok and sentiment_ok:
+            date_counts[row_date] += 1
+        if source_ok and sentiment_ok and date_ok:
+            matched.append(index)
+
+    sort_key = RESULT_SORT_KEYS[sort]
+    matched.sort(key=lambda index: sort_key(rows[index]), reverse=order == "desc")
+
+    total = len(matched)
+    pages = (total + per_page - 1) // per_page if per_page else 0
+    start = (page - 1) * per_page
+    items = []
+    for index in matched[start : start + per_page]:
+        row = rows[index]
+        item = {"id": index}
+        for field_name in RESULT_PAGE_FIELDS:
+            item[field_name] = row.get(field_name)
+        items.append(item)
+
+    return {
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "pages": pages,
+        "sort": sort,
+        "order": order,
+        "filters": {"source": source, "sentiment": sentiment, "date": date},
+        "items": items,
+        "facets": {
+            "sources": source_counts.most_common(),
+            "sentiments": {
+                label: sentiment_counts[label] for label in SENTIMENT_LABELS if sentiment_counts[label]
+            },
+            "dates": dict(sorted(date_counts.items())),
+        },
+    }
+
+
+def parse_search_form(form):
+    """
+    解析並驗證搜尋表單
+    :param form: request.form 或其他類似 dict 的物件
+    :return: (搜尋參數 dict, 錯誤訊息)，驗證失敗時參數為 None
+    """
+    # 🔧 修改：使用 .get() 獲取表單資料，增加程式碼健壯性
+    keyword = form.get("keyword", "").strip()
+    start_date_str = form.get("start_date")
+    end_date_str = form.get("end_date")
+    logic = form.get("logic", "AND")
+    # 表單中勾選的多個版本會以同名欄位送出，網址參數也可以用逗號分隔
+    editions, error = parse_editions(
+        form.getlist("editions") if hasattr(form, "getlist") else form.get("editions")
+    )
+
+    if not all([keyword, start_date_str, end_date_str]):
+        return None, "請確保所有欄位都已填寫！"
+    if error:
+        return None, error
+
+    try:
+        start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+        end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+    except (ValueError, TypeError):
+        return None, "日期格式不正確，請使用 YYYY-MM-DD 格式。"
+    if start_date > end_date:
+        return None, "起始日期不能晚於結束日期。"
+
+    return {
+        "keyword": keyword,
+        "start_date": start_date,
+        "end_date": end_date,
+        "logic": logic,
+        "editions": editions,
+    }, None
+
+
+class ResultAggregator:
+    """
+    統計搜尋結果：一次走訪就算出來源、日期、情感分佈與來源列表
+    可以分批呼叫 add()（串流模式每完成一個 feed 加入一批）
+    日期以 UTC 日序號（published_ts // 86400）累計，只在輸出時才格式化
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sources = Counter()  # 依第一次出現的順序保存來源
+        self.days = Counter()
+        self.sentiments = Counter()
+
+    @timed("aggregate")
+    def add(self, articles):
+        sources = self.sources
+        days = self.days
+        sentiments = self.sentiments
+        for article in articles:
+            sources[article.source] += 1
+            days[article.published_ts // 86400] += 1
+            if article.sentiment_label is not None:
+                sentiments[article.sentiment_label] += 1
+        self.count += len(articles)
+
+    def source_list(self):
+        """所有新聞來源，依第一次出現的順序"""
+        return list(self.sources)
+
+    def facets(self):
+        """
+        :return: {"sources": {來源: 篇數}（由多到少）, "dates": {日期: 篇數}（由舊到新）,
+                  "sentiments": {情感分類: 篇數}（依 SENTIMENT_LABELS 順序）}
+        """
+        return {
+            "sources": dict(self.sources.most_common()),
+            "dates": {
+                time.strftime("%Y-%m-%d", time.gmtime(day * 86400)): count
+                for day, count in sorted(self.days.items())
+            },
+            "sentiments": {
+                label: self.sentiments[label] for label in SENTIMENT_LABELS if self.sentiments[label]
+            },
+        }
+
+
+def chart_data(counts):
+    """{標籤: 數值} → Chart.js 使用的 {"labels": [...], "data": [...]}"""
+    return {"labels": list(counts), "data": list(counts.values())}
+
+
+# 🔧 重複請求合併（single-flight）設定
+SINGLEFLIGHT_DIR = os.environ.get("SINGLEFLIGHT_DIR", os.path.join("cache", "inflight"))
+SINGLEFLIGHT_WAIT = float(os.environ.get("SINGLEFLIGHT_WAIT", "60"))  # 等待其他 worker 的上限（秒）
+SINGLEFLIGHT_GRACE = float(os.environ.get("SINGLEFLIGHT_GRACE", "10"))  # 剛完成的結果可直接共用的秒數
+SINGLEFLIGHT_PURGE_AGE = 3600  # 超過此秒數未使用的鎖檔與結果檔會被刪除
+
+
+class SingleFlight:
+    """
+    合併同時進行的相同請求：同一個鍵只執行一次，其他請求等待並共用結果
+    - 同一個 worker 內：後到的執行緒等待執行中的呼叫完成
+    - 跨 gunicorn worker：以 fcntl 鎖檔選出一個 worker 執行，結果寫成 JSON 檔供等待中的 worker 讀取；
+      執行中的 worker 當掉時作業系統會釋放鎖，其他 worker 改為自行執行
+    結果必須能序列化為 JSON
+    """
+
+    def __init__(self, directory, wait_timeout, grace):
+        self.directory = directory
+        self.wait_timeout = wait_timeout
+        self.grace = grace
+        self.files = ArtifactManager(
+            directory, float("inf"), SINGLEFLIGHT_PURGE_AGE, None, label="共用結果與鎖檔"
+        )
+        self._calls = {}  # 鍵 -> dict(event, result, error)
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.shared = 0
+
+    @staticmethod
+    def make_key(*parts):
+        return hashlib.sha1(
+            json.dumps(parts, ensure_ascii=False, default=str).encode("utf-8")
+        ).hexdigest()
+
+    def do(self, key, fn):
+        """執行 fn() 並回傳結果；相同鍵的呼叫正在進行時，改為等待並共用它的結果（或例外）"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"event": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+            else:
+                self.followers += 1
+
+        if not leader:
+            call["event"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = self._run_shared(key, fn)
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["event"].set()
+
+    def _lead(self, fn):
+        with self._lock:
+            self.leaders += 1
+        return fn()
+
+    def _run_shared(self, key, fn):
+        if fcntl is None:
+            return self._lead(fn)
+
+        os.makedirs(self.directory, exist_ok=True)
+        lock_path = os.path.join(self.directory, f"{key}.lock")
+        result_path = os.path.join(self.directory, f"{key}.json")
+        started = time.time()
+        with open(lock_path, "a") as lock_file:
+            if not self._acquire(lock_file, started + self.wait_timeout):
+                print("⚠️ 等待其他 worker 的相同請求逾時，改為自行執行")
+                return self._lead(fn)
+            try:
+                os.utime(lock_path)
+                # 其他 worker 剛完成（或在等待期間完成）的結果直接共用
+                result = self._read_result(result_path, started - self.grace)
+                if result is not None:
+                    with self._lock:
+                        self.shared += 1
+                    return result
+                result = self._lead(fn)
+                self._write_result(result_path, result)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _acquire(self, lock_file, deadline):
+        """取得鎖檔的排他鎖，逾時回傳 False（flock 本身不支援逾時，以輪詢代替）"""
+        delay = 0.02
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.time() >= deadline:
+                    return False
+                time.sleep(delay)
+                delay = min(delay * 2, 0.25)
+
+    @staticmethod
+    def _read_result(path, not_before):
+        try:
+            if os.path.getmtime(path) < not_before:
+                return None
+            with open(path, "rb") as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _write_result(self, path, result):
+        try:
+            data = json.dumps(result, ensure_ascii=False).encode("utf-8")
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"⚠️ 無法保存共用結果: {e}")
+            return
+        self.files.sweep()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "followers": self.followers,
+                "shared_across_workers": self.shared,
+            }
+
+
+singleflight = SingleFlight(SINGLEFLIGHT_DIR, SINGLEFLIGHT_WAIT, SINGLEFLIGHT_GRACE)
+
+
+def search_flight_key(
+    kind, keyword, start_date, end_date, logic, editions=DEFAULT_EDITIONS, variant=None
+):
+    """
+    合併請求用的查詢鍵：關鍵字（忽略逗號、空白與排除詞順序的差異）、邏輯、日期範圍與版本
+    :param kind: 流程名稱，不同流程的結果不能互相共用
+    :param variant: 其他會影響結果的參數（例如 /api/search 的 stages）
+    """
+    include, exclude = parse_query(keyword)
+    return SingleFlight.make_key(
+        kind,
+        include,
+        sorted(exclude),
+        logic,
+        start_date.isoformat(),
+        end_date.isoformat(),
+        list(editions),
+        variant,
+    )
+
+
+# 擷取流程的各個階段（依執行順序）
+PIPELINE_STAGES = {
+    "fetch": "抓取新聞",
+    "sentiment": "情感分析",
+    "aggregate": "統計圖表",
+    "save": "儲存結果",
+}
+
+
+def run_scrape_pipeline(
+    keyword, start_date, end_date, logic="AND", editions=DEFAULT_EDITIONS, on_stage=None
+):
+    """
+    執行完整的擷取與分析流程
+    :param on_stage: 進入每個階段時呼叫的回呼函式，參數為階段名稱
+    :return: results.html 所需的樣板參數
+    """
+
+    def stage(name):
+        if on_stage is not None:
+            on_stage(name)
+
+    # 抓取新聞
+    stage("fetch")
+    articles = fetch_rss_news(keyword, start_date, end_date, logic, editions)
+
+    # 🔧 修復：如果找不到任何新聞，直接返回結果頁面並顯示提示
+    if not articles:
+        print("⚠️ 找不到符合條件的新聞，返回結果頁面。")
+        return {"keyword": keyword, "count": 0, "results": []}
+
+    # 進行情感分析
+    stage("sentiment")
+    analyze_news_sentiment(articles)
+
+    # 🔧 來源、日期與情感統計在同一次走訪中算完
+    stage("aggregate")
+    aggregator = ResultAggregator()
+    aggregator.add(articles)
+    facets = aggregator.facets()
+
+    # 生成其他圖表
+    # pie_chart = generate_pie_chart(facets["sources"]) # 不再需要生成靜態圓餅圖
+    # trend_chart = generate_trend_chart(df) # 不再需要生成靜態趨勢圖
+    # 🔧 詞雲不在這裡產生：結果頁以結果集 ID 引用 /wordcloud/<結果集 ID>，圖片第一次被請求時才由渲染行程產生
+    # sentiment_chart = generate_sentiment_chart(facets["sentiments"]) # 不再需要生成靜態情感圖
+
+    # 轉成 dict 供結果集與分頁查詢使用，發布時間在這裡才格式化成字串
+    results_with_sentiment = [article.to_dict() for article in articles]
+
+    # 🔧 修改：不再每次都匯出 Excel，只保存結果集，使用者下載時才產生檔案
+    stage("save")
+    result_id = result_sets.save(results_with_sentiment)
+
+    # 🔧 結果頁只輸出第一頁，其餘由頁面透過 /api/results/<結果集 ID> 分頁載入
+    first_page = query_result_set(results_with_sentiment)
+
+    return dict(
+        keyword=keyword,
+        results=first_page["items"],
+        count=len(results_with_sentiment),
+        pages=first_page["pages"],
+        page_size=RESULTS_PAGE_SIZE,
+        result_id=result_id,
+        # 準備給 Chart.js 的圓餅圖、時間趨勢圖與情感長條圖數據
+        pie_chart_data=chart_data(facets["sources"]),
+        trend_chart_data=chart_data(facets["dates"]),
+        wordcloud=WORDCLOUD_AVAILABLE,
+        sentiment_chart_data=chart_data(facets["sentiments"]) if SENTIMENT_AVAILABLE else None,
+        sentiment_stats=facets["sentiments"],
+        sources=aggregator.source_list(),
+    )
+
+
+def run_shared_scrape(
+    keyword, start_date, end_date, logic="AND", editions=DEFAULT_EDITIONS, on_stage=None
+):
+    """
+    合併同時進行的相同查詢後執行 run_scrape_pipeline，其他請求等待並共用結果
+    等待他人結果的請求不會收到階段回呼
+    """
+    key = search_flight_key("scrape", keyword, start_date, end_date, logic, editions)
+    context = singleflight.do(
+        key,
+        lambda: run_scrape_pipeline(keyword, start_date, end_date, logic, editions, on_stage),
+    )
+    return dict(context, keyword=keyword)
+
+
+# 🔧 背景擷取工作設定
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))  # 同時執行的工作數
+JOB_MAX_PENDING = int(os.environ.get("JOB_MAX_PENDING", "20"))  # 排隊 + 執行中的工作上限
+JOB_TTL = float(os.environ.get("JOB_TTL", "1800"))  # 工作完成後保留結果的秒數
+JOB_SWEEP_INTERVAL = float(os.environ.get("JOB_SWEEP_INTERVAL", "60"))
+JOB_DIR = os.environ.get("JOB_DIR", os.path.join("cache", "jobs"))  # 工作狀態與結果，多個 worker 共用
+
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class JobQueueFull(Exception):
+    """排隊中的工作已達上限"""
+
+
+class JobManager:
+    """
+    以固定大小的執行緒池在背景執行擷取流程
+    - 超過排隊上限時拒絕新工作（上限以 worker 為單位）
+    - 記錄每個工作目前所在的階段
+    - 狀態與結果寫成 JSON 檔，輪詢請求被分到其他 gunicorn worker 時也查得到；
+      執行工作的 worker 已結束時，其他 worker 回報工作失敗
+    - 定期清除已過期的工作與結果
+    """
+
+    def __init__(self, directory, workers, max_pending, ttl, sweep_interval):
+        self.directory = directory
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.files = ArtifactManager(directory, float("inf"), ttl, None, label="工作狀態與結果檔")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._sweeper = None
+
+    def _start(self):
+        # 延遲啟動執行緒池與清除執行緒，避免 gunicorn fork 前就建立執行緒
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="scrape-job"
+            )
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, name="job-sweeper", daemon=True
+            )
+            self._sweeper.start()
+
+    def _path(self, job_id, suffix=""):
+        return os.path.join(self.directory, f"{job_id}{suffix}.json")
+
+    def _write(self, path, data):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"))
+        os.replace(tmp_path, path)
+
+    def _read(self, path):
+        try:
+            with open(path, "rb") as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _publish(self, job):
+        """把工作狀態（完成時先寫結果）寫到共用目錄；呼叫端需持有 _lock"""
+        try:
+            if job["status"] == "done":
+                self._write(self._path(job["id"], ".result"), job["result"])
+            self._write(self._path(job["id"]), dict(self._describe(job), owner=os.getpid()))
+        except (OSError, TypeError, ValueError) as e:
+            print(f"⚠️ 無法保存工作狀態 {job['id']}: {e}")
+
+    def submit(self, params, request_id=None):
+        """
+        提交擷取工作，回傳工作 ID；排隊已滿時拋出 JobQueueFull
+        :param request_id: 送出工作的請求 ID，記錄在工作的結構化紀錄中
+        """
+        with self._lock:
+            pending = sum(
+                1 for job in self._jobs.values() if job["status"] in ("queued", "running")
+            )
+            if pending >= self.max_pending:
+                raise JobQueueFull()
+            self._start()
+            job_id = uuid.uuid4().hex
+            job = self._jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "stage": None,
+                "completed_stages": [],
+                "params": params,
+                "request_id": request_id,
+                "created_at": time.time(),
+                "finished_at": None,
+                "result": None,
+                "error": None,
+            }
+            self._publish(job)
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def _run(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+
+        def on_stage(name):
+            with self._lock:
+                if job["stage"] is not None:
+                    job["completed_stages"].append(job["stage"])
+                job["stage"] = name
+                self._publish(job)
+
+        with self._lock:
+            job["status"] = "running"
+            self._publish(job)
+        timings = StageTimings(job_id)
+        token = _current_timings.set(timings)
+        try:
+            result = run_shared_scrape(**job["params"], on_stage=on_stage)
+            with self._lock:
+                if job["stage"] is not None:
+                    job["completed_stages"].append(job["stage"])
+                job["stage"] = None
+                job["result"] = result
+                job["status"] = "done"
+                job["finished_at"] = time.time()
+                self._publish(job)
+        except Exception as e:
+            print(f"❌ 擷取工作 {job_id} 失敗: {e}")
+            traceback.print_exc()
+            with self._lock:
+                job["error"] = str(e)
+                job["status"] = "failed"
+                job["finished_at"] = time.time()
+                self._publish(job)
+        finally:
+            _current_timings.reset(token)
+            if METRICS_MODE != "off":
+                duration = timings.elapsed()
+                metrics.inc("news_jobs_total", status=job["status"])
+                if should_log(duration):
+                    log_event(
+                        "job",
+                        job_id=job_id,
+                        request_id=job["request_id"],
+                        status=job["status"],
+                        duration_ms=round(duration * 1000, 2),
+                        stages=timings.as_dict(),
+                    )
+
+    @staticmethod
+    def _describe(job):
+        stages = list(PIPELINE_STAGES)
+        done = len(job["completed_stages"])
+        return {
+            "id": job["id"],
+            "status": job["status"],
+            "stage": job["stage"],
+            "stage_label": PIPELINE_STAGES.get(job["stage"]) if job["stage"] else None,
+            "completed_stages": list(job["completed_stages"]),
+            "progress": 1.0 if job["status"] == "done" else done / len(stages),
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "finished_at": job["finished_at"],
+        }
+
+    def status(self, job_id):
+        """回傳可序列化為 JSON 的工作狀態；不是本 worker 的工作時讀取共用目錄，找不到時回傳 None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return self._describe(job)
+        if not _JOB_ID_RE.match(job_id):
+            return None
+        status = self._read(self._path(job_id))
+        if status is None:
+            return None
+        owner = status.pop("owner", None)
+        if status["status"] in ("queued", "running") and not self._owner_alive(owner):
+            status.update(
+                status="failed", stage=None, error="執行此工作的 worker 已結束，請重新搜尋。"
+            )
+        return status
+
+    @staticmethod
+    def _owner_alive(pid):
+        # 同一個 pid 卻不在本 worker 的工作中，代表是先前同 pid 的 worker 留下的工作
+        if not pid or pid == os.getpid():
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def result(self, job_id):
+        """已完成工作的結果（results.html 的 context），沒有結果時回傳 None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job["result"]
+        if not _JOB_ID_RE.match(job_id):
+            return None
+        return self._read(self._path(job_id, ".result"))
+
+    def sweep(self):
+        """清除已完成且超過保留時間的工作，以及共用目錄中太久沒有更新的狀態與結果檔"""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [
+                job_id
+                for job_id, job in self._jobs.items()
+                if job["finished_at"] is not None and job["finished_at"] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        self.files.sweep(self.ttl)
+        if expired:
+            print(f"🧹 已清除 {len(expired)} 個過期的擷取工作")
+        return len(expired)
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️ 清除過期工作失敗: {e}")
+
+
+job_manager = JobManager(JOB_DIR, JOB_WORKERS, JOB_MAX_PENDING, JOB_TTL, JOB_SWEEP_INTERVAL)
+
+
+@app.route("/scrape", methods=["POST"])
+def scrape():
+    params, error = parse_search_form(request.form)
+    if error:
+        return render_template("index.html", error=error)
+
+    context = run_shared_scrape(**params)
+    return render_template("results.html", **context)
+
+
+def _sse(event, data):
+    """組成一則 Server-Sent Events 訊息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route("/stream")
+def stream_results():
+    """串流模式的結果頁面，新聞由瀏覽器透過 /scrape/stream 逐批載入"""
+    params, error = parse_search_form(request.args)
+    if error:
+        return render_template("index.html", error=error)
+
+    sentiment_chart_data = None
+    if SENTIMENT_AVAILABLE:
+        sentiment_chart_data = {"labels": SENTIMENT_LABELS, "data": [0] * len(SENTIMENT_LABELS)}
+
+    return render_template(
+        "results.html",
+        keyword=params["keyword"],
+        results=[],
+        count=0,
+        streaming=True,
+        stream_url=url_for("scrape_stream", **request.args.to_dict(flat=False)),
+        page_size=RESULTS_PAGE_SIZE,
+        pie_chart_data={"labels": [], "data": []},
+        trend_chart_data={"labels": [], "data": []},
+        sentiment_chart_data=sentiment_chart_data,
+        sources=[],
+    )
+
+
+@app.route("/scrape/stream")
+def scrape_stream():
+    """
+    以 Server-Sent Events 串流擷取結果
+    - articles：每完成一個 feed 就送出該批新聞（含情感分析結果）
+    - stats：目前為止的來源、日期與情感統計
+    - done：全部完成，附上結果集 ID（包含串流期間合併到先前新聞的關鍵字與版本）
+    """
+    params, error = parse_search_form(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    def generate():
+        aggregator = ResultAggregator()
+        duplicates = 0
+        streamed = []
+        try:
+            for kw, items, dropped in iter_rss_news(**params):
+                duplicates += dropped
+                if not items:
+                    continue
 
-    WORDCLOUD_AVAILABLE = True
-except ImportError:
-    WORDCLOUD_AVAILABLE = False
-    print("⚠️ 未安裝 wordcloud 模組，詞雲功能將被禁用")
+                if SENTIMENT_AVAILABLE:
+                    scores = score_titles([item.title for item in items])
+                    for item, score in zip(items, scores):
+                        item.sentiment_score = score
+                        item.sentiment_label = classify_sentiment(score)
 
-try:
-    from snownlp import SnowNLP
+                aggregator.add(items)
+                streamed.extend(items)
 
-    SENTIMENT_AVAILABLE = True
-except ImportError:
-    SENTIMENT_AVAILABLE = False
-    print("⚠️ 未安裝 snownlp 模組，情感分析功能將被禁用")
+                facets = aggregator.facets()
+                yield _sse("articles", [item.to_dict() for item in items])
+                yield _sse(
+                    "stats",
+                    {
+                        "count": aggregator.count,
+                        "duplicates": duplicates,
+                        "sources": list(facets["sources"].items()),
+                        "dates": facets["dates"],
+                        "sentiments": facets["sentiments"],
+                    },
+                )
+        except Exception as e:
+            print(f"❌ 串流擷取失敗: {e}")
+            traceback.print_exc()
+            yield _sse("failure", {"error": str(e)})
+            return
+        # 🔧 已送出的新聞之後可能又合併了其他批次的關鍵字與版本，結果集以合併後的內容保存，
+        # 頁面在 done 之後改由 /api/results 重新載入
+        result_id = result_sets.save([item.to_dict() for item in streamed]) if streamed else None
+        yield _sse(
+            "done",
+            {"count": aggregator.count, "duplicates": duplicates, "result_id": result_id},
+        )
 
-# 🔧 確保 static 資料夾存在
-os.makedirs("static", exist_ok=True)
-print(f"✅ Static 資料夾路徑: {os.path.abspath('static')}")
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-app = Flask(__name__)
 
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    params, error = parse_search_form(request.form)
+    if error:
+        return jsonify({"error": error}), 400
 
-def build_rss_url(keyword):
-    base = "https://news.google.com/rss/search"
-    return f"{base}?q={keyword}&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"
+    try:
+        timings = g.get("timings")
+        job_id = job_manager.submit(params, request_id=timings.request_id if timings else None)
+    except JobQueueFull:
+        response = jsonify({"error": "目前擷取工作過多，請稍後再試。"})
+        response.headers["Retry-After"] = "10"
+        return response, 503
 
+    return (
+        jsonify(
+            {
+                "job_id": job_id,
+                "status_url": url_for("job_status", job_id=job_id),
+                "results_url": url_for("job_results", job_id=job_id),
+            }
+        ),
+        202,
+    )
 
-def fetch_rss_news(keyword, start_date, end_date, logic="AND"):
-    """
-    抓取 RSS 新聞，支援多關鍵字和 AND/OR 邏輯
-    :param keyword: 關鍵字（可為逗號或空格分隔的多個關鍵字）
-    :param start_date: 開始日期
-    :param end_date: 結束日期
-    :param logic: 邏輯運算符（AND/OR）
-    :return: 新聞列表
-    """
-    keywords = [k.strip() for k in keyword.replace(",", " ").split() if k.strip()]
-    results = []
 
-    for kw in keywords:
-        rss_url = build_rss_url(kw)
-        feed = feedparser.parse(rss_url)
-        for entry in feed.entries:
-            published = datetime(*entry.published_parsed[:6])
-            if start_date <= published.date() <= end_date:
-                news_item = {
-                    "標題": entry.title,
-                    "連結": entry.link,
-                    "發布時間": published.strftime("%Y-%m-%d %H:%M:%S"),
-                    "來源": entry.source.title if "source" in entry else "未知",
-                    "關鍵字": kw,
-                }
-                results.append(news_item)
-
-    # 根據邏輯運算符過濾結果
-    if logic == "AND" and len(keywords) > 1:
-        # 只保留包含所有關鍵字的新聞
-        filtered_results = []
-        for item in results:
-            if all(kw in item["標題"] for kw in keywords):
-                filtered_results.append(item)
-        results = filtered_results
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    status = job_manager.status(job_id)
+    if status is None:
+        return jsonify({"error": "找不到此工作，可能已過期。"}), 404
+    return jsonify(status)
 
-    return results
 
+@app.route("/jobs/<job_id>/results")
+def job_results(job_id):
+    status = job_manager.status(job_id)
+    result = job_manager.result(job_id) if status and status["status"] == "done" else None
+    if status is None or (status["status"] == "done" and result is None):
+        return render_template("index.html", error="找不到此工作，可能已過期，請重新搜尋。"), 404
+    if status["status"] == "failed":
+        return render_template("index.html", error=f"擷取失敗：{status['error']}"), 500
+    if status["status"] != "done":
+        return jsonify(status), 202
+    return render_template("results.html", **result)
 
-def generate_pie_chart(df):
-    """生成圓餅圖並返回檔案名稱（相對於 static 資料夾）"""
-    try:
-        print("🎨 開始生成圓餅圖...")
 
-        count_data = df["來源"].value_counts()
-        print(f"📊 統計資料: {count_data.to_dict()}")
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify(
+        {
+            "feed_cache": feed_cache.stats(),
+            "search_cache": search_cache.stats(),
+            "singleflight": singleflight.stats(),
+            "wordcloud_renderer": wordcloud_renderer.stats(),
+        }
+    )
 
-        # 建立圖表
-        fig = plt.figure(figsize=(12, 8))
-        ax = fig.add_subplot(111)
 
-        # 設定中文字體
-        plt.rcParams["font.sans-serif"] = [
-            "Microsoft JhengHei",
-            "SimHei",
-            "Arial Unicode MS",
-            "sans-serif",
-        ]
-        plt.rcParams["axes.unicode_minus"] = False
+def collect_cache_metrics():
+    """把各快取自行統計的命中次數同步到 metrics"""
+    feed_stats = feed_cache.stats()
+    search_stats = search_cache.stats()
+    flight_stats = singleflight.stats()
+    for cache, result, value in (
+        ("feed", "hit", feed_stats["hits"]),
+        ("feed", "miss", feed_stats["misses"]),
+        ("feed", "revalidated", feed_stats["revalidations"]),
+        ("search", "hit", search_stats["hits"]),
+        ("search", "miss", search_stats["misses"]),
+    ):
+        metrics.set_counter("news_cache_requests_total", value, cache=cache, result=result)
+    for role, key in (("leader", "leaders"), ("follower", "followers"), ("shared", "shared_across_workers")):
+        metrics.set_counter("news_singleflight_total", flight_stats[key], role=role)
 
-        # 生成顏色方案
-        colors = plt.cm.Set3(range(len(count_data)))
 
-        # 繪製圓餅圖
-        wedges, texts, autotexts = ax.pie(
-            count_data.values,
-            labels=count_data.index,
-            autopct="%1.1f%%",
-            startangle=90,
-            colors=colors,
-            textprops={"fontsize": 11},
-            pctdistance=0.85,
-        )
+@app.before_request
+def start_request_timing():
+    if METRICS_MODE == "off":
+        return
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16]
+    g.timings = StageTimings(request_id[:64])
+    g.timings_token = _current_timings.set(g.timings)
 
-        # 設定標題
-        ax.set_title("各新聞來源篇數統計", fontsize=18, pad=20, fontweight="bold")
 
-        # 美化百分比文字
-        for autotext in autotexts:
-            autotext.set_color("white")
-            autotext.set_fontweight("bold")
-            autotext.set_fontsize(11)
+@app.after_request
+def finish_request_timing(response):
+    """輸出 Server-Timing 與 X-Request-ID 標頭、記錄請求指標與結構化紀錄"""
+    timings = g.pop("timings", None)
+    if timings is None:
+        return response
 
-        # 添加圖例
-        legend_labels = [f"{source}: {count}篇" for source, count in count_data.items()]
-        ax.legend(
-            legend_labels, loc="center left", bbox_to_anchor=(1, 0.5), fontsize=11
+    duration = timings.elapsed()
+    endpoint = request.endpoint or "unknown"
+    metrics.observe("news_http_request_duration_seconds", duration, endpoint=endpoint)
+    metrics.inc("news_http_requests_total", endpoint=endpoint, status=response.status_code)
+
+    response.headers["X-Request-ID"] = timings.request_id
+    if METRICS_MODE == "full":
+        response.headers["Server-Timing"] = timings.server_timing(duration)
+    if should_log(duration):
+        log_event(
+            "request",
+            request_id=timings.request_id,
+            method=request.method,
+            path=request.path,
+            endpoint=endpoint,
+            status=response.status_code,
+            duration_ms=round(duration * 1000, 2),
+            stages=timings.as_dict(),
         )
+    if metrics.flush_due():
+        collect_cache_metrics()
+        metrics.flush()
+    return response
 
-        # 確保圓餅圖是正圓形
-        ax.axis("equal")
 
-        plt.tight_layout()
+@app.teardown_request
+def reset_request_timing(exc):
+    token = g.pop("timings_token", None)
+    if token is not None:
+        try:
+            _current_timings.reset(token)
+        except ValueError:
+            pass
 
-        # 生成唯一的檔案名稱
-        chart_filename = f"chart_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-        chart_path = os.path.join("static", chart_filename)
 
-        print(f"💾 準備儲存圖表到: {os.path.abspath(chart_path)}")
+# 🔧 樣板渲染的耗時透過 Flask 的訊號量測，不必修改每個 render_template 呼叫
+_render_started = threading.local()
 
-        # 儲存圖表
-        plt.savefig(chart_path, dpi=120, bbox_inches="tight", facecolor="white")
-        plt.close(fig)
 
-        # 驗證檔案是否成功創建
-        if os.path.exists(chart_path):
-            file_size = os.path.getsize(chart_path)
-            print(f"✅ 圓餅圖已成功生成: {chart_path} (大小: {file_size} bytes)")
-            return chart_filename
-        else:
-            print(f"❌ 錯誤：圖表檔案未能創建！")
-            return None
+@before_render_template.connect_via(app)
+def _start_render_timing(sender, template, context, **extra):
+    _render_started.value = time.perf_counter()
 
-    except Exception as e:
-        print(f"❌ 生成圓餅圖時發生錯誤: {str(e)}")
-        print(f"詳細錯誤訊息:\n{traceback.format_exc()}")
-        return None
 
+@template_rendered.connect_via(app)
+def _finish_render_timing(sender, template, context, **extra):
+    started = getattr(_render_started, "value", None)
+    if started is not None and METRICS_MODE != "off":
+        _render_started.value = None
+        record_stage("render", time.perf_counter() - started)
 
-# def generate_trend_chart(df):
-#     """生成時間趨勢圖並返回檔案名稱（相對於 static 資料夾）"""
-#     try:
-#         print("📈 開始生成時間趨勢圖...")
 
-#         # 將發布時間轉換為日期格式
-#         df["日期"] = pd.to_datetime(df["發布時間"]).dt.date
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus 格式的效能指標（合併所有 worker 的快照）"""
+    collect_cache_metrics()
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
 
-#         # 統計每日新聞數量
-#         trend_data = df["日期"].value_counts().sort_index()
-#         print(f"📊 時間趨勢資料: {trend_data.to_dict()}")
 
-#         # 建立圖表
-#         fig = plt.figure(figsize=(12, 6))
-#         ax = fig.add_subplot(111)
+@app.route("/download/<filename>")
+def download(filename):
+    """
+    下載搜尋結果，格式由 ?format= 指定（xlsx / csv / parquet，預設 xlsx）
+    匯出檔在第一次下載時才產生，之後直接沿用
+    """
+    # 相容舊版：直接下載 static 資料夾中已存在的檔案
+    legacy_path = os.path.join("static", os.path.basename(filename))
+    if "." in filename and os.path.isfile(legacy_path):
+        return send_file(legacy_path, as_attachment=True)
 
-#         # 繪製折線圖
-#         ax.plot(
-#             trend_data.index, trend_data.values, marker="o", linestyle="-", color="b"
-#         )
-#         ax.set_title("新聞數量時間趨勢")
-#         ax.set_xlabel("日期")
-#         ax.set_ylabel("新聞數量")
-#         plt.xticks(rotation=45)
+    fmt = request.args.get("format", "xlsx")
+    if fmt not in EXPORT_FORMATS:
+        return "不支援的匯出格式", 400
 
-#         # 儲存圖表
-#         chart_filename = "trend_chart.png"
-#         chart_path = os.path.join("static", chart_filename)
-#         plt.savefig(chart_path, bbox_inches="tight")
-#         plt.close()
+    rows = result_sets.load(filename)
+    if rows is None:
+        return "找不到此搜尋結果，可能已過期，請重新搜尋。", 404
 
-#         # 返回相對於 static 的檔案名稱
-#         return chart_filename
-#     except Exception as e:
-#         print(f"❌ 生成時間趨勢圖失敗: {e}")
-#         traceback.print_exc()
-#         return None
+    # 🔧 匯出檔交由產出檔管理；被淘汰後再次下載時會重新產生
+    export_name = f"export_{filename}.{fmt}"
+    download_name = f"news_{filename[:8]}.{fmt}"
+    send_kwargs = {
+        "mimetype": EXPORT_FORMATS[fmt],
+        "as_attachment": True,
+        "download_name": download_name,
+    }
+    response = artifacts.serve(export_name, **send_kwargs)
+    if response is not None:
+        return response
 
+    if fmt == "csv":
+        return Response(
+            stream_with_context(iter_csv(rows, export_name)),
+            mimetype=EXPORT_FORMATS[fmt],
+            headers={"Content-Disposition": f"attachment; filename={download_name}"},
+        )
 
-def generate_word_cloud(df):
-    """生成關鍵字雲並返回檔案名稱（相對於 static 資料夾）"""
-    if not WORDCLOUD_AVAILABLE:
-        print("⚠️ 詞雲功能未啟用，請安裝 wordcloud 模組")
-        return None
     try:
-        print("☁️ 開始生成關鍵字雲...")
+        build_export(rows, fmt, export_name)
+    except ImportError:
+        return "伺服器未安裝 pyarrow，無法匯出 Parquet", 501
+    return artifacts.serve(export_name, **send_kwargs)
 
-        # 提取所有標題
-        titles = " ".join(df["標題"].tolist())
-
-        # 🔧 修復：正確建立停用詞集合
-        # STOPWORDS.update() 返回 None，應該使用集合運算
-        chinese_stopwords = {
-            "的",
-            "是",
-            "在",
-            "了",
-            "和",
-            "有",
-            "也",
-            "為",
-            "與",
-            "等",
-            "將",
-            "及",
-            "或",
-            "但",
-            "而",
-            "對",
-            "於",
-            "以",
-            "中",
-            "到",
-            "從",
-            "被",
-            "把",
-            "讓",
-            "使",
-            "由",
-            "向",
-            "就",
-            "都",
-            "要",
-            "會",
-            "能",
-            "可",
-            "不",
-            "沒",
-            "很",
-            "更",
-            "最",
-            "非",
-            "再",
-            "又",
-            "還",
-            "已",
-            "曾",
-            "正",
-            "該",
-            "此",
-            "其",
-            "這",
-            "那",
-            "些",
-            "個",
-            "位",
-            "名",
-        }
 
-        # 合併英文和中文停用詞
-        # 正確寫法（返回集合）
-        all_stopwords = STOPWORDS | chinese_stopwords
-        
-        # 🎨 嘗試多個可能的中文字體路徑（跨平台兼容）
-        font_paths = [
-            "C:\\Windows\\Fonts\\msjh.ttc",  # Windows - 微軟正黑體
-            "C:\\Windows\\Fonts\\msyh.ttc",  # Windows - 微軟雅黑
-            "/System/Library/Fonts/PingFang.ttc",  # macOS - 蘋方
-            "/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf",  # Linux
-            "msyh.ttc",  # 相對路徑
-        ]
+@app.route("/wordcloud/<result_id>")
+def result_wordcloud(result_id):
+    """
+    結果集的詞雲圖片，第一次請求時才交給渲染行程產生
+    - 已產生：回傳圖片（可長期快取，結果集 ID 取自內容雜湊值）
+    - 排隊或渲染中：回傳 202 與佔位圖，Retry-After 提示稍後再試
+    - 沒有可用於詞雲的詞彙：204；渲染失敗或逾時：503
+    """
+    if not WORDCLOUD_AVAILABLE:
+        return "伺服器未安裝 wordcloud，無法產生詞雲", 404
+    name = WordCloudRenderer.artifact_name(result_id)
+    response = artifacts.serve(name, max_age=7 * 24 * 3600)
+    if response is not None:
+        return response
 
-        font_path = None
-        for path in font_paths:
-            if os.path.exists(path):
-                font_path = path
-                print(f"✅ 找到字體檔案: {path}")
-                break
+    rows = result_sets.load(result_id)
+    if rows is None:
+        return "找不到此搜尋結果，可能已過期，請重新搜尋。", 404
 
-        if not font_path:
-            print("⚠️ 未找到中文字體，使用預設字體（可能無法正確顯示中文）")
-
-        # 使用 wordcloud 生成詞雲
-        wordcloud_params = {
-            "width": 1200,
-            "height": 600,
-            "background_color": "white",
-            "stopwords": all_stopwords,
-            "max_words": 100,
-            "relative_scaling": 0.3,
-            "min_font_size": 10,
-        }
+    status = wordcloud_renderer.request(result_id, [row["標題"] for row in rows])
+    if status == "ready":
+        response = artifacts.serve(name, max_age=7 * 24 * 3600)
+        if response is not None:
+            return response
+    if status == "empty":
+        return "", 204
+    if status == "failed":
+        return "詞雲產生失敗，請稍後再試", 503, {"Retry-After": str(int(WORDCLOUD_FAILURE_TTL))}
 
-        # 只在找到字體時才設定 font_path
-        if font_path:
-            wordcloud_params["font_path"] = font_path
+    response = Response(WORDCLOUD_PLACEHOLDER_SVG, 202, mimetype="image/svg+xml")
+    response.headers["Retry-After"] = "1"
+    response.headers["Cache-Control"] = "no-store"
+    return response
 
-        wordcloud = WordCloud(**wordcloud_params).generate(titles)
 
-        # 🔧 生成唯一的檔案名稱（避免覆蓋）
-        wordcloud_filename = f"wordcloud_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-        wordcloud_path = os.path.join("static", wordcloud_filename)
-        wordcloud.to_file(wordcloud_path)
+@app.route("/api/results/<result_id>")
+def api_results(result_id):
+    """
+    分頁查詢搜尋結果
+    參數：page、per_page、sort（time / source / sentiment）、order（asc / desc）、
+    篩選條件 source、sentiment、date（YYYY-MM-DD），以及手動排除的列編號 exclude（逗號分隔）
+    """
+    params, error = parse_results_query(request.args)
+    if error:
+        return jsonify({"error": error}), 400
 
-        # 驗證檔案是否成功創建
-        if os.path.exists(wordcloud_path):
-            file_size = os.path.getsize(wordcloud_path)
-            print(f"✅ 詞雲已成功生成: {wordcloud_path} (大小: {file_size} bytes)")
-            return wordcloud_filename
-        else:
-            print(f"❌ 錯誤：詞雲檔案未能創建！")
-            return None
+    rows = result_sets.load(result_id)
+    if rows is None:
+        return jsonify({"error": "找不到此搜尋結果，可能已過期，請重新搜尋。"}), 404
 
-    except Exception as e:
-        print(f"❌ 生成關鍵字雲失敗: {e}")
-        traceback.print_exc()
-        return None
+    result = query_result_set(rows, **params)
+    result["result_id"] = result_id
+    return jsonify(result)
 
 
-def analyze_sentiment(text):
+# 🔧 搜尋 API 設定
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", "60"))  # 秒，同時作為 Cache-Control 的 max-age
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "128"))
+SEARCH_COMPRESS_MIN_BYTES = 1024  # 小於此大小的回應不壓縮
+
+# /api/search 可選擇執行的階段（抓取與保存結果集一定會執行）
+SEARCH_STAGES = ("sentiment", "aggregate", "wordcloud")
+SEARCH_DEFAULT_STAGES = ("sentiment", "aggregate")
+
+
+class SearchResponseCache:
     """
-    分析文本的情感傾向
-    :param text: 要分析的文本
-    :return: 情感分數 (0-1)，越接近1表示越正面
+    快取 /api/search 已序列化的 JSON 回應、ETag 與壓縮後的內容
+    TTL 內重複的查詢（例如輪詢）不必重新執行擷取流程，也不必重新壓縮
     """
-    if not SENTIMENT_AVAILABLE:
-        return None
-    try:
-        s = SnowNLP(text)
-        return s.sentiments
-    except Exception as e:
-        print(f"❌ 情感分析失敗: {e}")
-        return None
 
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # 查詢參數 -> dict(body, etag, encoded, created_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
 
-def classify_sentiment(score):
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry["created_at"] >= self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body):
+        entry = {
+            "body": body,
+            "etag": hashlib.sha1(body).hexdigest(),
+            "encoded": {},
+            "created_at": time.monotonic(),
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+search_cache = SearchResponseCache(SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_ENTRIES)
+
+
+def parse_search_stages(value):
     """
-    根據情感分數分類
-    :param score: 情感分數 (0-1)
-    :return: 情感分類 ('正面', '中立', '負面')
+    解析 stages 參數（逗號分隔），未指定時使用 SEARCH_DEFAULT_STAGES
+    :return: (依 SEARCH_STAGES 順序排列的階段 tuple, 錯誤訊息)
     """
-    if score is None:
-        return "未知"
-    if score >= 0.6:
-        return "正面"
-    elif score <= 0.4:
-        return "負面"
-    else:
-        return "中立"
+    if value is None:
+        return SEARCH_DEFAULT_STAGES, None
+    requested = {stage.strip() for stage in value.split(",") if stage.strip()}
+    unknown = requested - set(SEARCH_STAGES)
+    if unknown:
+        return None, f"不支援的階段：{', '.join(sorted(unknown))}（可用：{', '.join(SEARCH_STAGES)}）"
+    return tuple(stage for stage in SEARCH_STAGES if stage in requested), None
 
 
-def analyze_news_sentiment(df):
+def run_search(
+    keyword, start_date, end_date, logic="AND", editions=DEFAULT_EDITIONS, stages=SEARCH_DEFAULT_STAGES
+):
     """
-    分析新聞列表的情感傾向
-    :param df: 新聞 DataFrame
-    :return: 包含情感分析結果的 DataFrame
+    /api/search 的擷取流程：抓取新聞，依 stages 執行情感分析、統計與詞雲，並保存結果集
+    :return: 可直接轉成 JSON 的 dict
     """
-    if not SENTIMENT_AVAILABLE:
-        print("⚠️ 情感分析功能未啟用")
-        return df
+    articles = fetch_rss_news(keyword, start_date, end_date, logic, editions)
+    if "sentiment" in stages and articles:
+        analyze_news_sentiment(articles)
 
-    try:
-        print("💭 開始進行情感分析...")
+    payload = {
+        "keyword": keyword,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "logic": logic,
+        "editions": list(editions),
+        "stages": list(stages),
+        "count": len(articles),
+    }
+    if "aggregate" in stages:
+        aggregator = ResultAggregator()
+        aggregator.add(articles)
+        payload["facets"] = aggregator.facets()
 
-        # 分析每條新聞的情感
-        sentiment_scores = []
-        sentiment_labels = []
+    rows = [article.to_dict() for article in articles]
+    payload["result_id"] = result_sets.save(rows) if rows else None
+    if "wordcloud" in stages:
+        # 詞雲改為延遲產生：回傳圖片網址，第一次請求時回應 202 直到渲染完成
+        wordcloud = WORDCLOUD_AVAILABLE and payload["result_id"]
+        payload["wordcloud"] = (
+            url_for("result_wordcloud", result_id=payload["result_id"]) if wordcloud else None
+        )
+    payload["articles"] = rows
+    return payload
 
-        for title in df["標題"]:
-            score = analyze_sentiment(title)
-            sentiment_scores.append(score)
-            sentiment_labels.append(classify_sentiment(score))
 
-        df["情感分數"] = sentiment_scores
-        df["情感分類"] = sentiment_labels
+def choose_content_encoding(accept_encodings, size):
+    """依 Accept-Encoding 選擇壓縮方式（br 優先），回應太小或用戶端不支援時回傳 None"""
+    if size < SEARCH_COMPRESS_MIN_BYTES:
+        return None
+    offered = ["br", "gzip"] if BROTLI_AVAILABLE else ["gzip"]
+    return accept_encodings.best_match(offered)
 
-        print(f"✅ 情感分析完成")
-        print(f"📊 情感分佈: {pd.Series(sentiment_labels).value_counts().to_dict()}")
 
-        return df
-    except Exception as e:
-        print(f"❌ 情感分析失敗: {e}")
-        traceback.print_exc()
-        return df
+def encode_cached_body(entry, encoding):
+    """回傳快取項目指定編碼的內容；壓縮結果保存在項目中，同一份回應只壓縮一次"""
+    if encoding is None:
+        return entry["body"]
+    encoded = entry["encoded"].get(encoding)
+    if encoded is None:
+        if encoding == "br":
+            encoded = brotli.compress(entry["body"], quality=5)
+        else:
+            encoded = gzip.compress(entry["body"], compresslevel=6)
+        entry["encoded"][encoding] = encoded
+    return encoded
 
 
-def generate_sentiment_chart(df):
-    """生成情感分析圖表並返回檔案名稱"""
-    if not SENTIMENT_AVAILABLE or "情感分類" not in df.columns:
-        print("⚠️ 無法生成情感分析圖表")
-        return None
+@app.route("/api/search")
+def api_search():
+    """
+    以 JSON 回傳搜尋結果
+    參數：keyword、start_date、end_date、logic、editions（同搜尋表單，editions 可用逗號分隔），
+    stages（逗號分隔，可選 sentiment、aggregate、wordcloud，預設 sentiment,aggregate）
+    回應帶有以內容計算的 ETag；If-None-Match 相符時回傳 304，並依 Accept-Encoding 壓縮
+    """
+    params, error = parse_search_form(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+    stages, error = parse_search_stages(request.args.get("stages"))
+    if error:
+        return jsonify({"error": error}), 400
 
-    try:
-        print("📊 開始生成情感分析圖表...")
+    key = (
+        params["keyword"],
+        params["start_date"].isoformat(),
+        params["end_date"].isoformat(),
+        params["logic"],
+        params["editions"],
+        stages,
+    )
+    entry = search_cache.get(key)
+    if entry is None:
+        # 🔧 快取未命中的相同查詢同時進來時，只執行一次擷取流程
+        flight_key = search_flight_key("search", **params, variant=stages)
+        payload = singleflight.do(flight_key, lambda: run_search(**params, stages=stages))
+        payload = dict(payload, keyword=params["keyword"])
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        entry = search_cache.put(key, body)
 
-        # 統計情感分佈
-        sentiment_counts = df["情感分類"].value_counts()
-        print(f"📊 情感統計: {sentiment_counts.to_dict()}")
+    # 🔧 不同壓縮方式是不同的表示法，ETag 加上編碼後綴；比對時任一種表示法相符都視為未變更
+    encoding = choose_content_encoding(request.accept_encodings, len(entry["body"]))
+    etag = f"{entry['etag']}-{encoding}" if encoding else entry["etag"]
+    variants = [entry["etag"]] + [f"{entry['etag']}-{name}" for name in ("gzip", "br")]
 
-        # 建立圖表
-        fig = plt.figure(figsize=(10, 6))
-        ax = fig.add_subplot(111)
+    response = Response(mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = f"public, max-age={int(SEARCH_CACHE_TTL)}"
+    response.vary.add("Accept-Encoding")
+    if any(request.if_none_match.contains_weak(variant) for variant in variants):
+        response.status_code = 304
+        return response
 
-        # 設定中文字體
-        plt.rcParams["font.sans-serif"] = [
-            "Microsoft JhengHei",
-            "SimHei",
-            "Arial Unicode MS",
-            "sans-serif",
-        ]
-        plt.rcParams["axes.unicode_minus"] = False
+    response.set_data(encode_cached_body(entry, encoding))
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
 
-        # 定義顏色
-        colors = {
-            "正面": "#2ecc71",
-            "中立": "#f39c12",
-            "負面": "#e74c3c",
-            "未知": "#95a5a6",
-        }
-        bar_colors = [colors.get(label, "#95a5a6") for label in sentiment_counts.index]
 
-        # 繪製柱狀圖
-        bars = ax.bar(
-            sentiment_counts.index,
-            sentiment_counts.values,
-            color=bar_colors,
-            edgecolor="black",
-            linewidth=1.5,
-        )
+@app.route("/artifacts/<name>")
+def artifact(name):
+    """提供圖表與詞雲圖片；檔名為內容雜湊值，可長期快取"""
+    response = artifacts.serve(name, max_age=7 * 24 * 3600)
+    if response is None:
+        return "檔案不存在或已過期", 404
+    return response
 
-        # 設定標題和標籤
-        ax.set_title("新聞情感分析分佈", fontsize=16, fontweight="bold", pad=20)
-        ax.set_xlabel("情感分類", fontsize=12, fontweight="bold")
-        ax.set_ylabel("新聞數量", fontsize=12, fontweight="bold")
 
-        # 在柱子上添加數值
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(
-                bar.get_x() + bar.get_width() / 2.0,
-                height,
-                f"{int(height)}",
-                ha="center",
-                va="bottom",
-                fontweight="bold",
-                fontsize=11,
-            )
+def warm_up():
+    """
+    預先載入延遲匯入的套件、情感分析模型、分詞詞典與字體
+    供 gunicorn --preload 在 master 行程呼叫一次（見 gunicorn.conf.py），
+    fork 出來的 worker 以 copy-on-write 共用這些資料，不必各自載入
+    :return: 各項目的載入耗時（秒）
+    """
+    timings = OrderedDict()
 
-        # 添加網格
-        ax.grid(axis="y", alpha=0.3, linestyle="--")
-        ax.set_axisbelow(True)
+    def step(label, func):
+        started = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            print(f"⚠️ 預熱 {label} 失敗: {e}")
+        timings[label] = time.perf_counter() - started
 
-        plt.tight_layout()
+    def load_chart_fonts():
+        from matplotlib import font_manager
 
-        # 生成唯一的檔案名稱
-        chart_filename = f"sentiment_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-        chart_path = os.path.join("static", chart_filename)
+        plt.rcParams["font.sans-serif"] = CHART_FONT_FAMILIES
+        font_manager.findfont(font_manager.FontProperties(family=["sans-serif"]))
 
-        # 儲存圖表
-        plt.savefig(chart_path, dpi=120, bbox_inches="tight", facecolor="white")
-        plt.close(fig)
+    step("matplotlib", load_chart_fonts)
+    if WORDCLOUD_AVAILABLE:
+        step("wordcloud", lambda: (wordcloud_lib.load(), get_wordcloud_stopwords()))
+    if SENTIMENT_AVAILABLE:
+        step(
+            "snownlp",
+            lambda: (snownlp.load(), sentiment_model_version(), get_sentiment_scorer()),
+        )
+    if JIEBA_AVAILABLE:
+        step("jieba", lambda: jieba.initialize())
+    step("segment", lambda: segment_text("預熱分詞詞典"))
 
-        if os.path.exists(chart_path):
-            file_size = os.path.getsize(chart_path)
-            print(f"✅ 情感分析圖表已成功生成: {chart_path} (大小: {file_size} bytes)")
-            return chart_filename
-        else:
-            print(f"❌ 錯誤：情感分析圖表檔案未能創建！")
-            return None
+    total = sum(timings.values())
+    details = "、".join(f"{label} {seconds:.2f}s" for label, seconds in timings.items())
+    print(f"🔥 預熱完成，共 {total:.2f} 秒（{details}）")
+    return timings
 
-    except Exception as e:
-        print(f"❌ 生成情感分析圖表時發生錯誤: {str(e)}")
-        print(f"詳細錯誤訊息:\n{traceback.format_exc()}")
-        return None
 
+def freeze_shared_memory():
+    """
+    把目前所有物件移到垃圾回收的永久世代（gc.freeze），供 gunicorn master 在 fork worker 前呼叫
+    worker 的垃圾回收不再走訪這些物件、改寫它們的 GC 標頭，預熱載入的模型、詞典與字體
+    所在的記憶體分頁才能一直以 copy-on-write 共用（見 gunicorn.conf.py）
+    :return: 凍結的物件數量
+    """
+    import gc
 
-@app.route("/")
-def index():
-    return render_template("index.html")
+    gc.freeze()
+    count = gc.get_freeze_count()
+    print(f"🧊 已凍結 {count} 個物件，worker 以 copy-on-write 共用")
+    return count
 
 
-@app.route("/scrape", methods=["POST"])
-def scrape():
-    # 🔧 修改：使用 .get() 獲取表單資料，增加程式碼健壯性
-    keyword = request.form.get("keyword", "").strip()
-    start_date_str = request.form.get("start_date")
-    end_date_str = request.form.get("end_date")
-    logic = request.form.get("logic", "AND")
+# /proc/<pid>/smaps_rollup 中要讀取的欄位
+MEMORY_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Swap")
 
-    if not all([keyword, start_date_str, end_date_str]):
-        return render_template("index.html", error="請確保所有欄位都已填寫！")
 
+def process_memory(pid):
+    """
+    讀取行程的記憶體用量（Linux /proc/<pid>/smaps_rollup）
+    RSS 包含與其他行程共用的分頁；PSS 把共用分頁依共用的行程數平分，各行程的 PSS 加總即為實際用量
+    :param pid: 行程 ID
+    :return: {"rss", "pss", "shared", "private", "swap"}（位元組），無法讀取時回傳 None
+    """
     try:
-        start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
-        end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
-    except (ValueError, TypeError):
-        return render_template("index.html", error="日期格式不正確，請使用 YYYY-MM-DD 格式。")
-    if start_date > end_date:
-        return render_template("index.html", error="起始日期不能晚於結束日期。")
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    values = dict.fromkeys(MEMORY_FIELDS, 0)
+    for line in lines:
+        name, _, rest = line.partition(":")
+        if name in values:
+            values[name] = int(rest.split()[0]) * 1024
+    return {
+        "rss": values["Rss"],
+        "pss": values["Pss"],
+        "shared": values["Shared_Clean"] + values["Shared_Dirty"],
+        "private": values["Private_Clean"] + values["Private_Dirty"],
+        "swap": values["Swap"],
+    }
 
-    # 抓取新聞
-    news_items = fetch_rss_news(keyword, start_date, end_date, logic)
-    df = pd.DataFrame(news_items)
 
-    # 🔧 修復：如果找不到任何新聞，df 會是空的，直接返回結果頁面並顯示提示
-    if df.empty:
-        print("⚠️ 找不到符合條件的新聞，返回結果頁面。")
-        return render_template("results.html", keyword=keyword, count=0, results=[])
+def child_processes(pid):
+    """
+    列出行程的所有子孫行程
+    :param pid: 行程 ID
+    :return: [(pid, 層數)]，直接的子行程層數為 1
+    """
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # 行程名稱可能含有空白或括號，以最後一個右括號之後的欄位為準
+                ppid = int(f.read().rpartition(")")[2].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    result = []
 
-    # 進行情感分析
-    df = analyze_news_sentiment(df)
-
-    # 🔧 修正：準備給 Chart.js 的圓餅圖數據，而不是生成圖片
-    pie_chart_data = None
-    if not df.empty:
-        source_counts = df["來源"].value_counts()
-        pie_chart_data = {
-            "labels": source_counts.index.tolist(),
-            "data": source_counts.values.tolist(),
-        }
+    def walk(parent, depth):
+        for child in sorted(children.get(parent, [])):
+            result.append((child, depth))
+            walk(child, depth + 1)
 
-    # 🔧 新增：準備給 Chart.js 的時間趨勢圖數據
-    trend_chart_data = None
-    if not df.empty:
-        df["日期"] = pd.to_datetime(df["發布時間"]).dt.date # 確保日期欄位存在
-        trend_counts = df["日期"].value_counts().sort_index()
-        trend_chart_data = {
-            "labels": [date.strftime("%Y-%m-%d") for date in trend_counts.index], # 日期格式化為字串
-            "data": [int(count) for count in trend_counts.values], # 轉換為 Python 原生 int
-        }
+    walk(pid, 1)
+    return result
 
-    # 🔧 新增：準備給 Chart.js 的情感長條圖數據
-    sentiment_chart_data = None
-    if "情感分類" in df.columns:
-        sentiment_counts = df["情感分類"].value_counts()
-        # 為了固定的顏色順序，我們定義一個標籤順序
-        # 確保 '未知' 情感分類也包含在內，即使沒有數據，以便顏色映射一致
-        # 這裡的 labels_order 應該與 classify_sentiment 函式中的分類一致
-        labels_order = ["正面", "中立", "負面", "未知"]
-        chart_labels = [label for label in labels_order if label in sentiment_counts.index]
-        # 🔧 修正：將 numpy.int64 轉換為 python 原生的 int
-        chart_data = [int(sentiment_counts[label]) for label in chart_labels]
-        sentiment_chart_data = {
-            "labels": chart_labels,
-            "data": chart_data,
-        }
 
-    # 生成其他圖表
-    # pie_chart = generate_pie_chart(df) # 不再需要生成靜態圓餅圖
-    # trend_chart = generate_trend_chart(df) # 不再需要生成靜態趨勢圖
-    wordcloud = generate_word_cloud(df)
-    # sentiment_chart = generate_sentiment_chart(df) # 不再需要生成靜態情感圖
+def memory_report(pid):
+    """
+    gunicorn master 與各 worker（以及 worker 的子行程）的記憶體用量
+    :param pid: gunicorn master 的行程 ID
+    :return: 每個行程一列 {"pid", "role", "name", "rss", "pss", "shared", "private", "swap"}
+    """
+    roles = {0: "master", 1: "worker"}
+    rows = []
+    for child, depth in [(pid, 0)] + child_processes(pid):
+        usage = process_memory(child)
+        if usage is None:
+            continue
+        try:
+            with open(f"/proc/{child}/comm") as f:
+                name = f.read().strip()
+        except OSError:
+            name = ""
+        rows.append({"pid": child, "role": roles.get(depth, "子行程"), "name": name, **usage})
+    return rows
 
-    # 儲存為 Excel
-    file_name = f"news_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    df.to_excel(os.path.join("static", file_name), index=False)
 
-    # 獲取所有新聞來源
-    sources = df["來源"].unique().tolist()
+def print_memory_report(pid):
+    rows = memory_report(pid)
+    if not rows:
+        print(f"❌ 無法讀取行程 {pid} 的記憶體用量（需要 Linux /proc/<pid>/smaps_rollup）")
+        return
 
-    # 計算情感統計
-    sentiment_stats = {}
-    if "情感分類" in df.columns:
-        sentiment_counts = df["情感分類"].value_counts()
-        sentiment_stats = sentiment_counts.to_dict()
+    def mb(value):
+        return f"{value / 2**20:8.1f}"
 
-    # 將 DataFrame 轉換回列表，包含情感分析結果
-    results_with_sentiment = df.to_dict("records")
+    print(f"🧠 記憶體用量（MB），PID {pid} 與 {len(rows) - 1} 個子行程")
+    print(f"   {'PID':>7}  {'角色':<6} {'RSS':>8} {'PSS':>8} {'共用':>6} {'私有':>6} {'Swap':>8}  名稱")
+    for row in rows:
+        print(
+            f"   {row['pid']:>7}  {row['role']:<6} {mb(row['rss'])} {mb(row['pss'])}"
+            f" {mb(row['shared'])} {mb(row['private'])} {mb(row['swap'])}  {row['name']}"
+        )
+    print(f"   合計 PSS {sum(row['pss'] for row in rows) / 2**20:.1f} MB")
 
-    return render_template(
-        "results.html",
-        keyword=keyword,
-        results=results_with_sentiment,
-        count=len(results_with_sentiment),
-        file_name=file_name,
-        pie_chart_data=pie_chart_data,
-        trend_chart_data=trend_chart_data, # 傳遞數據
-        wordcloud=wordcloud,
-        sentiment_chart_data=sentiment_chart_data, # 傳遞數據
-        sentiment_stats=sentiment_stats,
-        sources=sources,
+
+def import_time_report(warm=True):
+    """
+    以 python -X importtime 在子行程匯入本模組，依頂層套件彙總匯入耗時
+    :param warm: 是否一併計入 warm_up() 載入的延遲匯入套件
+    :return: (啟動耗時列表, 預熱耗時列表)，每項為 (套件名稱, 秒)，依耗時由大到小排序
+    """
+    import subprocess
+
+    module_name = os.path.splitext(os.path.basename(__file__))[0]
+    marker = "--- warm-up ---"
+    code = f"import {module_name}"
+    if warm:
+        code += f"; import sys; print({marker!r}, file=sys.stderr); {module_name}.warm_up()"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
     )
 
+    phases = [Counter(), Counter()]
+    phase = 0
+    for line in result.stderr.splitlines():
+        if line.strip() == marker:
+            phase = 1
+            continue
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, _cumulative, name = line[len("import time:") :].split("|")
+            package = name.strip().split(".")[0]
+            phases[phase][package] += int(self_us) / 1e6
+        except ValueError:
+            continue
+    return tuple(counts.most_common() for counts in phases)
 
-@app.route("/download/<filename>")
-def download(filename):
-    return send_file(os.path.join("static", filename), as_attachment=True)
+
+def print_import_time_report(limit=15):
+    boot, warm = import_time_report()
+    for title, rows in (("啟動時匯入", boot), ("延遲匯入（預熱）", warm)):
+        print(f"📦 {title}：共 {sum(seconds for _, seconds in rows):.2f} 秒")
+        for package, seconds in rows[:limit]:
+            print(f"   {package:<24} {seconds * 1000:8.1f} ms")
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    if "--import-report" in sys.argv:
+        print_import_time_report()
+    elif "--memory-report" in sys.argv:
+        # python app.py --memory-report <gunicorn master 的 PID>
+        args = sys.argv[sys.argv.index("--memory-report") + 1 :]
+        print_memory_report(int(args[0]) if args else os.getpid())
+    else:
+        app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,505 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+離線效能測試：以本機的 Google News RSS 模擬伺服器取代真正的 feed，量測各階段的耗時
+
+用法：
+    python benchmark.py run [--items 100] [--days 7] [--cap 100] [--latency 0.05] [--jitter 0.02]
+                            [--repeat 5] [--only fetch_cold,scrape_cold]
+                            [--output 結果.json] [--baseline 舊結果.json]
+    python benchmark.py compare 舊結果.json 新結果.json [--threshold 0.1]
+    python benchmark.py serve [--port 8765] [--items 100]      # 只啟動 RSS 模擬伺服器
+
+- 所有快取（文章庫、RSS 快取、情感分析快取、產出檔）都放在暫存資料夾，不影響 cache/
+- 名稱以 _cold 結尾的項目每次量測前都會清空相關快取，_warm 則在快取已填滿時量測
+- 結果以 JSON 保存（預設 cache/benchmarks/），compare 會依中位數比較兩次的結果
+"""
+
+import argparse
+import atexit
+import calendar
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from email.utils import formatdate
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# 🔧 匯入 app 前先把所有快取指到暫存資料夾
+BENCH_DIR = tempfile.mkdtemp(prefix="news-bench-")
+atexit.register(shutil.rmtree, BENCH_DIR, True)
+for name, default in {
+    "ARTICLE_STORE_PATH": os.path.join(BENCH_DIR, "articles.sqlite3"),
+    "SENTIMENT_CACHE_PATH": os.path.join(BENCH_DIR, "sentiment.sqlite3"),
+    "RESULT_SET_DIR": os.path.join(BENCH_DIR, "results"),
+    "ARTIFACT_DIR": os.path.join(BENCH_DIR, "artifacts"),
+    "SINGLEFLIGHT_DIR": os.path.join(BENCH_DIR, "inflight"),
+    "METRICS_DIR": os.path.join(BENCH_DIR, "metrics"),
+}.items():
+    os.environ[name] = default
+
+import app
+
+BENCH_OUTPUT_DIR = os.path.join("cache", "benchmarks")
+BENCH_KEYWORD = "台積電 半導體 人工智慧"
+
+# 模擬標題用的詞彙（含正負面用語，讓情感分析與詞雲有實際的工作量）
+SUBJECTS = ["台積電", "半導體", "人工智慧", "聯發科", "鴻海", "央行", "立法院", "颱風", "股市", "電動車"]
+EVENTS = [
+    "營收創新高",
+    "擴大投資先進製程",
+    "獲利優於預期",
+    "股價重挫",
+    "面臨供應鏈危機",
+    "宣布裁員",
+    "發表新一代晶片",
+    "召開法說會",
+    "遭到監管調查",
+    "訂單能見度提升",
+    "出口表現疲弱",
+    "與國際大廠合作",
+]
+DETAILS = ["分析師看好後市", "市場憂心需求放緩", "外資連續賣超", "法人調升目標價", "專家提醒風險", "民眾反應熱烈"]
+SOURCES = ["中央社", "聯合新聞網", "自由時報", "經濟日報", "工商時報", "鉅亨網", "TVBS新聞網", "ETtoday"]
+
+
+def split_search_operators(query):
+    """
+    將查詢字串拆成關鍵字與發布時間的範圍 [起, 迄)（UTC 時間戳記，沒有指定時為 None）
+    after: / before: 與 Google News 一樣不包含指定的那天
+    """
+    terms, bounds = [], {"after": None, "before": None}
+    for term in query.split():
+        name, _, value = term.partition(":")
+        if name in bounds and value:
+            day = date.fromisoformat(value) + timedelta(days=1 if name == "after" else 0)
+            bounds[name] = calendar.timegm(day.timetuple())
+        else:
+            terms.append(term)
+    return " ".join(terms), bounds["after"], bounds["before"]
+
+
+def build_fixture_feed(query, items, days=7, now=None, cap=None):
+    """
+    產生與 Google News 格式相同的 RSS（標題後綴來源、description 為 HTML、含 source 標籤）
+    同一個關鍵字每次產生相同的內容，發布時間平均分布在最近 days 天內
+    查詢字串中的 after: / before: 會篩選發布日期，並與 Google News 一樣最多回傳 cap 則（由新到舊）
+    """
+    now = time.time() if now is None else now
+    keyword, after_ts, before_ts = split_search_operators(query)
+    rng = random.Random(zlib.crc32(keyword.encode("utf-8")))
+    terms = keyword.split() or ["新聞"]
+    entries = []
+    for i in range(items):
+        source = rng.choice(SOURCES)
+        title = f"{rng.choice(terms)}{rng.choice(SUBJECTS)}{rng.choice(EVENTS)}，{rng.choice(DETAILS)}"
+        article_id = f"CBMi{zlib.crc32(f'{keyword}-{i}'.encode('utf-8')):08x}{i:05d}"
+        link = f"https://news.google.com/rss/articles/{article_id}?oc=5"
+        published = now - (i + 0.5) * days * 86400 / max(items, 1)
+        if after_ts is not None and published < after_ts or before_ts is not None and published >= before_ts:
+            continue
+        if cap is not None and len(entries) >= cap:
+            break
+        description = (
+            f'<a href="{link}" target="_blank">{escape(title)}</a>&nbsp;&nbsp;'
+            f'<font color="#6f6f6f">{escape(source)}</font>'
+        )
+        entries.append(
+            f"<item><title>{escape(title)} - {escape(source)}</title><link>{link}</link>"
+            f'<guid isPermaLink="false">{article_id}</guid>'
+            f"<pubDate>{formatdate(published, usegmt=True)}</pubDate>"
+            f"<description>{escape(description)}</description>"
+            f'<source url="https://example.com/{zlib.crc32(source.encode("utf-8")):x}">{escape(source)}</source>'
+            f"</item>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f"<title>\"{escape(query)}\" - Google News</title>"
+        f"<link>https://news.google.com/search?q={escape(query)}</link>"
+        f"{''.join(entries)}</channel></rss>"
+    ).encode("utf-8")
+
+
+class RssFixtureServer:
+    """
+    本機 RSS 模擬伺服器：依查詢字串 q 回傳 build_fixture_feed() 產生的 feed
+    每個請求延遲 latency 秒再加上 0 到 jitter 秒的隨機延遲，模擬真實的網路往返
+    """
+
+    def __init__(self, items=100, latency=0.0, jitter=0.0, host="127.0.0.1", port=0, days=7, cap=None):
+        self.items = items
+        self.days = days
+        self.cap = app.RSS_ITEM_CAP if cap is None else cap
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._feeds = {}
+        self._lock = threading.Lock()
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlsplit(self.path).query).get("q", [""])[0]
+                body = fixture.feed(query)
+                delay = fixture.latency + random.uniform(0, fixture.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/rss+xml; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/rss/search"
+
+    def feed(self, query):
+        # 發布時間以伺服器啟動時間為準，同一次執行中內容固定
+        with self._lock:
+            self.requests += 1
+            body = self._feeds.get(query)
+            if body is None:
+                body = self._feeds[query] = build_fixture_feed(
+                    query, self.items, self.days, now=self._started, cap=self.cap
+                )
+            return body
+
+    def start(self):
+        self._started = time.time()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def reset_caches(*names):
+    """把指定的快取換成空的（文章庫、RSS 快取、情感分析快取、產出檔、結果集、合併請求的共用結果）"""
+    fresh_dir = tempfile.mkdtemp(dir=BENCH_DIR)
+    if "feed" in names:
+        app.feed_cache = app.FeedCache(
+            app.FEED_CACHE_TTL, app.FEED_CACHE_MAX_ENTRIES, app.FEED_CACHE_MAX_BYTES
+        )
+    if "articles" in names:
+        app.article_store = app.ArticleStore(
+            os.path.join(fresh_dir, "articles.sqlite3"), app.ARTICLE_STORE_REFRESH
+        )
+    if "sentiment" in names:
+        app.sentiment_cache = app.SentimentCache(os.path.join(fresh_dir, "sentiment.sqlite3"))
+    if "artifacts" in names:
+        shutil.rmtree(app.artifacts.directory, ignore_errors=True)
+    if "results" in names:
+        app.result_sets = app.ResultSetStore(os.path.join(fresh_dir, "results"), app.RESULT_SET_TTL)
+    if "search" in names:
+        app.search_cache.clear()
+    if "inflight" in names:
+        # 合併請求會在短時間內共用剛完成的結果，連續量測時必須清掉
+        app.singleflight = app.SingleFlight(
+            os.path.join(fresh_dir, "inflight"), app.SINGLEFLIGHT_WAIT, app.SINGLEFLIGHT_GRACE
+        )
+
+
+@contextlib.contextmanager
+def quiet(enabled=True):
+    """量測時隱藏 app 的進度訊息"""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def measure(fn, repeat, warmup=1, setup=None, verbose=False):
+    """
+    執行 fn() repeat 次並回傳每次的耗時（秒）；setup() 在每次執行前呼叫，不計入耗時
+    warmup 次的預熱結果不計入（例如行程池啟動、延遲匯入）
+    """
+    runs = []
+    for i in range(warmup + repeat):
+        if setup is not None:
+            setup()
+        with quiet(not verbose):
+            started = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - started
+        if i >= warmup:
+            runs.append(elapsed)
+    return runs
+
+
+def summarize(runs, items=None):
+    summary = {
+        "runs": [round(run, 6) for run in runs],
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.fmean(runs),
+        "stdev": statistics.stdev(runs) if len(runs) > 1 else 0.0,
+    }
+    if items:
+        summary["items"] = items
+        summary["per_item_ms"] = summary["median"] / items * 1000
+    return summary
+
+
+def fixture_articles(keyword, items):
+    """直接解析模擬 feed 產生 NewsArticle 列表（不經過網路與文章庫）"""
+    feed = app.parse_feed(build_fixture_feed(keyword, items))
+    return app.feed_to_news_items(feed, keyword, date(2000, 1, 1), date(2100, 1, 1))
+
+
+def search_window(days=7):
+    today = datetime.now(timezone.utc).date()
+    return today - timedelta(days=days), today
+
+
+def run_benchmarks(args):
+    """執行所有（或 --only 指定的）效能測試項目，回傳 {項目名稱: 統計}"""
+    start_date, end_date = search_window(args.days)
+    keywords = app.parse_keywords(BENCH_KEYWORD)
+    articles = fixture_articles(keywords[0], args.items)
+    with quiet(not args.verbose):
+        rows = [article.to_dict() for article in app.analyze_news_sentiment(list(articles))]
+    client = app.app.test_client()
+    form = {
+        "keyword": BENCH_KEYWORD,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "logic": "OR",
+    }
+
+    feed_data = build_fixture_feed(keywords[0], args.items)
+
+    def fetch():
+        app.fetch_rss_news(BENCH_KEYWORD, start_date, end_date, "OR")
+
+    def parse_stream():
+        app.parse_feed(feed_data)
+
+    def parse_feedparser():
+        list(app.iter_feed_entries(app.feedparser.parse(feed_data)))
+
+    def sentiment():
+        app.analyze_news_sentiment(fixture_articles(keywords[0], args.items))
+
+    def wordcloud():
+        app.generate_word_cloud([article.title for article in articles])
+
+    def export_xlsx():
+        app.write_xlsx(rows, os.path.join(BENCH_DIR, "export.xlsx"))
+
+    def scrape():
+        response = client.post("/scrape", data=form)
+        assert response.status_code == 200, response.status_code
+
+    benchmarks = {
+        "fetch_cold": (fetch, lambda: reset_caches("feed", "articles"), len(keywords)),
+        "fetch_warm": (fetch, None, len(keywords)),
+        "parse_stream": (parse_stream, None, args.items),
+        "parse_feedparser": (parse_feedparser, None, args.items),
+        "sentiment_cold": (sentiment, lambda: reset_caches("sentiment"), args.items),
+        "sentiment_warm": (sentiment, None, args.items),
+        "wordcloud_cold": (wordcloud, lambda: reset_caches("artifacts"), args.items),
+        "export_xlsx": (export_xlsx, None, len(rows)),
+        "scrape_cold": (
+            scrape,
+            lambda: reset_caches("feed", "articles", "sentiment", "artifacts", "results", "inflight"),
+            None,
+        ),
+        "scrape_warm": (scrape, lambda: reset_caches("inflight"), None),
+    }
+    selected = args.only.split(",") if args.only else list(benchmarks)
+    unknown = set(selected) - set(benchmarks)
+    if unknown:
+        raise SystemExit(f"未知的測試項目: {', '.join(sorted(unknown))}（可用：{', '.join(benchmarks)}）")
+
+    results = {}
+    for name in selected:
+        fn, setup, items = benchmarks[name]
+        if name.endswith("_warm"):
+            # 先以一次完整執行填滿快取
+            with quiet(not args.verbose):
+                fn()
+        runs = measure(fn, args.repeat, warmup=args.warmup, setup=setup, verbose=args.verbose)
+        results[name] = summarize(runs, items)
+        print(f"⏱️ {name:<16} 中位數 {results[name]['median'] * 1000:9.1f} ms  (最短 {results[name]['min'] * 1000:.1f} ms)")
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare_results(baseline, current, threshold):
+    """
+    依中位數比較兩次結果，列出每個項目的變化
+    :return: 變慢超過 threshold 比例的項目名稱列表
+    """
+    regressions = []
+    print(f"{'項目':<16} {'基準 (ms)':>12} {'本次 (ms)':>12} {'變化':>9}")
+    print("-" * 56)
+    for name, result in current["benchmarks"].items():
+        old = baseline["benchmarks"].get(name)
+        if old is None:
+            print(f"{name:<16} {'-':>12} {result['median'] * 1000:12.1f} {'新增':>9}")
+            continue
+        change = result["median"] / old["median"] - 1 if old["median"] else 0.0
+        if change > threshold:
+            mark = "🔺"
+            regressions.append(name)
+        elif change < -threshold:
+            mark = "🔻"
+        else:
+            mark = "  "
+        print(
+            f"{name:<16} {old['median'] * 1000:12.1f} {result['median'] * 1000:12.1f}"
+            f" {change:+8.1%} {mark}"
+        )
+    if regressions:
+        print(f"\n⚠️ 變慢超過 {threshold:.0%} 的項目: {', '.join(regressions)}")
+    return regressions
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def cmd_run(args):
+    server = RssFixtureServer(
+        args.items, args.latency, args.jitter, days=args.days, cap=args.cap
+    ).start()
+    app.RSS_BASE_URL = server.url
+    print(
+        f"🧪 RSS 模擬伺服器: {server.url}（每個關鍵字 {args.days} 天 {args.items} 則，"
+        f"每次最多回傳 {server.cap} 則，延遲 {args.latency}+{args.jitter} 秒）"
+    )
+    try:
+        benchmarks = run_benchmarks(args)
+    finally:
+        server.stop()
+
+    result = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "items": args.items,
+            "days": args.days,
+            "cap": args.cap,
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "keyword": BENCH_KEYWORD,
+        },
+        "benchmarks": benchmarks,
+    }
+    output = args.output or os.path.join(
+        BENCH_OUTPUT_DIR, f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"💾 結果已保存: {output}")
+
+    if args.baseline:
+        print()
+        return 1 if compare_results(load_results(args.baseline), result, args.threshold) else 0
+    return 0
+
+
+def cmd_compare(args):
+    baseline, current = load_results(args.baseline), load_results(args.current)
+    if baseline.get("config") != current.get("config"):
+        print("⚠️ 兩次結果的測試設定不同，比較結果僅供參考")
+    return 1 if compare_results(baseline, current, args.threshold) else 0
+
+
+def cmd_serve(args):
+    server = RssFixtureServer(
+        args.items, args.latency, args.jitter, port=args.port, days=args.days, cap=args.cap
+    ).start()
+    print(f"🧪 RSS 模擬伺服器: {server.url}")
+    print(f"   以 RSS_BASE_URL={server.url} 啟動 app 即可改用模擬資料，Ctrl+C 結束")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Google 新聞擷取工具的離線效能測試")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_fixture_options(sub):
+        sub.add_argument("--items", type=int, default=100, help="每個關鍵字的新聞數")
+        sub.add_argument("--days", type=int, default=7, help="新聞分布（與搜尋）的天數")
+        sub.add_argument("--cap", type=int, help="每次查詢最多回傳的新聞數（預設 RSS_ITEM_CAP）")
+        sub.add_argument("--latency", type=float, default=0.05, help="每個請求的固定延遲（秒）")
+        sub.add_argument("--jitter", type=float, default=0.02, help="每個請求額外的隨機延遲上限（秒）")
+
+    run = commands.add_parser("run", help="執行效能測試")
+    add_fixture_options(run)
+    run.add_argument("--repeat", type=int, default=5, help="每個項目量測的次數")
+    run.add_argument("--warmup", type=int, default=1, help="不計入結果的預熱次數")
+    run.add_argument("--only", help="只執行指定的項目（逗號分隔）")
+    run.add_argument("--output", help="結果檔路徑（預設 cache/benchmarks/bench-時間.json）")
+    run.add_argument("--baseline", help="與此結果檔比較，有項目變慢時結束代碼為 1")
+    run.add_argument("--threshold", type=float, default=0.1, help="判定變慢的比例（預設 0.1）")
+    run.add_argument("--verbose", action="store_true", help="顯示 app 的進度訊息")
+    run.set_defaults(handler=cmd_run)
+
+    compare = commands.add_parser("compare", help="比較兩次的結果")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.1)
+    compare.set_defaults(handler=cmd_compare)
+
+    serve = commands.add_parser("serve", help="只啟動 RSS 模擬伺服器")
+    add_fixture_options(serve)
+    serve.add_argument("--port", type=int, default=8765)
+    serve.set_defaults(handler=cmd_serve)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,37 @@
+"""
+gunicorn 設定
+以 --preload 在 master 行程載入 app 並預熱模型與字體，worker fork 後以 copy-on-write 共用
+記憶體用量可用 python app.py --memory-report <master PID> 檢查
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+preload_app = True
+
+# 載入與預熱期間停用垃圾回收：回收釋放的物件會在記憶體分頁中留下空洞，
+# worker 之後配置的物件填進這些空洞，就會複製原本可以共用的分頁
+# （作法同 gc.freeze 文件的建議：master 早期停用、fork 前凍結、worker 中重新啟用）
+GC_FREEZE = os.environ.get("GC_FREEZE", "1") != "0"
+if GC_FREEZE:
+    gc.disable()
+
+
+def when_ready(server):
+    """master 完成載入、尚未 fork worker 前呼叫"""
+    import app
+
+    if os.environ.get("WARM_UP", "1") != "0":
+        app.warm_up()
+    if GC_FREEZE:
+        app.freeze_shared_memory()
+    # 預熱與凍結之後才 fork，渲染行程共用已載入的詞典與字體
+    if app.WORDCLOUD_AVAILABLE:
+        app.wordcloud_renderer.start_server()
+
+
+def post_fork(server, worker):
+    """worker fork 後呼叫：master 載入的物件已凍結，worker 自己的物件照常回收"""
+    if GC_FREEZE:
+        gc.enable()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試文章庫（SQLite）的寫入與日期範圍查詢
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, ".")
+
+import feedparser
+from app import ArticleStore
+
+print("=" * 60)
+print("🧪 文章庫功能測試")
+print("=" * 60)
+
+
+def make_feed(items):
+    xml = "".join(
+        f"<item><title>{title}</title><link>{link}</link><guid>{link}</guid>"
+        f"<pubDate>{pub}</pubDate><source url='https://example.com'>{source}</source></item>"
+        for title, link, pub, source in items
+    )
+    return feedparser.parse(f"<rss version='2.0'><channel>{xml}</channel></rss>")
+
+
+old_feed = make_feed(
+    [
+        ("舊新聞", "https://example.com/old", "Mon, 06 Oct 2025 08:00:00 GMT", "中央社"),
+        ("共同新聞", "https://example.com/shared", "Fri, 24 Oct 2025 09:00:00 GMT", "聯合新聞網"),
+    ]
+)
+new_feed = make_feed(
+    [
+        ("共同新聞（更新）", "https://example.com/shared", "Fri, 24 Oct 2025 09:00:00 GMT", "聯合新聞網"),
+        ("新新聞", "https://example.com/new", "Mon, 27 Oct 2025 12:00:00 GMT", "自由時報"),
+    ]
+)
+
+with tempfile.TemporaryDirectory() as tmp:
+    store = ArticleStore(os.path.join(tmp, "articles.sqlite3"), refresh_interval=60)
+
+    print("\n📝 寫入兩次 feed（第二次的 feed 已不包含舊新聞）：")
+    print("-" * 60)
+    print(f"是否需要補抓: {not store.is_fresh('科技')}")
+    store.upsert_feed("科技", old_feed)
+    store.upsert_feed("科技", new_feed)
+    print(f"補抓後是否仍需要補抓: {not store.is_fresh('科技')}")
+    assert store.is_fresh("科技")
+
+    print("\n📝 查詢整個十月：")
+    print("-" * 60)
+    results = store.query("科技", date(2025, 10, 1), date(2025, 10, 31))
+    for item in results:
+        print(f"{item['發布時間']}  {item['來源']}  {item['標題']}")
+    assert [item["標題"] for item in results] == ["新新聞", "共同新聞（更新）", "舊新聞"]
+
+    print("\n📝 查詢單日（日期範圍含首尾）：")
+    print("-" * 60)
+    results = store.query("科技", date(2025, 10, 6), date(2025, 10, 6))
+    print([item["標題"] for item in results])
+    assert [item["標題"] for item in results] == ["舊新聞"]
+
+    print("\n📝 查詢其他關鍵字：")
+    print("-" * 60)
+    results = store.query("財經", date(2025, 10, 1), date(2025, 10, 31))
+    print(f"結果筆數: {len(results)}")
+    assert results == []
+
+print("\n✅ 測試完成！")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試產出檔管理：內容雜湊命名、原子寫入、過期清除與依最近使用時間（LRU）淘汰
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, ".")
+
+import app
+from app import ArtifactManager
+
+print("=" * 60)
+print("🧪 產出檔管理測試")
+print("=" * 60)
+
+
+def set_age(manager, name, seconds):
+    """把檔案的最近使用時間改成 seconds 秒前"""
+    when = time.time() - seconds
+    os.utime(manager.path(name), (when, when))
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    # 測試中不啟動背景清除執行緒，改為直接呼叫 sweep()
+    manager = ArtifactManager(tmp, max_bytes=250, max_age=3600, sweep_interval=3600)
+    manager._start_sweeper = lambda: None
+
+    print("\n📝 內容雜湊命名：")
+    print("-" * 60)
+    first = manager.write_bytes("chart", b"A" * 100, "png")
+    again = manager.write_bytes("chart", b"A" * 100, "png")
+    other = manager.write_bytes("chart", b"B" * 100, "png")
+    print(first, other)
+    assert first == again != other
+    assert first.startswith("chart_") and first.endswith(".png")
+    assert sorted(os.listdir(tmp)) == sorted([first, other])
+    print("✅ 相同內容只存一份，不同內容不會互相覆蓋")
+
+    print("\n📝 原子寫入：")
+    print("-" * 60)
+    try:
+        with manager.writing("export_partial.csv") as tmp_path:
+            with open(tmp_path, "w") as f:
+                f.write("寫到一半")
+            assert not manager.exists("export_partial.csv")
+            raise RuntimeError("模擬寫入失敗")
+    except RuntimeError:
+        pass
+    print(f"寫入失敗後的檔案: {sorted(os.listdir(tmp))}")
+    assert not manager.exists("export_partial.csv")
+    assert sorted(os.listdir(tmp)) == sorted([first, other])
+    print("✅ 寫入失敗時不留下正式檔案或暫存檔")
+
+    print("\n📝 檔名檢查：")
+    print("-" * 60)
+    for name in ("../app.py", "a/b.png", ".hidden.png", "chart.PNG", "chart"):
+        assert manager.path(name) is None, name
+    assert not manager.exists("../app.py") and manager.serve("../app.py") is None
+    print("✅ 不合法的檔名一律拒絕（避免路徑穿越）")
+
+    print("\n📝 過期清除：")
+    print("-" * 60)
+    expired = manager.write_bytes("wordcloud", b"C" * 10, "png")
+    set_age(manager, expired, 7200)
+    stale_tmp = os.path.join(tmp, ".export.abc.tmp")
+    with open(stale_tmp, "wb") as f:
+        f.write(b"x")
+    os.utime(stale_tmp, (time.time() - 7200,) * 2)
+    removed = manager.sweep()
+    print(f"清除 {removed} 個檔案，剩下: {sorted(os.listdir(tmp))}")
+    assert removed == 2 and not manager.exists(expired) and not os.path.exists(stale_tmp)
+    assert manager.exists(first) and manager.exists(other)
+    print("✅ 超過 max_age 的檔案與殘留的暫存檔被刪除")
+
+    print("\n📝 超過容量時依 LRU 淘汰：")
+    print("-" * 60)
+    third = manager.write_bytes("chart", b"D" * 100, "png")
+    set_age(manager, first, 300)
+    set_age(manager, other, 200)
+    set_age(manager, third, 100)
+    assert manager.touch(first)  # 最近被讀取，變成最新
+    removed = manager.sweep()
+    print(f"清除 {removed} 個檔案，剩下: {sorted(os.listdir(tmp))}")
+    assert removed == 1 and not manager.exists(other)
+    assert manager.exists(first) and manager.exists(third)
+    print("✅ 總大小超過 max_bytes 時從最久未使用的檔案開始刪除")
+
+    print("\n📝 /artifacts/<名稱>：")
+    print("-" * 60)
+    original_artifacts, app.artifacts = app.artifacts, manager
+    client = app.app.test_client()
+    response = client.get(f"/artifacts/{first}")
+    print(f"HTTP {response.status_code}，Cache-Control: {response.headers.get('Cache-Control')}")
+    assert response.status_code == 200 and response.data == b"A" * 100
+    assert "max-age=604800" in response.headers["Cache-Control"]
+    response.close()
+    assert client.get(f"/artifacts/{other}").status_code == 404
+    print("✅ 提供現有的檔案並附上長效快取標頭，已淘汰的回應 404")
+    app.artifacts = original_artifacts
+
+print("\n✅ 測試完成！")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試日期範圍的時間窗查詢：after: / before: 運算子、時間窗切分與滿載時的細分
+"""
+
+import calendar
+import os
+import sys
+import tempfile
+import threading
+from datetime import date, timedelta
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+sys.path.insert(0, ".")
+
+import app
+from app import ArticleStore, FeedCache, build_search_query, split_date_range
+
+print("=" * 60)
+print("🧪 時間窗查詢測試")
+print("=" * 60)
+
+print("\n📝 查詢字串：")
+print("-" * 60)
+query = build_search_query("台積電", date(2024, 10, 1), date(2024, 10, 7))
+print(query)
+assert query == "台積電 after:2024-09-30 before:2024-10-08"
+assert build_search_query("台積電") == "台積電"
+assert unquote(app.build_rss_url("台積電", date(2024, 10, 1), date(2024, 10, 7))).count(query) == 1
+print("✅ 日期範圍前後各多留一天")
+
+print("\n📝 切分日期範圍：")
+print("-" * 60)
+windows = split_date_range(date(2024, 10, 1), date(2024, 10, 20), 7)
+print(windows)
+assert windows == [
+    (date(2024, 10, 1), date(2024, 10, 7)),
+    (date(2024, 10, 8), date(2024, 10, 14)),
+    (date(2024, 10, 15), date(2024, 10, 20)),
+]
+assert split_date_range(date(2024, 10, 1), date(2024, 10, 1), 7) == [(date(2024, 10, 1), date(2024, 10, 1))]
+print("✅ 時間窗首尾相接且涵蓋整個範圍")
+
+# 模擬 Google News：依 after: / before:（不含指定的那天）篩選，每次最多回傳 CAP 則（由新到舊）
+CAP = 20
+START, END = date(2024, 10, 1), date(2024, 10, 28)
+DAY_START = calendar.timegm(START.timetuple())
+# 每天 12 則，整個範圍共 336 則
+articles = [
+    (f"https://example.com/{day}-{n}", DAY_START + day * 86400 + n * 7200)
+    for day in range((END - START).days + 1)
+    for n in range(12)
+]
+queries = []
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        q = parse_qs(urlsplit(self.path).query)["q"][0]
+        queries.append(q)
+        bounds = dict(term.split(":", 1) for term in q.split() if ":" in term)
+        after = calendar.timegm((date.fromisoformat(bounds["after"]) + timedelta(days=1)).timetuple())
+        before = calendar.timegm(date.fromisoformat(bounds["before"]).timetuple())
+        matched = sorted((a for a in articles if after <= a[1] < before), key=lambda a: -a[1])
+        xml = "".join(
+            f"<item><title>時間窗 {link}</title><link>{link}</link><guid>{link}</guid>"
+            f"<pubDate>{formatdate(ts, usegmt=True)}</pubDate></item>"
+            for link, ts in matched[:CAP]
+        )
+        body = f"<rss version='2.0'><channel>{xml}</channel></rss>".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+app.RSS_BASE_URL = f"http://127.0.0.1:{server.server_port}/rss"
+app.RSS_ITEM_CAP = CAP
+app.feed_cache = FeedCache(ttl=0, max_entries=100, max_bytes=10_000_000)
+
+with tempfile.TemporaryDirectory() as tmp:
+    app.article_store = ArticleStore(os.path.join(tmp, "articles.sqlite3"), refresh_interval=300)
+
+    print("\n📝 滿載的時間窗自動細分：")
+    print("-" * 60)
+    news = app.fetch_rss_news("時間窗", START, END)
+    print(f"查詢 {len(queries)} 次，取得 {len(news)} 則")
+    assert len(news) == len(articles)
+    assert len({item.link for item in news}) == len(articles)
+    assert f"時間窗 after:2024-10-21 before:{(END + timedelta(days=1)).isoformat()}" in queries
+    print("✅ 細分後涵蓋範圍內的所有新聞")
+
+    print("\n📝 已抓過的時間窗不再查詢：")
+    print("-" * 60)
+    count = len(queries)
+    again = app.fetch_rss_news("時間窗", START, END)
+    print(f"新增查詢 {len(queries) - count} 次，取得 {len(again)} 則")
+    assert len(queries) == count and len(again) == len(articles)
+    print("✅ 直接由文章庫回答")
+
+    print("\n📝 時間窗數量上限：")
+    print("-" * 60)
+    app.article_store = ArticleStore(os.path.join(tmp, "limited.sqlite3"), refresh_interval=300)
+    app.RSS_MAX_WINDOWS = 4
+    queries.clear()
+    limited = app.fetch_rss_news("時間窗", START, END)
+    print(f"查詢 {len(queries)} 次，取得 {len(limited)} 則")
+    assert len(queries) <= 4 and 0 < len(limited) < len(articles)
+    print("✅ 達到上限後不再細分")
+
+    print("\n📝 很長的日期範圍：")
+    print("-" * 60)
+    app.article_store = ArticleStore(os.path.join(tmp, "long.sqlite3"), refresh_interval=300)
+    app.RSS_MAX_WINDOWS = 64
+    queries.clear()
+    long_range = app.fetch_rss_news("時間窗", date(2000, 1, 1), date(2026, 10, 18))
+    print(f"查詢 {len(queries)} 次，取得 {len(long_range)} 則")
+    assert len(queries) <= 64 and len(long_range) > 0
+    assert any(q.startswith("時間窗 after:1999-12-31 ") for q in queries)
+    assert any(q.endswith(" before:2026-10-19") for q in queries)
+    print("✅ 一開始的時間窗加寬，數量同樣不超過上限")
+
+server.shutdown()
+
+print("\n" + "=" * 60)
+print("✅ 所有測試通過")
+print("=" * 60)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試跨關鍵字去重：連結正規化、重複新聞合併關鍵字與版本、串流時跨批次去重
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, ".")
+
+import app
+from app import (
+    ArticleStore,
+    FeedCache,
+    ResultSetStore,
+    dedup_news_items,
+    make_news_item,
+    normalize_link,
+)
+
+print("=" * 60)
+print("🧪 跨關鍵字去重測試")
+print("=" * 60)
+
+print("\n📝 連結正規化：")
+print("-" * 60)
+cases = [
+    ("https://Example.com/news/1/", "https://example.com/news/1"),
+    ("https://example.com/news/1?utm_source=rss&utm_medium=feed", "https://example.com/news/1"),
+    ("https://example.com/news/1?oc=5&fbclid=abc#comments", "https://example.com/news/1"),
+    ("https://example.com/news?b=2&a=1&gclid=x", "https://example.com/news?a=1&b=2"),
+    ("  https://example.com  ", "https://example.com/"),
+    ("https://example.com/news?id=&ref=home", "https://example.com/news?id="),
+]
+for link, expected in cases:
+    print(f"{link!r} -> {normalize_link(link)}")
+    assert normalize_link(link) == expected, (link, normalize_link(link))
+# 路徑大小寫與一般查詢參數會保留
+assert normalize_link("https://example.com/News?id=1") != normalize_link("https://example.com/news?id=1")
+assert normalize_link("https://example.com/a?id=1") != normalize_link("https://example.com/a?id=2")
+print("✅ 移除追蹤參數、片段與結尾斜線，保留其他參數")
+
+
+def item(title, link, kw, edition=None):
+    return make_news_item(title, link, 1_700_000_000, "來源", "", kw, edition=edition)
+
+
+print("\n📝 合併關鍵字與版本：")
+print("-" * 60)
+items = [
+    item("台積電 擴產", "https://example.com/1?utm_source=a", "台積電", "TW"),
+    item("台積電 擴產", "https://example.com/1/", "半導體", "TW"),
+    item("台積電 擴產", "https://EXAMPLE.com/1#top", "台積電", "US"),
+    item("聯發科 新品", "https://example.com/2", "聯發科", "TW"),
+]
+unique, dropped = dedup_news_items(items)
+for news in unique:
+    print(f"{news.title:<8} {news['關鍵字']} {news['版本']}")
+assert dropped == 2 and len(unique) == 2
+assert unique[0] is items[0]
+assert unique[0]["關鍵字"] == ["台積電", "半導體"]
+assert unique[0]["版本"] == ["TW", "US"]
+assert unique[1]["關鍵字"] == ["聯發科"]
+print("✅ 保留第一次出現的那筆，關鍵字與版本依出現順序合併且不重複")
+
+print("\n📝 字串形式的關鍵字：")
+print("-" * 60)
+rows = [
+    {"標題": "A", "連結": "https://example.com/a", "關鍵字": "甲"},
+    {"標題": "A", "連結": "https://example.com/a?ref=x", "關鍵字": ["乙", "甲"]},
+]
+unique, dropped = dedup_news_items(rows)
+print(unique)
+assert dropped == 1 and unique[0]["關鍵字"] == ["甲", "乙"]
+print("✅ 單一關鍵字字串也會轉成列表")
+
+print("\n📝 串流時跨批次去重：")
+print("-" * 60)
+seen = {}
+first, dropped_first = dedup_news_items([item("共同新聞", "https://example.com/s", "台積電", "TW")], seen)
+second, dropped_second = dedup_news_items(
+    [
+        item("共同新聞", "https://example.com/s?utm_campaign=x", "聯發科", "HK"),
+        item("聯發科 獨家", "https://example.com/m", "聯發科", "HK"),
+    ],
+    seen,
+)
+print(f"第一批 {len(first)} 筆，第二批 {len(second)} 筆（合併 {dropped_second} 筆）")
+assert dropped_first == 0 and dropped_second == 1
+assert [news.title for news in second] == ["聯發科 獨家"]
+# 後面批次的關鍵字與版本合併到先前已產生的那一筆
+assert first[0]["關鍵字"] == ["台積電", "聯發科"] and first[0]["版本"] == ["TW", "HK"]
+print("✅ 已出現過的新聞不再產生，關鍵字與版本合併到先前那一筆")
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        edition = parse_qs(urlsplit(self.path).query)["gl"][0]
+        # 香港版較晚回應，共同新聞會先以台灣版送出，之後才合併香港版
+        time.sleep(0.3 if edition == "HK" else 0)
+        ts = time.time() - 3600
+        items = [
+            ("台積電 共同新聞", f"https://example.com/shared?utm_source={edition}"),
+            (f"台積電 {edition} 獨家", f"https://example.com/{edition}"),
+        ]
+        xml = "".join(
+            f"<item><title>{title}</title><link>{link}</link><guid>{edition}-{link}</guid>"
+            f"<pubDate>{formatdate(ts, usegmt=True)}</pubDate></item>"
+            for title, link in items
+        )
+        body = f"<rss version='2.0'><channel>{xml}</channel></rss>".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+print("\n📝 串流模式的結果集包含之後合併的版本：")
+print("-" * 60)
+server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+app.RSS_BASE_URL = f"http://127.0.0.1:{server.server_port}/rss"
+app.feed_cache = FeedCache(ttl=0, max_entries=100, max_bytes=10_000_000)
+today = date.today()
+with tempfile.TemporaryDirectory() as tmp:
+    app.article_store = ArticleStore(os.path.join(tmp, "articles.sqlite3"), refresh_interval=300)
+    app.result_sets = ResultSetStore(os.path.join(tmp, "results"), 3600)
+    response = app.app.test_client().get(
+        "/scrape/stream",
+        query_string=[
+            ("keyword", "台積電"),
+            ("start_date", (today - timedelta(days=1)).isoformat()),
+            ("end_date", today.isoformat()),
+            ("editions", "TW"),
+            ("editions", "HK"),
+        ],
+    )
+    events = []
+    for chunk in response.get_data(as_text=True).strip().split("\n\n"):
+        event_line, data_line = chunk.split("\n")
+        events.append((event_line[len("event: ") :], json.loads(data_line[len("data: ") :])))
+    streamed = [row for name, data in events if name == "articles" for row in data]
+    done = events[-1][1]
+    print(f"事件: {[name for name, _ in events]}，共送出 {len(streamed)} 筆")
+    assert events[-1][0] == "done" and done["duplicates"] == 1
+    shared_streamed = next(row for row in streamed if "共同新聞" in row["標題"])
+    assert shared_streamed["版本"] == ["TW"]
+    saved = app.result_sets.load(done["result_id"])
+    shared_saved = next(row for row in saved if "共同新聞" in row["標題"])
+    print(f"送出時的版本 {shared_streamed['版本']}，結果集中的版本 {shared_saved['版本']}")
+    assert len(saved) == len(streamed) == 3
+    assert shared_saved["版本"] == ["TW", "HK"]
+server.shutdown()
+print("✅ 結果集以合併後的新聞保存，頁面完成後由 /api/results 重新載入")
+
+print("\n✅ 測試完成！")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試多版本搜尋：各版本的網址參數、（關鍵字 × 版本）並行抓取、版本標記與跨版本去重
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from werkzeug.datastructures import MultiDict
+
+sys.path.insert(0, ".")
+
+import app
+from app import ArticleStore, FeedCache, parse_editions, parse_search_form
+
+print("=" * 60)
+print("🧪 多版本搜尋測試")
+print("=" * 60)
+
+print("\n📝 解析版本代碼：")
+print("-" * 60)
+assert parse_editions("tw, hk,TW") == (("TW", "HK"), None)
+assert parse_editions(["US", "GB,SG"]) == (("US", "GB", "SG"), None)
+assert parse_editions(None) == (app.DEFAULT_EDITIONS, None)
+editions, error = parse_editions("TW,XX")
+print(error)
+assert editions is None and "XX" in error
+params, error = parse_search_form(
+    MultiDict(
+        [("keyword", "台積電"), ("start_date", "2024-10-01"), ("end_date", "2024-10-07"),
+         ("editions", "TW"), ("editions", "US")]
+    )
+)
+assert error is None and params["editions"] == ("TW", "US")
+print("✅ 版本代碼解析正確（表單多選與逗號分隔皆可）")
+
+print("\n📝 各版本的網址參數：")
+print("-" * 60)
+for code in ("TW", "HK", "US"):
+    url = app.build_rss_url("台積電", edition=code)
+    print(f"{code}: {url}")
+    query = parse_qs(urlsplit(url).query)
+    assert query["gl"] == [code] and query["ceid"] == [app.NEWS_EDITIONS[code]["ceid"]]
+print("✅ 網址帶有對應版本的 hl / gl / ceid")
+
+LATENCY = 0.3
+today = date.today()
+requests = []
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        keyword = query["q"][0].split()[0]
+        edition = query["gl"][0]
+        requests.append((keyword, edition))
+        time.sleep(LATENCY)
+        ts = time.time() - 3600
+        # 每個版本各有一則獨有的新聞，另有一則各版本共同的新聞
+        items = [
+            (f"{keyword} {edition} 新聞", f"https://example.com/{edition}/{keyword}"),
+            (f"{keyword} 共同新聞", f"https://example.com/shared/{keyword}?utm_source={edition}"),
+        ]
+        xml = "".join(
+            f"<item><title>{title}</title><link>{link}</link><guid>{edition}-{link}</guid>"
+            f"<pubDate>{formatdate(ts, usegmt=True)}</pubDate></item>"
+            for title, link in items
+        )
+        body = f"<rss version='2.0'><channel>{xml}</channel></rss>".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+app.RSS_BASE_URL = f"http://127.0.0.1:{server.server_port}/rss"
+app.feed_cache = FeedCache(ttl=0, max_entries=100, max_bytes=10_000_000)
+
+with tempfile.TemporaryDirectory() as tmp:
+    app.article_store = ArticleStore(os.path.join(tmp, "articles.sqlite3"), refresh_interval=300)
+
+    print("\n📝 並行抓取（關鍵字 × 版本）：")
+    print("-" * 60)
+    started = time.perf_counter()
+    news = app.fetch_rss_news(
+        "台積電 聯發科", today - timedelta(days=1), today, "OR", ("TW", "HK", "US")
+    )
+    elapsed = time.perf_counter() - started
+    print(f"{len(requests)} 個 feed，耗時 {elapsed:.2f} 秒（每個 feed 延遲 {LATENCY} 秒）")
+    assert sorted(requests) == sorted(
+        (kw, code) for kw in ("台積電", "聯發科") for code in ("TW", "HK", "US")
+    )
+    assert elapsed < LATENCY * 3
+    print("✅ 所有 feed 同時抓取，耗時接近單一 feed")
+
+    print("\n📝 版本標記與跨版本去重：")
+    print("-" * 60)
+    for item in news:
+        print(f"{item.title:<16} {item['版本']}")
+    assert len(news) == 2 * 3 + 2
+    shared = [item for item in news if "共同新聞" in item.title]
+    assert all(item.editions == ["TW", "HK", "US"] for item in shared)
+    assert {tuple(item.editions) for item in news if item not in shared} == {("TW",), ("HK",), ("US",)}
+    assert "版本" in app.EXPORT_COLUMNS
+    assert next(app.iter_export_rows([shared[0].to_dict()]))[app.EXPORT_COLUMNS.index("版本")] == "TW、HK、US"
+    print("✅ 每則新聞標記來源版本，相同連結合併成一筆")
+
+    print("\n📝 文章庫依版本區分：")
+    print("-" * 60)
+    requests.clear()
+    only_hk = app.fetch_rss_news("台積電", today - timedelta(days=1), today, "OR", ("HK",))
+    print([item.title for item in only_hk])
+    assert requests == [] and len(only_hk) == 2
+    assert all(item.editions == ["HK"] for item in only_hk)
+    print("✅ 只查詢指定的版本，且直接由文章庫回答")
+
+server.shutdown()
+
+print("\n" + "=" * 60)
+print("✅ 所有測試通過")
+print("=" * 60)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試 RSS feed 快取（TTL、LRU 淘汰與條件式請求）
+"""
+
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, ".")
+
+import app
+from app import FeedCache
+
+print("=" * 60)
+print("🧪 RSS 快取功能測試")
+print("=" * 60)
+
+# 測試 LRU 淘汰（依筆數與位元組數）
+print("\n📝 測試 LRU 淘汰：")
+print("-" * 60)
+
+cache = FeedCache(ttl=60, max_entries=2, max_bytes=100)
+cache.store("a", "feed-a", None, None, 10)
+cache.store("b", "feed-b", None, None, 10)
+cache.lookup("a")  # a 變成最近使用
+cache.store("c", "feed-c", None, None, 10)
+print(f"超過筆數上限後的項目: {list(cache._entries)}")
+assert list(cache._entries) == ["a", "c"]
+
+cache.store("d", "feed-d", None, None, 95)
+print(f"超過位元組上限後的項目: {list(cache._entries)}")
+assert list(cache._entries) == ["d"]
+print(f"統計: {cache.stats()}")
+
+# 測試 TTL 過期
+print("\n📝 測試 TTL 過期：")
+print("-" * 60)
+
+cache = FeedCache(ttl=0, max_entries=10, max_bytes=1000)
+cache.store("a", "feed-a", '"etag-a"', None, 10)
+entry, fresh = cache.lookup("a")
+print(f"TTL=0 時是否仍新鮮: {fresh}，保留的 ETag: {entry['etag']}")
+assert entry is not None and not fresh
+
+# 測試條件式請求（304 不重新解析）
+print("\n📝 測試條件式請求：")
+print("-" * 60)
+
+RSS = (
+    "<?xml version='1.0' encoding='UTF-8'?><rss version='2.0'><channel>"
+    "<item><title>測試新聞</title><link>https://example.com/1</link>"
+    "<pubDate>Mon, 27 Oct 2025 12:00:00 GMT</pubDate></item>"
+    "</channel></rss>"
+).encode("utf-8")
+request_log = []
+user_agents = []
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        request_log.append(self.headers.get("If-None-Match"))
+        user_agents.append(self.headers.get("User-Agent"))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(RSS)))
+        self.end_headers()
+        self.wfile.write(RSS)
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+url = f"http://127.0.0.1:{server.server_port}/rss"
+
+app.feed_cache = FeedCache(ttl=0, max_entries=10, max_bytes=10_000)
+first = app.fetch_feed(url)
+second = app.fetch_feed(url)
+server.shutdown()
+
+print(f"請求標頭 If-None-Match: {request_log}")
+print(f"快取統計: {app.feed_cache.stats()}")
+assert request_log == [None, '"v1"']
+assert second is first
+assert app.feed_cache.stats()["revalidations"] == 1
+
+print(f"請求標頭 User-Agent: {user_agents}")
+assert user_agents == [app._http.headers["User-Agent"]] * 2
+print("✅ 條件式請求仍帶有連線池的 User-Agent")
+
+print("\n✅ 測試完成！")
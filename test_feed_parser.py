@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試 RSS 串流解析器：與 feedparser 結果一致、日期解析、提早略過範圍外的項目與格式錯誤時的退回
+"""
+
+import calendar
+import sys
+
+sys.path.insert(0, ".")
+
+import feedparser
+from app import iter_feed_entries, parse_feed, parse_pub_date
+
+print("=" * 60)
+print("🧪 RSS 串流解析器測試")
+print("=" * 60)
+
+RSS = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel><title>"台積電" - Google News</title>
+<item><title>台積電營收創新高 &amp; 股價上漲 - 中央社</title>
+<link>https://news.google.com/rss/articles/CBMiA?oc=5</link>
+<guid isPermaLink="false">CBMiA</guid>
+<pubDate>Mon, 27 Oct 2025 12:00:00 GMT</pubDate>
+<description><![CDATA[<a href="https://example.com/a">台積電營收創新高</a>&nbsp;&nbsp;<font color="#6f6f6f">中央社</font>]]></description>
+<source url="https://www.cna.com.tw">中央社</source></item>
+<item><title>半導體出口成長</title>
+<link>https://example.com/b</link>
+<pubDate>Tue, 28 Oct 2025 08:30:00 +0800</pubDate>
+<description>&lt;b&gt;出口&lt;/b&gt; 成長</description></item>
+<item><title>沒有發布時間的新聞</title><link>https://example.com/c</link></item>
+<item><title>舊新聞</title><link>https://example.com/d</link>
+<pubDate>Wed, 01 Jan 2025 00:00:00 GMT</pubDate></item>
+</channel></rss>""".encode("utf-8")
+
+# 測試與 feedparser 的結果一致
+print("\n📝 與 feedparser 比較：")
+print("-" * 60)
+fast = parse_feed(RSS)
+slow = list(iter_feed_entries(feedparser.parse(RSS)))
+for entry in fast:
+    print(entry)
+assert fast == slow
+assert fast[0][1] == "台積電營收創新高 & 股價上漲 - 中央社"
+assert fast[1][0] == "https://example.com/b" and fast[1][4] == "未知"
+
+# 測試日期解析
+print("\n📝 測試日期解析：")
+print("-" * 60)
+for text in [
+    "Mon, 27 Oct 2025 12:00:00 GMT",
+    "27 Oct 2025 20:00 +0800",
+    "Mon, 27 Oct 2025 07:00:00 EST",
+]:
+    ts = parse_pub_date(text)
+    print(f"{text:<32} → {ts}")
+    assert ts == calendar.timegm((2025, 10, 27, 12, 0, 0))
+assert parse_pub_date("不是日期") is None
+
+# 測試提早略過範圍外的項目
+print("\n📝 測試日期範圍：")
+print("-" * 60)
+start_ts = calendar.timegm((2025, 10, 1, 0, 0, 0))
+in_range = parse_feed(RSS, start_ts=start_ts, end_ts=calendar.timegm((2025, 10, 29, 0, 0, 0)))
+print(f"範圍內的項目: {[entry[1] for entry in in_range]}")
+assert [entry[2] for entry in in_range] == [
+    "https://news.google.com/rss/articles/CBMiA?oc=5",
+    "https://example.com/b",
+]
+
+# 測試格式錯誤與非 RSS 時改用 feedparser
+print("\n📝 測試退回 feedparser：")
+print("-" * 60)
+broken = RSS.replace(b"&amp; ", b"& ")
+entries = parse_feed(broken)
+print(f"格式錯誤的 feed 解析出 {len(entries)} 則")
+assert len(entries) == 3
+
+atom = """<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom"><entry><title>Atom 新聞</title>
+<link href="https://example.com/atom"/><id>atom-1</id>
+<published>2025-10-27T12:00:00Z</published></entry></feed>""".encode("utf-8")
+entries = parse_feed(atom)
+print(f"Atom feed 解析結果: {entries}")
+assert entries and entries[0][0] == "atom-1"
+
+print("\n✅ 測試完成！")
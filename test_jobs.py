@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試背景擷取工作：階段進度、排隊上限、過期清除，以及輪詢請求被分到其他 worker 的情況
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, ".")
+
+import app
+from app import JobManager, JobQueueFull
+
+print("=" * 60)
+print("🧪 背景擷取工作測試")
+print("=" * 60)
+
+release = threading.Event()
+
+
+def fake_scrape(keyword, start_date, end_date, logic="AND", editions=(), on_stage=None, delay=0):
+    """模擬 run_shared_scrape：依序回報各階段，等到 release 才完成"""
+    for stage in app.PIPELINE_STAGES:
+        if on_stage:
+            on_stage(stage)
+    if delay:
+        time.sleep(delay)
+    else:
+        release.wait(10)
+    if keyword == "失敗":
+        raise RuntimeError("模擬失敗")
+    return {"keyword": keyword, "count": 3, "results": [{"標題": keyword}]}
+
+
+def wait_status(manager, job_id, expected, limit=10, stage=None):
+    deadline = time.time() + limit
+    while time.time() < deadline:
+        status = manager.status(job_id)
+        if status and status["status"] == expected and (stage is None or status["stage"] == stage):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"{job_id} 在 {limit} 秒內沒有變成 {expected}: {manager.status(job_id)}")
+
+
+def run_other_worker(directory, keyword, delay, queue):
+    """在另一個行程（模擬另一個 gunicorn worker）提交工作並等待完成"""
+    app.run_shared_scrape = lambda **params: fake_scrape(**params, delay=delay)
+    manager = JobManager(directory, workers=1, max_pending=5, ttl=600, sweep_interval=600)
+    job_id = manager.submit({"keyword": keyword, "start_date": None, "end_date": None})
+    queue.put(job_id)
+    wait_status(manager, job_id, "done", limit=delay + 10)
+
+
+original_scrape, original_manager = app.run_shared_scrape, app.job_manager
+app.run_shared_scrape = fake_scrape
+params = {"keyword": "台積電", "start_date": None, "end_date": None}
+
+with tempfile.TemporaryDirectory() as tmp:
+    print("\n📝 工作生命週期：")
+    print("-" * 60)
+    manager = JobManager(tmp, workers=1, max_pending=2, ttl=600, sweep_interval=600)
+    job_id = manager.submit(params)
+    last_stage = list(app.PIPELINE_STAGES)[-1]
+    status = wait_status(manager, job_id, "running", stage=last_stage)
+    print(f"執行中: 階段 {status['stage']}，進度 {status['progress']:.2f}")
+    assert status["completed_stages"] == list(app.PIPELINE_STAGES)[:-1]
+    assert 0 < status["progress"] < 1
+    release.set()
+    status = wait_status(manager, job_id, "done")
+    print(f"完成: {status['completed_stages']}")
+    assert status["completed_stages"] == list(app.PIPELINE_STAGES)
+    assert status["progress"] == 1.0 and status["finished_at"] is not None
+    assert manager.result(job_id)["count"] == 3
+    print("✅ 依序回報各階段，完成後可取得結果")
+
+    print("\n📝 失敗的工作：")
+    print("-" * 60)
+    failed_id = manager.submit(dict(params, keyword="失敗"))
+    status = wait_status(manager, failed_id, "failed")
+    print(f"錯誤訊息: {status['error']}")
+    assert status["error"] == "模擬失敗" and manager.result(failed_id) is None
+    print("✅ 記錄錯誤訊息")
+
+    print("\n📝 排隊上限：")
+    print("-" * 60)
+    release.clear()
+    manager.submit(params)
+    manager.submit(params)
+    try:
+        manager.submit(params)
+        raise AssertionError("超過排隊上限時應拋出 JobQueueFull")
+    except JobQueueFull:
+        print("✅ 超過 JOB_MAX_PENDING 時拒絕新工作")
+    release.set()
+
+    print("\n📝 輪詢請求被分到其他 worker：")
+    print("-" * 60)
+    # 目前行程扮演收到輪詢的 worker，工作在另一個行程執行
+    app.job_manager = JobManager(tmp, workers=1, max_pending=5, ttl=600, sweep_interval=600)
+    client = app.app.test_client()
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    other = context.Process(target=run_other_worker, args=(tmp, "聯發科", 1.0, queue))
+    other.start()
+    remote_id = queue.get(timeout=10)
+    response = client.get(f"/jobs/{remote_id}")
+    print(f"執行中: HTTP {response.status_code} {response.get_json()['status']}")
+    assert response.status_code == 200 and response.get_json()["status"] in ("queued", "running")
+    assert client.get(f"/jobs/{remote_id}/results").status_code == 202
+    status = wait_status(app.job_manager, remote_id, "done")
+    print(f"完成: 進度 {status['progress']}")
+    assert app.job_manager.result(remote_id)["results"] == [{"標題": "聯發科"}]
+    other.join()
+    print("✅ 其他 worker 讀取共用目錄中的狀態與結果")
+
+    print("\n📝 執行工作的 worker 已結束：")
+    print("-" * 60)
+    other = context.Process(target=run_other_worker, args=(tmp, "鴻海", 60.0, queue))
+    other.start()
+    dead_id = queue.get(timeout=10)
+    wait_status(app.job_manager, dead_id, "running")
+    other.terminate()
+    other.join()
+    status = app.job_manager.status(dead_id)
+    print(f"狀態: {status['status']}，{status['error']}")
+    assert status["status"] == "failed"
+    assert client.get(f"/jobs/{dead_id}/results").status_code == 500
+    print("✅ 不會一直停在執行中")
+
+    print("\n📝 不存在或不合法的工作 ID：")
+    print("-" * 60)
+    assert client.get("/jobs/0123456789abcdef0123456789abcdef").status_code == 404
+    assert client.get("/jobs/..%2F..%2Fetc/results").status_code == 404
+    print("✅ 回應 404")
+
+    print("\n📝 過期清除：")
+    print("-" * 60)
+    manager.ttl = 0
+    time.sleep(0.01)
+    removed = manager.sweep()
+    print(f"清除 {removed} 個工作，剩下的檔案: {os.listdir(tmp)}")
+    assert manager.status(job_id) is None and manager.result(job_id) is None
+    assert os.listdir(tmp) == []
+    print("✅ 記憶體中的工作與共用目錄的檔案都被清除")
+
+app.run_shared_scrape, app.job_manager = original_scrape, original_manager
+
+print("\n✅ 測試完成！")
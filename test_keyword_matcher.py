@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試多關鍵字比對器（Aho-Corasick）與 AND / OR / NOT 過濾
+"""
+
+import sys
+
+sys.path.insert(0, ".")
+
+from app import KeywordMatcher, filter_by_logic, parse_query
+
+print("=" * 60)
+print("🧪 關鍵字比對功能測試")
+print("=" * 60)
+
+# 測試查詢字串解析
+print("\n📝 測試查詢字串解析：")
+print("-" * 60)
+
+include, exclude = parse_query("台積電, 半導體 -裁員")
+print(f"關鍵字: {include}，排除詞: {exclude}")
+assert include == ["台積電", "半導體"]
+assert exclude == ["裁員"]
+
+# 測試多模式比對（包含重疊與互為前後綴的關鍵字）
+print("\n📝 測試多模式比對：")
+print("-" * 60)
+
+matcher = KeywordMatcher(["he", "she", "his", "hers", "AI", "台積", "台積電"])
+cases = [
+    ("ushers", {"he", "she", "hers"}),
+    ("this is his", {"his"}),
+    ("OpenAI 與台積電合作", {"AI", "台積", "台積電"}),
+    ("沒有任何關鍵字", set()),
+]
+for text, expected in cases:
+    found = matcher.scan(text)
+    print(f"{text!r} -> {sorted(found)}")
+    assert found == expected
+
+# 測試 AND / OR / NOT 過濾
+print("\n📝 測試 AND / OR / NOT 過濾：")
+print("-" * 60)
+
+
+def make_items():
+    return [
+        {"標題": "台積電擴大投資半導體", "摘要": ""},
+        {"標題": "台積電股價上漲", "摘要": "半導體需求強勁"},
+        {"標題": "半導體產業裁員潮", "摘要": "台積電不受影響"},
+        {"標題": "台積電法說會", "摘要": ""},
+    ]
+
+
+matcher = KeywordMatcher(["台積電", "半導體"], ["裁員"])
+
+results = filter_by_logic(make_items(), matcher, "AND")
+print(f"AND: {[item['標題'] for item in results]}")
+assert [item["標題"] for item in results] == ["台積電擴大投資半導體", "台積電股價上漲"]
+print(f"命中位置: {results[1]['命中']}")
+assert results[1]["命中"] == {"標題": ["台積電"], "摘要": ["半導體"]}
+
+results = filter_by_logic(make_items(), matcher, "OR")
+print(f"OR: {[item['標題'] for item in results]}")
+assert len(results) == 3
+
+print("\n✅ 測試完成！")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試延遲匯入：import app 不載入大型套件，warm_up() 才預先載入
+（在新的 Python 行程中檢查 sys.modules，不受其他測試已匯入的套件影響）
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+print("=" * 60)
+print("🧪 延遲匯入測試")
+print("=" * 60)
+
+HEAVY_MODULES = ["pandas", "matplotlib", "numpy", "snownlp", "jieba", "wordcloud", "pyarrow"]
+# warm_up() 預先載入的套件；pandas 與 pyarrow 只在匯出 Parquet 時才需要，預熱也不載入
+WARMED_MODULES = ["matplotlib", "numpy", "snownlp", "jieba", "wordcloud"]
+
+CHILD = """
+import importlib.util, json, sys
+modules = json.loads(sys.argv[1])
+loaded = lambda: {name: name in sys.modules for name in modules}
+import app
+after_import = loaded()
+app.warm_up()
+print("RESULT " + json.dumps({
+    "available": {name: importlib.util.find_spec(name) is not None for name in modules},
+    "after_import": after_import,
+    "after_warm_up": loaded(),
+    "lazy_loaded": [app.plt.loaded, app.numpy.loaded],
+}))
+"""
+
+completed = subprocess.run(
+    [sys.executable, "-c", CHILD, json.dumps(HEAVY_MODULES)],
+    cwd=os.path.dirname(os.path.abspath(__file__)),
+    capture_output=True,
+    text=True,
+    timeout=300,
+)
+lines = [line for line in completed.stdout.splitlines() if line.startswith("RESULT ")]
+assert completed.returncode == 0 and lines, completed.stderr
+result = json.loads(lines[-1][len("RESULT ") :])
+
+print("\n📝 import app：")
+print("-" * 60)
+print(result["after_import"])
+loaded = [name for name, present in result["after_import"].items() if present]
+assert loaded == [], f"import app 時載入了 {loaded}"
+print("✅ 匯入 app 時不載入任何大型套件")
+
+print("\n📝 warm_up()：")
+print("-" * 60)
+print(result["after_warm_up"])
+for name in WARMED_MODULES:
+    if result["available"][name]:
+        assert result["after_warm_up"][name], f"warm_up() 沒有載入 {name}"
+assert not result["after_warm_up"]["pandas"] and not result["after_warm_up"]["pyarrow"]
+assert result["lazy_loaded"] == [True, True]
+print("✅ 預熱載入已安裝的模型、詞典與繪圖套件")
+
+print("\n✅ 測試完成！")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試效能指標：階段計時、Server-Timing 標頭與 Prometheus 輸出（含多個 worker 的快照合併）
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, ".")
+
+import app
+from app import MetricsRegistry, StageTimings, _current_timings, timed
+
+print("=" * 60)
+print("🧪 效能指標測試")
+print("=" * 60)
+
+# 測試階段計時與 Server-Timing
+print("\n📝 測試階段計時：")
+print("-" * 60)
+
+timings = StageTimings("req-1")
+token = _current_timings.set(timings)
+with timed("fetch"):
+    time.sleep(0.02)
+with timed("fetch"):
+    time.sleep(0.01)
+with timed("sentiment"):
+    pass
+_current_timings.reset(token)
+
+stages = timings.as_dict()
+header = timings.server_timing(timings.elapsed())
+print(f"各階段耗時: {stages}")
+print(f"Server-Timing: {header}")
+assert stages["fetch"]["count"] == 2 and stages["fetch"]["ms"] >= 30
+assert header.startswith('fetch;dur=') and "total;dur=" in header
+
+# 測試 Prometheus 輸出與跨 worker 合併
+print("\n📝 測試 Prometheus 輸出：")
+print("-" * 60)
+
+with tempfile.TemporaryDirectory() as tmp:
+    registry = MetricsRegistry((0.1, 1.0), tmp)
+    registry.observe("news_stage_duration_seconds", 0.05, stage="fetch")
+    registry.observe("news_stage_duration_seconds", 0.5, stage="fetch")
+    registry.inc("news_cache_requests_total", 3, cache="feed", result="hit")
+    registry.inc("news_cache_requests_total", 1, cache="feed", result="miss")
+
+    # 模擬另一個 worker 寫出的快照
+    other = MetricsRegistry((0.1, 1.0), tmp)
+    other.observe("news_stage_duration_seconds", 2.0, stage="fetch")
+    other.inc("news_cache_requests_total", 4, cache="feed", result="miss")
+    with open(os.path.join(tmp, "99999999.json"), "w", encoding="utf-8") as f:
+        json.dump(other.snapshot(), f)
+
+    text = registry.render()
+    print(text)
+    assert 'news_stage_duration_seconds_bucket{stage="fetch",le="0.1"} 1' in text
+    assert 'news_stage_duration_seconds_bucket{stage="fetch",le="1"} 2' in text
+    assert 'news_stage_duration_seconds_bucket{stage="fetch",le="+Inf"} 3' in text
+    assert 'news_cache_requests_total{cache="feed",result="miss"} 5' in text
+    assert 'news_cache_hit_ratio{cache="feed"} 0.375' in text
+
+# 測試 HTTP 回應標頭
+print("📝 測試回應標頭：")
+print("-" * 60)
+
+client = app.app.test_client()
+response = client.get("/", headers={"X-Request-ID": "test-request"})
+print(f"X-Request-ID: {response.headers.get('X-Request-ID')}")
+print(f"Server-Timing: {response.headers.get('Server-Timing')}")
+assert response.headers["X-Request-ID"] == "test-request"
+if app.METRICS_MODE == "full":
+    assert "render;dur=" in response.headers["Server-Timing"]
+response = client.get("/metrics")
+assert response.status_code == 200 and b"news_http_requests_total" in response.data
+
+print("\n✅ 測試完成！")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試新聞物件與結果統計：NewsArticle 的欄位存取與匯出、ResultAggregator 分批累計的數量與情感分佈
+"""
+
+import calendar
+import json
+import sys
+
+sys.path.insert(0, ".")
+
+from app import (
+    ARTICLE_FIELDS,
+    EXPORT_COLUMNS,
+    NewsArticle,
+    ResultAggregator,
+    dedup_news_items,
+    iter_export_rows,
+    make_news_item,
+)
+
+print("=" * 60)
+print("🧪 新聞物件與結果統計測試")
+print("=" * 60)
+
+DAY1 = calendar.timegm((2025, 10, 1, 8, 30, 0))
+DAY2 = calendar.timegm((2025, 10, 2, 23, 59, 59))
+
+print("\n📝 NewsArticle 欄位存取：")
+print("-" * 60)
+article = make_news_item("台積電 擴產", "https://example.com/1", DAY1, "經濟日報", "摘要", "台積電", edition="TW")
+print(article)
+assert article["標題"] == article.title == "台積電 擴產"
+assert article["發布時間"] == "2025-10-01 08:30:00" and article.published_ts == DAY1
+assert article["關鍵字"] == ["台積電"] and article["版本"] == ["TW"]
+assert "情感分數" not in article and article.get("情感分數", "無") == "無"
+article["情感分數"] = 0.8
+assert article.sentiment_score == 0.8 and "情感分數" in article
+try:
+    article["發布時間"] = "2025-10-02 00:00:00"
+    raise AssertionError("發布時間應為唯讀")
+except KeyError:
+    pass
+print("✅ 屬性與中文欄位名稱都能存取，發布時間只在輸出時格式化")
+
+print("\n📝 to_dict() 與匯出欄位：")
+print("-" * 60)
+article.sentiment_label = "正面"
+row = article.to_dict()
+print(row)
+assert set(row) <= set(ARTICLE_FIELDS) and "命中" not in row
+assert json.loads(json.dumps(row, ensure_ascii=False)) == row
+values = next(iter_export_rows([row]))
+exported = dict(zip(EXPORT_COLUMNS, values))
+print(exported)
+assert exported == {
+    "標題": "台積電 擴產",
+    "連結": "https://example.com/1",
+    "發布時間": "2025-10-01 08:30:00",
+    "來源": "經濟日報",
+    "摘要": "摘要",
+    "關鍵字": "台積電",
+    "版本": "TW",
+    "情感分數": 0.8,
+    "情感分類": "正面",
+}
+# 沒有值的欄位略過，匯出時為空值
+bare = NewsArticle("標題", "https://example.com/2", DAY2, "來源")
+exported = dict(zip(EXPORT_COLUMNS, next(iter_export_rows([bare.to_dict()]))))
+assert exported["情感分數"] is None and exported["版本"] is None and exported["關鍵字"] == ""
+print("✅ 每個匯出欄位都對應到 NewsArticle 的值，列表以頓號合併")
+
+
+def item(i, source, ts, label, kw="台積電"):
+    news = make_news_item(f"新聞 {i}", f"https://example.com/{i}", ts, source, "", kw)
+    news.sentiment_label = label
+    return news
+
+
+articles = [
+    item(1, "A", DAY1, "正面"),
+    item(2, "B", DAY1, "負面"),
+    item(3, "A", DAY2, "正面"),
+    item(4, "C", DAY2, None),
+    item(5, "B", DAY2, "中立"),
+    item(6, "A", DAY2, "負面"),
+]
+
+print("\n📝 分批累計：")
+print("-" * 60)
+streamed = ResultAggregator()
+for start in range(0, len(articles), 2):
+    streamed.add(articles[start : start + 2])
+    print(f"累計 {streamed.count} 則: {streamed.facets()['sentiments']}")
+whole = ResultAggregator()
+whole.add(articles)
+assert streamed.count == whole.count == 6
+assert streamed.facets() == whole.facets()
+assert streamed.source_list() == ["A", "B", "C"]
+facets = streamed.facets()
+assert list(facets["sources"].items()) == [("A", 3), ("B", 2), ("C", 1)]
+assert facets["dates"] == {"2025-10-01": 2, "2025-10-02": 4}
+print("✅ 分批加入與一次加入的結果相同，來源依數量、日期依時間排序")
+
+print("\n📝 情感分佈：")
+print("-" * 60)
+print(facets["sentiments"])
+# 依 SENTIMENT_LABELS 的順序，沒有情感分類的新聞不列入，沒有出現的分類不輸出
+assert list(facets["sentiments"].items()) == [("正面", 2), ("中立", 1), ("負面", 2)]
+assert ResultAggregator().facets() == {"sources": {}, "dates": {}, "sentiments": {}}
+print("✅ 情感分佈依固定順序輸出")
+
+print("\n📝 跨批次去重後再累計：")
+print("-" * 60)
+seen = {}
+aggregator = ResultAggregator()
+duplicates = 0
+batches = [
+    [item(1, "A", DAY1, "正面"), item(2, "B", DAY1, "負面")],
+    # 第二個關鍵字又抓到新聞 1 與 2
+    [
+        item(1, "A", DAY1, "正面", "半導體"),
+        item(2, "B", DAY1, "負面", "半導體"),
+        item(7, "C", DAY2, "中立", "半導體"),
+    ],
+]
+for batch in batches:
+    unique, dropped = dedup_news_items(batch, seen)
+    duplicates += dropped
+    aggregator.add(unique)
+print(f"共 {aggregator.count} 則，合併 {duplicates} 則，{aggregator.facets()['sources']}")
+assert aggregator.count == 3 and duplicates == 2
+assert aggregator.facets()["sources"] == {"A": 1, "B": 1, "C": 1}
+assert aggregator.facets()["sentiments"] == {"正面": 1, "中立": 1, "負面": 1}
+assert batches[0][0]["關鍵字"] == ["台積電", "半導體"]
+print("✅ 重複的新聞只計算一次，關鍵字合併到第一次出現的那一筆")
+
+print("\n✅ 測試完成！")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試結果集保存：內容雜湊 ID、跨 worker 讀取、交由產出檔管理清除，以及重新產生時延長保留時間
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, ".")
+
+import app
+from app import ResultSetStore
+
+print("=" * 60)
+print("🧪 結果集保存測試")
+print("=" * 60)
+
+rows = [
+    {"標題": f"新聞 {i}", "連結": f"https://example.com/{i}", "發布時間": "2025-10-01 12:00:00"}
+    for i in range(5)
+]
+
+
+def set_age(store, result_id, seconds):
+    when = time.time() - seconds
+    os.utime(store.files.path(f"{result_id}.json"), (when, when))
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    store = ResultSetStore(os.path.join(tmp, "results"), ttl=3600, sweep_interval=None)
+
+    print("\n📝 內容雜湊 ID：")
+    print("-" * 60)
+    result_id = store.save(rows)
+    print(f"結果集 ID: {result_id}")
+    assert store.save(list(rows)) == result_id != store.save(rows[:3])
+    assert os.listdir(store.directory).count(f"{result_id}.json") == 1
+    print("✅ 相同內容得到相同 ID")
+
+    print("\n📝 其他 worker 讀取：")
+    print("-" * 60)
+    other = ResultSetStore(store.directory, ttl=3600)
+    assert other.load(result_id) == rows
+    assert other.load("0123456789abcdef0123") is None and other.load("../app") is None
+    print("✅ 由共用目錄讀取，不存在或不合法的 ID 回傳 None")
+
+    print("\n📝 過期清除：")
+    print("-" * 60)
+    set_age(store, result_id, 7200)
+    assert store.files.sweep() == 1
+    print(f"剩下的檔案: {os.listdir(store.directory)}")
+    assert ResultSetStore(store.directory, ttl=3600).load(result_id) is None
+    print("✅ 超過保留時間的結果集由產出檔管理刪除")
+
+    print("\n📝 超過容量上限：")
+    print("-" * 60)
+    small = ResultSetStore(os.path.join(tmp, "small"), ttl=3600, max_bytes=600, sweep_interval=None)
+    older, newer = small.save(rows), small.save(rows[:3])
+    set_age(small, older, 60)
+    assert small.files.sweep() == 1
+    print(f"剩下的檔案: {os.listdir(small.directory)}")
+    assert os.listdir(small.directory) == [f"{newer}.json"]
+    print("✅ 從最久沒有產生的結果集開始淘汰")
+
+    print("\n📝 重新產生相同的結果集會延長保留時間：")
+    print("-" * 60)
+    result_id = store.save(rows)
+    set_age(store, result_id, 3000)
+    assert store.save(rows) == result_id
+    age = time.time() - os.path.getmtime(store.files.path(f"{result_id}.json"))
+    print(f"重新產生後的檔案年齡: {age:.1f} 秒")
+    assert age < 60
+    assert store.files.sweep(max_age=600) == 0
+    # 以新的 store 讀取（模擬記憶體快取已淘汰或其他 worker），仍可下載
+    original_result_sets = app.result_sets
+    app.result_sets = ResultSetStore(store.directory, ttl=600)
+    response = app.app.test_client().get(f"/download/{result_id}?format=csv")
+    print(f"下載: HTTP {response.status_code}")
+    assert response.status_code == 200 and "新聞 4" in response.get_data(as_text=True)
+    response.close()
+    app.result_sets = original_result_sets
+    print("✅ 最近重新產生的結果集不會因第一次保存的時間而被刪除")
+
+print("\n✅ 測試完成！")
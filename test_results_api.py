@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試結果分頁 API：分頁、排序、篩選、手動排除與分面統計（/api/results/<結果集 ID>）
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, ".")
+
+import app
+from app import ResultSetStore, parse_results_query, query_result_set
+
+print("=" * 60)
+print("🧪 結果分頁 API 測試")
+print("=" * 60)
+
+# 25 則新聞：來源 A/B/C 輪流、情感正面/負面輪流、分布在 10/01～10/05
+rows = [
+    {
+        "標題": f"新聞 {i}",
+        "連結": f"https://example.com/{i}",
+        "發布時間": f"2025-10-0{i % 5 + 1} {i:02d}:00:00",
+        "來源": "ABC"[i % 3],
+        "情感分數": i / 25,
+        "情感分類": "正面" if i % 2 else "負面",
+        "摘要": "頁面用不到的欄位",
+    }
+    for i in range(25)
+]
+
+print("\n📝 分頁：")
+print("-" * 60)
+first = query_result_set(rows, page=1, per_page=10)
+last = query_result_set(rows, page=3, per_page=10)
+print(f"共 {first['total']} 筆、{first['pages']} 頁，第 3 頁 {len(last['items'])} 筆")
+assert first["total"] == 25 and first["pages"] == 3
+assert len(first["items"]) == 10 and len(last["items"]) == 5
+ids = [
+    item["id"]
+    for page in (1, 2, 3)
+    for item in query_result_set(rows, page=page, per_page=10)["items"]
+]
+assert sorted(ids) == list(range(25))
+assert set(first["items"][0]) == {"id", *app.RESULT_PAGE_FIELDS}
+assert query_result_set(rows, page=4, per_page=10)["items"] == []
+print("✅ 各頁不重複也不遺漏，只回傳頁面需要的欄位")
+
+print("\n📝 排序：")
+print("-" * 60)
+times = [item["發布時間"] for item in query_result_set(rows, per_page=25)["items"]]
+assert times == sorted(times, reverse=True)
+asc = query_result_set(rows, per_page=25, sort="sentiment", order="asc")["items"]
+assert [item["id"] for item in asc] == list(range(25))
+by_source = query_result_set(rows, per_page=25, sort="source", order="asc")["items"]
+assert [item["來源"] for item in by_source] == sorted(item["來源"] for item in by_source)
+print("✅ 依時間、情感分數與來源排序")
+
+print("\n📝 篩選與分面統計：")
+print("-" * 60)
+result = query_result_set(rows, per_page=50, source="A")
+print(f"來源 A: {result['total']} 筆，分面 {result['facets']}")
+assert result["total"] == 9 and all(item["來源"] == "A" for item in result["items"])
+# 來源分面不套用自己的篩選，仍顯示所有來源；其他分面只計算來源 A
+assert dict(result["facets"]["sources"]) == {"A": 9, "B": 8, "C": 8}
+assert sum(result["facets"]["sentiments"].values()) == 9
+assert sum(result["facets"]["dates"].values()) == 9
+both = query_result_set(rows, per_page=50, source="A", sentiment="正面", date="2025-10-04")
+assert [item["id"] for item in both["items"]] == [3]
+print("✅ 多個篩選條件同時套用，每個分面不套用自己的篩選")
+
+print("\n📝 手動排除：")
+print("-" * 60)
+excluded = query_result_set(rows, per_page=0, excluded={0, 1, 2})
+print(f"排除 3 筆後: {excluded['total']} 筆，{excluded['items']}")
+assert excluded["total"] == 22 and excluded["pages"] == 0 and excluded["items"] == []
+assert dict(excluded["facets"]["sources"]) == {"A": 8, "B": 7, "C": 7}
+print("✅ 排除的新聞不列入結果與統計，per_page=0 只回傳統計")
+
+print("\n📝 參數驗證：")
+print("-" * 60)
+params, error = parse_results_query({"page": "0", "per_page": "20", "exclude": "3, 5"})
+assert error is None and params["page"] == 1 and params["excluded"] == {3, 5}
+for bad in ({"page": "x"}, {"per_page": "1000"}, {"sort": "title"}, {"order": "up"}, {"exclude": "a"}):
+    params, error = parse_results_query(bad)
+    print(f"{bad}: {error}")
+    assert params is None and error
+print("✅ 不合法的參數回傳錯誤訊息")
+
+print("\n📝 /api/results/<結果集 ID>：")
+print("-" * 60)
+with tempfile.TemporaryDirectory() as tmp:
+    original_result_sets = app.result_sets
+    app.result_sets = ResultSetStore(os.path.join(tmp, "results"), 3600)
+    client = app.app.test_client()
+    result_id = app.result_sets.save(rows)
+    query = "page=2&per_page=10&sort=sentiment&order=asc"
+    data = client.get(f"/api/results/{result_id}?{query}").get_json()
+    print(f"第 {data['page']}/{data['pages']} 頁: {[item['id'] for item in data['items']]}")
+    assert data["result_id"] == result_id and [item["id"] for item in data["items"]] == list(range(10, 20))
+    assert client.get(f"/api/results/{result_id}?per_page=-1").status_code == 400
+    assert client.get("/api/results/0123456789abcdef0123").status_code == 404
+    assert client.get("/api/results/not-a-result-id").status_code == 404
+    app.result_sets = original_result_sets
+print("✅ 回傳 JSON，參數錯誤回應 400，找不到結果集回應 404")
+
+print("\n✅ 測試完成！")
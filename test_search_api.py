@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試 JSON 搜尋 API：ETag 與 304、gzip 壓縮、回應快取與參數驗證（/api/search）
+"""
+
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, ".")
+
+import app
+from app import ResultSetStore, SearchResponseCache, make_news_item
+
+print("=" * 60)
+print("🧪 JSON 搜尋 API 測試")
+print("=" * 60)
+
+fetches = []
+
+
+def fake_fetch(keyword, start_date, end_date, logic="AND", editions=()):
+    """模擬 fetch_rss_news：每個關鍵字回傳 count 則新聞"""
+    fetches.append(keyword)
+    count = 2 if keyword == "少量" else 30
+    return [
+        make_news_item(
+            f"{keyword} 新聞 {i}", f"https://example.com/{i}", int(time.time()) - i * 60, "來源", "摘要", keyword
+        )
+        for i in range(count)
+    ]
+
+
+original = (app.fetch_rss_news, app.search_cache, app.result_sets)
+app.fetch_rss_news = fake_fetch
+app.search_cache = SearchResponseCache(ttl=60, max_entries=10)
+client = app.app.test_client()
+url = "/api/search?keyword=台積電&start_date=2025-10-01&end_date=2025-10-07&stages=aggregate"
+
+with tempfile.TemporaryDirectory() as tmp:
+    app.result_sets = ResultSetStore(os.path.join(tmp, "results"), 3600)
+
+    print("\n📝 第一次請求：")
+    print("-" * 60)
+    response = client.get(url)
+    data = response.get_json()
+    etag = response.headers["ETag"]
+    print(f"HTTP {response.status_code}，ETag {etag}，{response.headers['Cache-Control']}")
+    assert response.status_code == 200 and data["count"] == 30 and data["stages"] == ["aggregate"]
+    assert "facets" in data and data["result_id"] and len(data["articles"]) == 30
+    assert response.headers["Cache-Control"] == f"public, max-age={int(app.SEARCH_CACHE_TTL)}"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert "Content-Encoding" not in response.headers
+    print("✅ 回傳 JSON、強 ETag 與快取標頭")
+
+    print("\n📝 回應快取：")
+    print("-" * 60)
+    again = client.get(url)
+    print(f"擷取次數 {len(fetches)}，快取統計 {app.search_cache.stats()}")
+    assert again.headers["ETag"] == etag and again.data == response.data
+    assert fetches == ["台積電"] and app.search_cache.stats()["hits"] == 1
+    client.get(url.replace("stages=aggregate", "stages=aggregate,sentiment"))
+    assert len(fetches) == 2
+    print("✅ TTL 內相同的查詢不再擷取，階段不同視為不同查詢")
+
+    print("\n📝 If-None-Match：")
+    print("-" * 60)
+    response = client.get(url, headers={"If-None-Match": etag})
+    print(f"HTTP {response.status_code}，內容 {len(response.data)} bytes")
+    assert response.status_code == 304 and response.data == b""
+    assert response.headers["ETag"] == etag
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+    print("✅ ETag 相符時回應 304 且不帶內容")
+
+    print("\n📝 gzip 壓縮：")
+    print("-" * 60)
+    compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+    print(
+        f"Content-Encoding {compressed.headers['Content-Encoding']}，ETag {compressed.headers['ETag']}，"
+        f"{len(compressed.data)} / {len(again.data)} bytes"
+    )
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == again.data
+    assert compressed.headers["ETag"] == etag[:-1] + '-gzip"'
+    # 任一種表示法的 ETag 都視為未變更
+    response = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+    response = client.get(url, headers={"If-None-Match": compressed.headers["ETag"]})
+    assert response.status_code == 304
+    small = client.get(url.replace("台積電", "少量"), headers={"Accept-Encoding": "gzip"})
+    print(f"小於 {app.SEARCH_COMPRESS_MIN_BYTES} bytes 的回應: {len(small.data)} bytes，不壓縮")
+    assert "Content-Encoding" not in small.headers and small.get_json()["count"] == 2
+    print("✅ 依 Accept-Encoding 壓縮，ETag 依表示法區分")
+
+    print("\n📝 參數驗證：")
+    print("-" * 60)
+    for bad in (url.replace("stages=aggregate", "stages=charts"), "/api/search?keyword=台積電"):
+        response = client.get(bad)
+        print(f"HTTP {response.status_code}: {response.get_json()['error']}")
+        assert response.status_code == 400
+    print("✅ 不合法的參數回應 400")
+
+app.fetch_rss_news, app.search_cache, app.result_sets = original
+
+print("\n✅ 測試完成！")
@@ -8,8 +8,7 @@ import sys
 
 sys.path.insert(0, ".")
 
-from app import analyze_sentiment, classify_sentiment, analyze_news_sentiment
-import pandas as pd
+from app import analyze_sentiment, classify_sentiment, analyze_news_sentiment, make_news_item
 
 # 測試文本
 test_texts = [
@@ -37,32 +36,30 @@ for text in test_texts:
     print(f"情感分類: {sentiment}")
     print()
 
-# 測試 DataFrame 的情感分析
-print("\n📊 測試 DataFrame 的情感分析：")
+# 測試新聞列表的情感分析
+print("\n📊 測試新聞列表的情感分析：")
 print("-" * 60)
 
-df = pd.DataFrame(
-    {
-        "標題": test_texts,
-        "連結": ["http://example.com"] * len(test_texts),
-        "發布時間": ["2025-10-27 12:00:00"] * len(test_texts),
-        "來源": ["測試來源"] * len(test_texts),
-        "關鍵字": ["測試"] * len(test_texts),
-    }
-)
-
-print("原始 DataFrame:")
-print(df)
-print()
+articles = [
+    make_news_item(text, "http://example.com", 1761566400, "測試來源", "", "測試")
+    for text in test_texts
+]
 
-df_analyzed = analyze_news_sentiment(df)
+analyze_news_sentiment(articles)
 
-print("分析後的 DataFrame:")
-print(df_analyzed[["標題", "情感分數", "情感分類"]])
+print("分析後的新聞:")
+for article in articles:
+    score_str = f"{article.sentiment_score:.4f}" if article.sentiment_score is not None else "N/A"
+    print(f"{article['發布時間']}  {score_str}  {article['情感分類']}  {article['標題']}")
 print()
 
 # 統計情感分佈
 print("情感分佈統計:")
-print(df_analyzed["情感分類"].value_counts())
+distribution = {}
+for article in articles:
+    distribution[article.sentiment_label] = distribution.get(article.sentiment_label, 0) + 1
+print(distribution)
+assert sum(distribution.values()) == len(test_texts)
+assert articles[0].to_dict()["發布時間"] == "2025-10-27 12:00:00"
 
 print("\n✅ 測試完成！")
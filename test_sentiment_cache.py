@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試情感分析快取：命中與未命中、模型版本改變時失效，以及其他行程經由 SQLite 共用分數
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, ".")
+
+import app
+from app import SentimentCache, score_titles
+
+print("=" * 60)
+print("🧪 情感分析快取測試")
+print("=" * 60)
+
+if not app.SENTIMENT_AVAILABLE:
+    print("⚠️ 未安裝 snownlp，略過測試")
+    sys.exit(0)
+
+titles = [
+    "台灣經濟持續成長，前景看好",
+    "股市大跌，投資者損失慘重",
+    "今天天氣不錯",
+    "台灣經濟持續成長，前景看好",
+]
+scored = []
+original_score_batch = app._score_batch
+
+
+def counting_score_batch(batch):
+    """記錄實際交給模型計算的標題"""
+    scored.extend(batch)
+    return original_score_batch(batch)
+
+
+def score_in_other_process(path, queue):
+    """在另一個行程（模擬另一個 gunicorn worker）以新的連線讀取同一個快取檔"""
+    app.sentiment_cache = SentimentCache(path)
+    app._sentiment_model_version = None
+
+    def fail(batch):
+        raise AssertionError(f"不應重新計算: {batch}")
+
+    app._score_batch = fail
+    queue.put(score_titles(titles))
+
+
+original = (app.sentiment_cache, app._sentiment_model_version)
+app._score_batch = counting_score_batch
+
+with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "sentiment.sqlite3")
+    app.sentiment_cache = SentimentCache(path)
+
+    print("\n📝 第一次計算：")
+    print("-" * 60)
+    first = score_titles(titles)
+    print(f"分數: {[round(score, 3) for score in first]}，模型計算 {len(scored)} 筆")
+    assert all(0 <= score <= 1 for score in first) and first[0] == first[3]
+    assert scored == titles[:3]
+    print("✅ 未命中的標題交給模型計算，重複的標題只算一次")
+
+    print("\n📝 第二次計算（命中）：")
+    print("-" * 60)
+    scored.clear()
+    second = score_titles(titles)
+    print(f"模型計算 {len(scored)} 筆")
+    assert second == first and scored == []
+    print("✅ 分數全部來自快取，不再呼叫模型")
+
+    print("\n📝 部分命中：")
+    print("-" * 60)
+    third = score_titles(titles + ["新產品發布會圓滿成功"])
+    print(f"模型計算: {scored}")
+    assert third[:4] == first and scored == ["新產品發布會圓滿成功"]
+    print("✅ 只有新的標題交給模型計算")
+
+    print("\n📝 其他行程共用 SQLite 快取：")
+    print("-" * 60)
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    other = context.Process(target=score_in_other_process, args=(path, queue))
+    other.start()
+    shared = queue.get(timeout=60)
+    other.join()
+    print(f"其他行程的分數: {[round(score, 3) for score in shared]}")
+    assert other.exitcode == 0 and shared == first
+    print("✅ 其他行程直接讀到已計算的分數")
+
+    print("\n📝 模型版本改變時失效：")
+    print("-" * 60)
+    version = app.sentiment_model_version()
+    scored.clear()
+    app._sentiment_model_version = "test-model-v2"
+    score_titles(titles)
+    print(f"新版本模型計算 {len(scored)} 筆")
+    assert scored == titles[:3]
+    scored.clear()
+    app._sentiment_model_version = version
+    assert score_titles(titles) == first and scored == []
+    print("✅ 不同模型版本的分數各自保存，新版本不會沿用舊分數")
+
+app._score_batch = original_score_batch
+app.sentiment_cache, app._sentiment_model_version = original
+
+print("\n✅ 測試完成！")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試向量化情感分析：BayesSentimentScorer 的分數需與逐筆建立 SnowNLP 的結果一致
+"""
+
+import sys
+import time
+
+sys.path.insert(0, ".")
+
+import app
+from app import analyze_sentiment, get_sentiment_scorer
+
+TOLERANCE = 1e-9
+
+if not app.SENTIMENT_AVAILABLE:
+    print("⚠️ 未安裝 snownlp，略過測試")
+    sys.exit(0)
+
+titles = [
+    "台灣經濟持續成長，前景看好",
+    "股市大跌，投資者損失慘重",
+    "今天天氣不錯",
+    "新產品發布會圓滿成功",
+    "公司裁員計畫引發員工不滿",
+    "台積電 3奈米 良率提升 - 經濟日報",
+    "Apple 發表 iPhone 17，售價 NT$29,900 起",
+    "颱風來襲！全台停班停課？",
+    "好" * 300,  # 很長的標題，分數接近 1
+    "壞消息" * 100,
+    "ABC xyz 123",  # 沒有中文
+    "，。！",
+    " ",
+    "",  # snownlp 無法處理空字串，兩種方式都回傳 None
+]
+
+print("=" * 60)
+print("🧪 向量化情感分析測試")
+print("=" * 60)
+
+print("\n📝 與逐筆計算比較：")
+print("-" * 60)
+scorer = get_sentiment_scorer()
+expected = [analyze_sentiment(title) for title in titles]
+actual = scorer.score(titles)
+for title, a, b in zip(titles, expected, actual):
+    print(f"{str(a):<22} {str(b):<22} {title[:20]!r}")
+    if a is None:
+        assert b is None
+    else:
+        assert abs(a - b) <= TOLERANCE, (title, a, b)
+print(f"✅ 所有分數的差異都在 {TOLERANCE:g} 以內")
+
+print("\n📝 分詞與 snownlp 相同：")
+print("-" * 60)
+from snownlp import sentiment
+
+for title in titles[:8]:
+    assert scorer.tokenize(title) == sentiment.classifier.handle(title), title
+print("✅ 分詞結果一致")
+
+print("\n📝 批次計算速度：")
+print("-" * 60)
+batch = [f"{title}{i}" for i in range(300) for title in titles[:8]]
+started = time.perf_counter()
+scores = scorer.score(batch)
+elapsed = time.perf_counter() - started
+print(f"{len(batch)} 則標題：{elapsed * 1000:.1f} ms")
+assert len(scores) == len(batch)
+assert all(0 <= score <= 1 for score in scores)
+tokens = [scorer.tokenize(title) for title in batch]
+started = time.perf_counter()
+scorer.score_tokens(tokens)
+print(f"已分詞的 {len(batch)} 則標題：{(time.perf_counter() - started) * 1000:.2f} ms")
+
+print("\n✅ 測試完成！")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試 worker 共用記憶體：行程記憶體報告、gc.freeze 後子行程的垃圾回收不再複製共用分頁、
+情感模型詞表不含逐詞的 Python 物件
+"""
+
+import gc
+import os
+import sys
+
+sys.path.insert(0, ".")
+
+import app
+from app import BayesSentimentScorer, child_processes, memory_report, process_memory
+
+print("=" * 60)
+print("🧪 共用記憶體測試")
+print("=" * 60)
+
+if process_memory(os.getpid()) is None:
+    print("⚠️ 無法讀取 /proc/<pid>/smaps_rollup（非 Linux），略過測試")
+    sys.exit(0)
+
+
+def private_growth_after_collect():
+    """fork 一個子行程執行 gc.collect()，回傳子行程私有記憶體增加的位元組數"""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        before = process_memory(os.getpid())["private"]
+        gc.collect()
+        after = process_memory(os.getpid())["private"]
+        os.write(write_fd, str(after - before).encode())
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        growth = int(f.read())
+    os.waitpid(pid, 0)
+    return growth
+
+
+print("\n📝 行程記憶體用量：")
+print("-" * 60)
+usage = process_memory(os.getpid())
+print({key: f"{value / 2**20:.1f} MB" for key, value in usage.items()})
+assert usage["rss"] > 0 and usage["pss"] > 0
+assert usage["shared"] + usage["private"] == usage["rss"]
+assert process_memory(2**22 + 1) is None
+print("✅ 由 smaps_rollup 讀取 RSS / PSS / 共用 / 私有")
+
+print("\n📝 master 與 worker 的記憶體報告：")
+print("-" * 60)
+read_fd, write_fd = os.pipe()
+pid = os.fork()
+if pid == 0:
+    os.close(write_fd)
+    os.read(read_fd, 1)  # 等待父行程讀完報告
+    os._exit(0)
+os.close(read_fd)
+try:
+    assert (pid, 1) in child_processes(os.getpid())
+    rows = memory_report(os.getpid())
+    for row in rows:
+        print(f"{row['pid']:>7} {row['role']:<6} PSS {row['pss'] / 2**20:.1f} MB")
+    assert rows[0]["pid"] == os.getpid() and rows[0]["role"] == "master"
+    assert any(row["pid"] == pid and row["role"] == "worker" for row in rows)
+finally:
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+print("✅ 列出 master 與每個 worker")
+
+print("\n📝 gc.freeze 之後，子行程的垃圾回收不再複製共用分頁：")
+print("-" * 60)
+# 模擬預熱載入的大量小物件（詞典、模型表）
+shared = [{"word": str(i), "count": [i]} for i in range(300_000)]
+gc.collect()
+unfrozen = private_growth_after_collect()
+frozen_count = app.freeze_shared_memory()
+try:
+    frozen = private_growth_after_collect()
+finally:
+    gc.unfreeze()
+print(f"未凍結: 子行程私有記憶體增加 {unfrozen / 2**20:.1f} MB")
+print(f"凍結後: 子行程私有記憶體增加 {frozen / 2**20:.1f} MB（凍結 {frozen_count} 個物件）")
+assert frozen_count >= len(shared)
+assert frozen < unfrozen / 2
+print("✅ 凍結的物件不再被走訪，記憶體分頁維持共用")
+del shared
+
+print("\n📝 情感模型詞表：")
+print("-" * 60)
+assert BayesSentimentScorer.word_hash("灰") != BayesSentimentScorer.word_hash("pp")
+if app.SENTIMENT_AVAILABLE:
+    scorer = app.get_sentiment_scorer()
+    print(
+        f"{len(scorer.hashes)} 個詞，詞表 {scorer.hashes.nbytes / 1024:.0f} KB，"
+        f"權重 {scorer.weights.nbytes / 1024:.0f} KB"
+    )
+    assert not scorer.hashes.flags.writeable and not scorer.weights.flags.writeable
+    assert (scorer.hashes[1:] > scorer.hashes[:-1]).all()
+    assert not hasattr(scorer, "vocabulary")
+    # 「灰」與「pp」都在模型中，雜湊值不同才不會查到彼此的權重
+    assert scorer.score(["灰"]) != scorer.score(["pp"])
+    print("✅ 詞表是唯讀、排序過的 NumPy 陣列")
+else:
+    print("⚠️ 未安裝 snownlp，略過詞表檢查")
+
+print("\n✅ 測試完成！")
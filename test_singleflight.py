@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試重複請求合併（single-flight）：同一個 worker 內的執行緒與跨行程
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, ".")
+
+from app import SingleFlight, fcntl, search_flight_key
+
+print("=" * 60)
+print("🧪 重複請求合併測試")
+print("=" * 60)
+
+# 測試查詢鍵的正規化
+print("\n📝 測試查詢鍵：")
+print("-" * 60)
+args = (date(2025, 10, 1), date(2025, 10, 27), "AND")
+same = search_flight_key("scrape", "台積電, 半導體 -股價 -財報", *args) == search_flight_key(
+    "scrape", "台積電 半導體 -財報 -股價", *args
+)
+different = search_flight_key("scrape", "台積電", *args) != search_flight_key(
+    "scrape", "台積電", date(2025, 10, 1), date(2025, 10, 27), "OR"
+)
+print(f"分隔符號與排除詞順序不同視為相同查詢: {same}")
+print(f"邏輯不同視為不同查詢: {different}")
+assert same and different
+
+# 測試同一個行程內的執行緒
+print("\n📝 測試同一個行程內的 8 個執行緒：")
+print("-" * 60)
+
+calls = []
+
+
+def slow_search():
+    calls.append(threading.get_ident())
+    time.sleep(0.3)
+    return {"count": 42}
+
+
+def run_in_process(directory, key, log_path):
+    flight = SingleFlight(directory, wait_timeout=10, grace=5)
+
+    def work():
+        with open(log_path, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        time.sleep(0.5)
+        return {"count": 7}
+
+    assert flight.do(key, work) == {"count": 7}
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    flight = SingleFlight(tmp, wait_timeout=10, grace=5)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("k", slow_search)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"實際執行次數: {len(calls)}，取得結果的請求數: {len(results)}")
+    print(f"統計: {flight.stats()}")
+    assert len(calls) == 1 and results == [{"count": 42}] * 8
+
+    # 執行失敗時，等待中的請求收到同一個例外
+    def failing():
+        time.sleep(0.2)
+        raise RuntimeError("feed 逾時")
+
+    errors = []
+
+    def call_failing():
+        try:
+            flight.do("bad", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call_failing) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"失敗時每個請求收到的錯誤: {errors}")
+    assert errors == ["feed 逾時"] * 3
+
+    # 測試跨行程（模擬多個 gunicorn worker）
+    if fcntl is not None:
+        print("\n📝 測試 4 個行程同時送出相同請求：")
+        print("-" * 60)
+        log_path = os.path.join(tmp, "calls.log")
+        ctx = multiprocessing.get_context("fork")
+        processes = [
+            ctx.Process(target=run_in_process, args=(tmp, "shared", log_path)) for _ in range(4)
+        ]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        with open(log_path) as f:
+            executed = f.read().split()
+        print(f"實際執行的行程數: {len(executed)}，結束代碼: {[p.exitcode for p in processes]}")
+        assert len(executed) == 1
+        assert all(p.exitcode == 0 for p in processes)
+
+print("\n✅ 測試完成！")
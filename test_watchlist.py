@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試關鍵字監控：只處理新出現的新聞、沒有新聞時的退避，以及同一關鍵字的不同監控各自保存狀態
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, ".")
+
+import app
+from app import ArticleStore, FeedCache
+from watchlist import JsonlSink, Watch, WatchStateStore, poll_watch, watch_key
+
+print("=" * 60)
+print("🧪 關鍵字監控測試")
+print("=" * 60)
+
+NOW = time.time()
+feed_items = [
+    ("舊新聞", "https://example.com/old", NOW - 2 * 3600),
+    ("較新的新聞", "https://example.com/recent", NOW - 3600),
+]
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        xml = "".join(
+            f"<item><title>監控 {title}</title><link>{link}</link><guid>{link}</guid>"
+            f"<pubDate>{formatdate(ts, usegmt=True)}</pubDate></item>"
+            for title, link, ts in feed_items
+        )
+        body = f"<rss version='2.0'><channel>{xml}</channel></rss>".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+app.build_rss_url = lambda keyword, *args: f"http://127.0.0.1:{server.server_port}/rss"
+app.feed_cache = FeedCache(ttl=0, max_entries=10, max_bytes=100_000)
+
+with tempfile.TemporaryDirectory() as tmp:
+    # 補抓間隔設為 0，每次輪詢都重新下載 feed
+    app.article_store = ArticleStore(os.path.join(tmp, "articles.sqlite3"), refresh_interval=0)
+    store = WatchStateStore(os.path.join(tmp, "watchlist.sqlite3"))
+    sink = JsonlSink(os.path.join(tmp, "articles.jsonl"))
+    watch = Watch("監控", interval=600, max_interval=1200, backoff=1.5, jitter=0)
+
+    print("\n📝 第一次輪詢只建立基準：")
+    print("-" * 60)
+    new, state = poll_watch(watch, store, sink, now=NOW)
+    print(f"新項目: {len(new)}，下次間隔: {state.interval:.0f} 秒")
+    assert new == [] and state.interval == 900
+
+    print("\n📝 feed 出現新項目：")
+    print("-" * 60)
+    feed_items.insert(0, ("最新新聞", "https://example.com/new", NOW - 60))
+    new, state = poll_watch(watch, store, sink, now=NOW)
+    print(f"新項目: {[a.title for a in new]}，下次間隔: {state.interval:.0f} 秒")
+    assert [a.title for a in new] == ["監控 最新新聞"]
+    assert state.interval == 600 and state.quiet_polls == 0
+
+    print("\n📝 沒有新項目時退避（上限 max_interval）：")
+    print("-" * 60)
+    intervals = [poll_watch(watch, store, sink, now=NOW)[1].interval for _ in range(3)]
+    print(f"間隔變化: {intervals}")
+    assert intervals == [900, 1200, 1200]
+
+    with open(sink.path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    print(f"JSONL 紀錄: {[(r['watch'], r['guid'], r['標題']) for r in records]}")
+    assert [r["guid"] for r in records] == ["https://example.com/new"]
+
+    print("\n📝 同一關鍵字、不同版本的監控各自保存狀態：")
+    print("-" * 60)
+    watch_us = Watch("監控", interval=600, max_interval=1200, backoff=1.5, jitter=0, editions=("US",))
+    other_logic = Watch("監控", interval=600, max_interval=1200, backoff=1.5, jitter=0, logic="OR")
+    assert len({watch_key(watch), watch_key(watch_us), watch_key(other_logic)}) == 3
+    assert watch_key(Watch("監控", editions=("US", "TW"))) == watch_key(Watch("監控", editions=("TW", "US")))
+    new, state = poll_watch(watch_us, store, sink, now=NOW)
+    print(f"美國版第一次輪詢: 新項目 {len(new)}，下次間隔 {state.interval:.0f} 秒")
+    # 沒有沿用台灣版的退避狀態，第一次輪詢只建立基準
+    assert new == [] and state.interval == 900 and state.quiet_polls == 1
+    assert store.load(watch).interval == 1200 and store.load(watch).quiet_polls == 3
+
+    feed_items.insert(0, ("另一則新聞", "https://example.com/another", NOW - 30))
+    new_us, _ = poll_watch(watch_us, store, sink, now=NOW)
+    new_tw, state = poll_watch(watch, store, sink, now=NOW)
+    print(f"美國版: {[a.title for a in new_us]}，台灣版: {[a.title for a in new_tw]}")
+    # 美國版看過的 GUID 不會讓台灣版漏掉同一則新聞
+    assert [a.title for a in new_us] == [a.title for a in new_tw] == ["監控 另一則新聞"]
+    assert state.interval == 600
+    print("✅ 關鍵字、版本或邏輯不同的監控不共用退避狀態與看過的 GUID")
+
+    print("\n📝 舊版以關鍵字為鍵的狀態：")
+    print("-" * 60)
+    legacy_path = os.path.join(tmp, "legacy.sqlite3")
+    conn = sqlite3.connect(legacy_path)
+    conn.executescript(
+        """
+        CREATE TABLE watch_state (
+            keyword TEXT PRIMARY KEY, last_published_ts INTEGER, interval REAL,
+            quiet_polls INTEGER NOT NULL DEFAULT 0, polled_at REAL
+        );
+        CREATE TABLE watch_seen (
+            keyword TEXT NOT NULL, guid TEXT NOT NULL, published_ts INTEGER NOT NULL,
+            PRIMARY KEY (keyword, guid)
+        );
+        CREATE INDEX idx_watch_seen_published ON watch_seen (keyword, published_ts);
+        """
+    )
+    conn.execute("INSERT INTO watch_state VALUES ('監控', 100, 1200, 2, 50)")
+    conn.execute("INSERT INTO watch_seen VALUES ('監控', 'https://example.com/old', 100)")
+    conn.commit()
+    conn.close()
+    legacy = WatchStateStore(legacy_path).load(Watch("監控"))
+    print(legacy)
+    assert (legacy.last_published_ts, legacy.interval, legacy.quiet_polls) == (100, 1200, 2)
+    assert legacy.seen == {"https://example.com/old"}
+    assert WatchStateStore(legacy_path).load(watch_us).polled_at is None
+    print("✅ 舊紀錄改掛到預設版本與 AND 邏輯的監控")
+
+server.shutdown()
+
+print("\n✅ 測試完成！")
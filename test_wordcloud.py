@@ -9,7 +9,7 @@ import os
 
 sys.path.insert(0, ".")
 
-from app import generate_word_cloud
+from app import artifacts, generate_word_cloud
 import pandas as pd
 
 print("=" * 80)
@@ -47,15 +47,15 @@ print("🎨 開始生成詞雲...")
 print("-" * 80)
 
 try:
-    result = generate_word_cloud(df)
+    result = generate_word_cloud(df["標題"].tolist())
     
     if result:
         print(f"\n✅ 詞雲生成成功！")
         print(f"📁 檔案名稱: {result}")
-        print(f"📂 完整路徑: {os.path.abspath(os.path.join('static', result))}")
+        print(f"📂 完整路徑: {os.path.abspath(artifacts.path(result))}")
         
         # 檢查檔案是否存在
-        file_path = os.path.join("static", result)
+        file_path = artifacts.path(result)
         if os.path.exists(file_path):
             file_size = os.path.getsize(file_path)
             print(f"📏 檔案大小: {file_size:,} bytes ({file_size/1024:.2f} KB)")
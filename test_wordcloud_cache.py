@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試詞雲分詞與快取：分詞結果切回繁體字，詞雲圖片以詞頻表與字體為鍵快取
+"""
+
+import os
+import sys
+import tempfile
+import types
+
+import matplotlib
+
+sys.path.insert(0, ".")
+
+import app
+from app import ArtifactManager, compute_word_frequencies, generate_word_cloud, segment_text
+
+print("=" * 60)
+print("🧪 詞雲分詞與快取測試")
+print("=" * 60)
+
+print("\n📝 分詞結果切回繁體字：")
+print("-" * 60)
+words = segment_text("台積電宣布在台南設立新廠")
+print(words)
+assert "".join(words) == "台積電宣布在台南設立新廠"
+assert "宣布" in words and "設立" in words
+
+# 模擬會略過空白的分詞器：詞串接後與原字串不同，仍要依位置切回繁體字
+original_jieba, original_available = app.jieba, app.JIEBA_AVAILABLE
+app.jieba = types.SimpleNamespace(lcut=lambda text: text.split())
+app.JIEBA_AVAILABLE = True
+try:
+    words = segment_text("這個 問題 還是 沒有 解決")
+    print(f"略過空白的分詞器: {words}")
+    assert words == ["這個", "問題", "還是", "沒有", "解決"]
+    frequencies = compute_word_frequencies(["這個 問題", "這個 價格"])
+    assert frequencies == {"這個": 2, "問題": 1, "價格": 1}
+finally:
+    app.jieba, app.JIEBA_AVAILABLE = original_jieba, original_available
+print("✅ 不會回傳簡體字，繁體的停用詞與詞頻都以原本的字比對")
+
+if not app.WORDCLOUD_AVAILABLE:
+    print("⚠️ 未安裝 wordcloud，略過快取測試")
+    sys.exit(0)
+
+titles = [
+    "台積電宣布在台南設立新廠",
+    "半導體需求強勁，台積電擴大投資",
+    "台南科學園區 新廠動工",
+]
+renders = []
+original_render, original_artifacts, original_font = (
+    app.render_word_cloud,
+    app.artifacts,
+    app.WORDCLOUD_FONT_PATH,
+)
+
+
+def counting_render(frequencies, name, manager=None):
+    renders.append(name)
+    return original_render(frequencies, name, manager)
+
+
+app.render_word_cloud = counting_render
+
+with tempfile.TemporaryDirectory() as tmp:
+    app.artifacts = ArtifactManager(tmp, 10**8, 3600, 3600)
+
+    print("\n📝 第一次產生（未命中）：")
+    print("-" * 60)
+    name = generate_word_cloud(titles)
+    print(f"檔名: {name}，排版 {len(renders)} 次")
+    assert name and app.artifacts.exists(name) and renders == [name]
+
+    print("\n📝 相同的詞頻表（命中）：")
+    print("-" * 60)
+    assert generate_word_cloud(titles) == name
+    # 標題順序不同但詞頻表相同，鍵也相同
+    assert generate_word_cloud(list(reversed(titles))) == name
+    print(f"排版 {len(renders)} 次")
+    assert renders == [name]
+    print("✅ 直接沿用已產生的圖片，不重新排版")
+
+    print("\n📝 鍵改變時重新產生：")
+    print("-" * 60)
+    other = generate_word_cloud(titles + ["電動車市場蓬勃發展"])
+    print(f"詞頻表不同: {other}")
+    assert other != name and renders == [name, other]
+    app.WORDCLOUD_FONT_PATH = os.path.join(matplotlib.get_data_path(), "fonts", "ttf", "DejaVuSans.ttf")
+    with_font = generate_word_cloud(titles)
+    print(f"字體不同: {with_font}")
+    assert with_font not in (name, other) and len(renders) == 3
+    app.WORDCLOUD_FONT_PATH = original_font
+    print("✅ 詞頻表或字體改變時使用新的檔名")
+
+    print("\n📝 圖片被淘汰後重新產生：")
+    print("-" * 60)
+    os.remove(app.artifacts.path(name))
+    assert generate_word_cloud(titles) == name and app.artifacts.exists(name)
+    print(f"排版 {len(renders)} 次")
+    assert renders[-1] == name and len(renders) == 4
+    print("✅ 檔案不存在時以相同檔名重新產生")
+
+app.render_word_cloud, app.artifacts = original_render, original_artifacts
+
+print("\n✅ 測試完成！")
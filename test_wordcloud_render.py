@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+測試詞雲延遲渲染：第一次請求回應 202，渲染行程完成後回傳圖片；逾時與沒有詞彙的情況，
+以及多個 worker 同時請求時只渲染一次、合計的行程數不超過上限，渲染行程由共用的渲染伺服器建立
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, ".")
+
+import app
+from app import ArtifactManager, ResultSetStore, WordCloudRenderer
+
+
+def wait_for(client, url, limit=60):
+    """輪詢直到不再回應 202，回傳最後的回應與輪詢次數"""
+    for attempt in range(limit * 10):
+        response = client.get(url)
+        if response.status_code != 202:
+            return response, attempt
+        time.sleep(0.1)
+    raise AssertionError(f"{url} 在 {limit} 秒內沒有完成")
+
+
+def wait_rendered(renderer, expected, limit=30):
+    """圖片寫入後渲染行程才結束，監控執行緒最多再過 0.1 秒才記錄"""
+    for _ in range(limit * 10):
+        if renderer.stats()["rendered"] == expected:
+            return
+        time.sleep(0.1)
+    raise AssertionError(f"{limit} 秒內沒有完成 {expected} 次渲染: {renderer.stats()}")
+
+
+def main():
+    print("=" * 60)
+    print("🧪 詞雲延遲渲染測試")
+    print("=" * 60)
+
+    if not app.WORDCLOUD_AVAILABLE:
+        print("⚠️ 未安裝 wordcloud，略過測試")
+        return
+
+    original = (app.artifacts, app.result_sets, app.wordcloud_renderer)
+    with tempfile.TemporaryDirectory() as tmp:
+        app.artifacts = ArtifactManager(os.path.join(tmp, "artifacts"), 10**8, 3600, 3600)
+        app.result_sets = ResultSetStore(os.path.join(tmp, "results"), 3600)
+        app.wordcloud_renderer = WordCloudRenderer(os.path.join(tmp, "locks"), 2, 30, 60)
+        client = app.app.test_client()
+
+        rows = [{"標題": f"台積電 擴大投資 先進製程 第{i}座晶圓廠"} for i in range(30)]
+        result_id = app.result_sets.save(rows)
+        url = f"/wordcloud/{result_id}"
+
+        print("\n📝 第一次請求立即回應 202：")
+        print("-" * 60)
+        started = time.perf_counter()
+        response = client.get(url)
+        elapsed = time.perf_counter() - started
+        print(f"狀態: {response.status_code}，{response.mimetype}，耗時 {elapsed * 1000:.1f} ms")
+        assert response.status_code == 202
+        assert response.mimetype == "image/svg+xml" and response.headers["Retry-After"] == "1"
+        print("✅ 回應佔位圖，不等待渲染")
+
+        print("\n📝 渲染完成後回傳圖片：")
+        print("-" * 60)
+        response, attempts = wait_for(client, url)
+        print(f"狀態: {response.status_code}，{response.mimetype}，輪詢 {attempts} 次")
+        assert response.status_code == 200 and response.mimetype == "image/png"
+        assert response.data.startswith(b"\x89PNG")
+        assert app.artifacts.exists(WordCloudRenderer.artifact_name(result_id))
+        wait_rendered(app.wordcloud_renderer, 1)
+        print("✅ 圖片由渲染行程寫入產出檔")
+
+        print("\n📝 沒有可用詞彙：")
+        print("-" * 60)
+        empty_id = app.result_sets.save([{"標題": "的 了 是"}])
+        response, _ = wait_for(client, f"/wordcloud/{empty_id}")
+        print(f"狀態: {response.status_code}")
+        assert response.status_code == 204
+        print("✅ 回應 204")
+
+        print("\n📝 多個 worker 同時請求：")
+        print("-" * 60)
+        # 兩個渲染器共用鎖檔目錄與渲染伺服器，模擬兩個 gunicorn worker；名額只有 1 個
+        shared = os.path.join(tmp, "shared")
+        address = WordCloudRenderer(shared, 1, 30, 60).start_server()
+        first = WordCloudRenderer(shared, max_workers=1, timeout=30, failure_ttl=60)
+        second = WordCloudRenderer(shared, max_workers=1, timeout=30, failure_ttl=60)
+        first.server_address = second.server_address = address
+        same_id = app.result_sets.save(rows + [{"標題": "聯發科 發表新晶片"}])
+        other_id = app.result_sets.save(rows + [{"標題": "鴻海 電動車"}])
+        assert first.request(same_id, [row["標題"] for row in rows]) == "rendering"
+        assert second.request(same_id, [row["標題"] for row in rows]) == "queued"
+        assert second.request(other_id, [row["標題"] for row in rows]) == "queued"
+        print(f"第一個 worker {first.stats()}，第二個 worker {second.stats()}")
+        assert first.stats()["rendering"] == 1 and second.stats()["rendering"] == 0
+        process = first._running[same_id][0]
+        assert isinstance(process, app._RemoteRender) and process.pid != os.getpid()
+        wait_rendered(first, 1)
+        assert second.request(same_id, []) == "ready"
+        # 名額釋放後，第二個 worker 排隊中的結果集才開始渲染
+        wait_rendered(second, 1)
+        assert app.artifacts.exists(WordCloudRenderer.artifact_name(other_id))
+        assert first.stats()["rendered"] == 1
+        print("✅ 同一個結果集只由一個 worker 渲染，所有 worker 合計不超過名額")
+
+        print("\n📝 渲染行程不啟動清除執行緒：")
+        print("-" * 60)
+        manager = ArtifactManager(os.path.join(tmp, "child"), 10**8, 3600, sweep_interval=None)
+        manager.write_bytes("wordcloud", b"PNG", "png")
+        assert manager._sweeper is None
+        print("✅ sweep_interval=None 時寫入檔案也不啟動")
+
+        print("\n📝 渲染逾時：")
+        print("-" * 60)
+        app.wordcloud_renderer = WordCloudRenderer(shared, max_workers=1, timeout=0.01, failure_ttl=60)
+        app.wordcloud_renderer.server_address = address
+        slow_id = app.result_sets.save(rows + [{"標題": "逾時測試"}])
+        response, _ = wait_for(client, f"/wordcloud/{slow_id}")
+        print(f"狀態: {response.status_code}，{app.wordcloud_renderer.stats()}")
+        assert response.status_code == 503 and app.wordcloud_renderer.stats()["timed_out"] == 1
+        # 其他 worker 讀到失敗標記，failure_ttl 內不再重試
+        assert second.request(slow_id, []) == "failed" and second.stats()["rendering"] == 0
+        print("✅ 逾時的渲染行程被終止，回應 503，其他 worker 也不再重試")
+
+        print("\n📝 找不到結果集：")
+        print("-" * 60)
+        assert client.get("/wordcloud/0123456789abcdef0123").status_code == 404
+        print("✅ 回應 404")
+
+    app.artifacts, app.result_sets, app.wordcloud_renderer = original
+    print("\n✅ 測試完成！")
+
+
+# 渲染行程由 forkserver 建立，會以 __mp_main__ 的名稱重新載入主模組，此時不執行測試
+if __name__ != "__mp_main__":
+    main()
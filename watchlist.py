@@ -0,0 +1,468 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+關鍵字監控排程器：定期輪詢 watchlist 中的關鍵字，只把新出現的新聞送進情感分析與統計
+
+用法：
+    python watchlist.py [watchlist.json] [--once]
+
+- 每個關鍵字有自己的輪詢間隔，並加上隨機抖動，避免所有關鍵字同時打到 Google News
+- 以 SQLite 記住每個監控（關鍵字、版本與邏輯）看過的 GUID 與最後一則新聞的發布時間，只處理新項目
+- feed 沒有新項目時逐次拉長間隔（上限 max_interval），有新項目時立即恢復
+- 新項目寫入 JSONL 檔或以 POST 送到 webhook
+"""
+
+import heapq
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+import app
+from app import ResultAggregator, analyze_news_sentiment, fetch_rss_news
+
+# 🔧 監控設定
+WATCHLIST_CONFIG = os.environ.get("WATCHLIST_CONFIG", "watchlist.json")
+WATCHLIST_STATE_PATH = os.environ.get(
+    "WATCHLIST_STATE_PATH", os.path.join("cache", "watchlist.sqlite3")
+)
+WATCHLIST_WORKERS = int(os.environ.get("WATCHLIST_WORKERS", "2"))
+WATCHLIST_SEEN_WINDOW = float(os.environ.get("WATCHLIST_SEEN_WINDOW", str(3 * 86400)))  # 秒
+# 比文章庫補抓間隔更短的輪詢只會讀到同一份資料，因此以它作為間隔下限
+WATCHLIST_MIN_INTERVAL = max(60.0, app.ARTICLE_STORE_REFRESH)
+
+WATCH_DEFAULTS = {
+    "interval": 900,  # 基本輪詢間隔（秒）
+    "max_interval": 4 * 3600,  # 退避後的最長間隔（秒）
+    "backoff": 1.5,  # 沒有新項目時間隔乘上的倍數
+    "jitter": 0.1,  # 間隔上下浮動的比例
+    "logic": "AND",
+    "backfill_hours": 0,  # 第一次輪詢時，把多少小時內的新聞當作新項目
+    "editions": (),  # 要搜尋的 Google News 版本代碼，空的表示 app.DEFAULT_EDITIONS
+}
+
+
+@dataclass
+class Watch:
+    keyword: str
+    interval: float = WATCH_DEFAULTS["interval"]
+    max_interval: float = WATCH_DEFAULTS["max_interval"]
+    backoff: float = WATCH_DEFAULTS["backoff"]
+    jitter: float = WATCH_DEFAULTS["jitter"]
+    logic: str = WATCH_DEFAULTS["logic"]
+    backfill_hours: float = WATCH_DEFAULTS["backfill_hours"]
+    editions: tuple = WATCH_DEFAULTS["editions"]
+
+
+@dataclass
+class WatchState:
+    last_published_ts: int | None = None
+    interval: float | None = None
+    quiet_polls: int = 0
+    polled_at: float | None = None
+    seen: set = field(default_factory=set)
+
+
+def watch_key(watch):
+    """
+    監控的識別碼：關鍵字、排序後的版本與邏輯
+    同一個關鍵字搭配不同版本或邏輯是不同的 feed，各自保存退避狀態與看過的 GUID
+    """
+    editions = sorted(watch.editions or app.DEFAULT_EDITIONS)
+    return json.dumps([watch.keyword, editions, watch.logic.upper()], ensure_ascii=False)
+
+
+def article_guid(article):
+    """文章的識別碼：feed 的 GUID，沒有時以正規化連結代替"""
+    return article.guid or app.normalize_link(article.link)
+
+
+class WatchStateStore:
+    """
+    以 SQLite 保存每個監控的狀態（以 watch_key() 為鍵）
+    - watch_state：最後一則新聞的發布時間、目前的輪詢間隔與連續沒有新項目的次數
+    - watch_seen：看過的 GUID，超過 WATCHLIST_SEEN_WINDOW 的舊紀錄會被清掉
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS watch_state (
+            watch_key TEXT PRIMARY KEY,
+            last_published_ts INTEGER,
+            interval REAL,
+            quiet_polls INTEGER NOT NULL DEFAULT 0,
+            polled_at REAL
+        );
+        CREATE TABLE IF NOT EXISTS watch_seen (
+            watch_key TEXT NOT NULL,
+            guid TEXT NOT NULL,
+            published_ts INTEGER NOT NULL,
+            PRIMARY KEY (watch_key, guid)
+        );
+        CREATE INDEX IF NOT EXISTS idx_watch_seen_published ON watch_seen (watch_key, published_ts);
+    """
+
+    def __init__(self, path, seen_window=WATCHLIST_SEEN_WINDOW):
+        self.path = path
+        self.seen_window = seen_window
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            with self._lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                self._migrate_keyword_rows(conn)
+                conn.executescript(self.SCHEMA)
+                self._initialized = True
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @classmethod
+    def _migrate_keyword_rows(cls, conn):
+        """舊版只以關鍵字為鍵，改掛到該關鍵字預設版本與 AND 邏輯的監控"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(watch_state)")}
+        if "keyword" not in columns:
+            return
+        conn.create_function("legacy_watch_key", 1, lambda keyword: watch_key(Watch(keyword)))
+        conn.executescript(
+            f"""
+            BEGIN;
+            ALTER TABLE watch_state RENAME TO watch_state_legacy;
+            ALTER TABLE watch_seen RENAME TO watch_seen_legacy;
+            DROP INDEX IF EXISTS idx_watch_seen_published;
+            {cls.SCHEMA}
+            INSERT INTO watch_state
+                SELECT legacy_watch_key(keyword), last_published_ts, interval, quiet_polls, polled_at
+                FROM watch_state_legacy;
+            INSERT INTO watch_seen
+                SELECT legacy_watch_key(keyword), guid, published_ts FROM watch_seen_legacy;
+            DROP TABLE watch_state_legacy;
+            DROP TABLE watch_seen_legacy;
+            COMMIT;
+            """
+        )
+
+    def load(self, watch):
+        key = watch_key(watch)
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT last_published_ts, interval, quiet_polls, polled_at"
+                " FROM watch_state WHERE watch_key = ?",
+                (key,),
+            ).fetchone()
+            seen = {
+                guid
+                for (guid,) in conn.execute(
+                    "SELECT guid FROM watch_seen WHERE watch_key = ?", (key,)
+                )
+            }
+        finally:
+            conn.close()
+        if row is None:
+            return WatchState(seen=seen)
+        return WatchState(*row, seen=seen)
+
+    def save(self, watch, state, articles):
+        """寫回監控狀態，記錄這次看到的所有 GUID 並清掉過舊的紀錄"""
+        key = watch_key(watch)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO watch_state"
+                    " (watch_key, last_published_ts, interval, quiet_polls, polled_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        state.last_published_ts,
+                        state.interval,
+                        state.quiet_polls,
+                        state.polled_at,
+                    ),
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO watch_seen (watch_key, guid, published_ts) VALUES (?, ?, ?)",
+                    [(key, article_guid(a), a.published_ts) for a in articles],
+                )
+                if state.last_published_ts is not None:
+                    conn.execute(
+                        "DELETE FROM watch_seen WHERE watch_key = ? AND published_ts < ?",
+                        (key, state.last_published_ts - self.seen_window),
+                    )
+        finally:
+            conn.close()
+
+
+class JsonlSink:
+    """將新項目逐行附加到 JSONL 檔"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, watch, articles, facets):
+        detected_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        lines = [
+            json.dumps(
+                {
+                    "watch": watch.keyword,
+                    "detected_at": detected_at,
+                    "guid": article_guid(article),
+                    **article.to_dict(),
+                },
+                ensure_ascii=False,
+            )
+            for article in articles
+        ]
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+
+class WebhookSink:
+    """將每次輪詢的新項目與統計以一個 JSON POST 送到 webhook（失敗只記錄，不重試）"""
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def emit(self, watch, articles, facets):
+        body = json.dumps(
+            {
+                "watch": watch.keyword,
+                "detected_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "count": len(articles),
+                "facets": facets,
+                "articles": [
+                    {"guid": article_guid(article), **article.to_dict()} for article in articles
+                ],
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+        try:
+            response = app._http.request(
+                "POST",
+                self.url,
+                body=body,
+                headers={**app._http.headers, "Content-Type": "application/json; charset=utf-8"},
+                timeout=self.timeout,
+                retries=False,
+            )
+            if response.status >= 400:
+                print(f"⚠️ webhook 回應 HTTP {response.status}: {self.url}")
+        except Exception as e:
+            print(f"⚠️ 送出 webhook 失敗: {e}")
+
+
+def make_sink(config):
+    """依設定建立輸出目的地：{"type": "jsonl", "path": ...} 或 {"type": "webhook", "url": ...}"""
+    kind = config.get("type", "jsonl")
+    if kind == "jsonl":
+        return JsonlSink(config.get("path", os.path.join("cache", "watchlist", "articles.jsonl")))
+    if kind == "webhook":
+        return WebhookSink(config["url"], config.get("timeout", 10))
+    raise ValueError(f"未知的輸出類型: {kind}")
+
+
+def load_watchlist(path):
+    """
+    讀取 watchlist 設定檔
+    :return: (Watch 列表, 輸出目的地設定)
+    """
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    defaults = {**WATCH_DEFAULTS, **config.get("defaults", {})}
+    watches = []
+    for item in config.get("watches", []):
+        if isinstance(item, str):
+            item = {"keyword": item}
+        watch = Watch(**{**defaults, **item})
+        watch.logic = watch.logic.upper()
+        watch.editions, error = app.parse_editions(watch.editions)
+        if error:
+            raise ValueError(f"「{watch.keyword}」: {error}")
+        if watch.interval < WATCHLIST_MIN_INTERVAL:
+            print(
+                f"⚠️ 「{watch.keyword}」的輪詢間隔 {watch.interval:g} 秒過短，"
+                f"改為 {WATCHLIST_MIN_INTERVAL:g} 秒"
+            )
+            watch.interval = WATCHLIST_MIN_INTERVAL
+        watch.max_interval = max(watch.max_interval, watch.interval)
+        watches.append(watch)
+    return watches, config.get("sink", {})
+
+
+def poll_watch(watch, store, sink, now=None):
+    """
+    輪詢單一關鍵字一次，只把沒看過的新聞送進情感分析、統計與輸出
+    第一次輪詢只建立基準（backfill_hours 內的新聞除外），避免把整個 feed 當成新項目
+    :return: (新項目列表, 更新後的 WatchState)
+    """
+    now = time.time() if now is None else now
+    state = store.load(watch)
+    first_poll = state.last_published_ts is None
+
+    if first_poll:
+        since = now - store.seen_window
+        emit_since = now - watch.backfill_hours * 3600
+    else:
+        since = emit_since = state.last_published_ts - store.seen_window
+
+    start_date = datetime.fromtimestamp(since, timezone.utc).date()
+    end_date = datetime.fromtimestamp(now, timezone.utc).date() + timedelta(days=1)
+    articles = fetch_rss_news(
+        watch.keyword, start_date, end_date, watch.logic, watch.editions or app.DEFAULT_EDITIONS
+    )
+
+    new_articles = [
+        article
+        for article in articles
+        if article.published_ts >= emit_since and article_guid(article) not in state.seen
+    ]
+
+    if articles:
+        latest = max(article.published_ts for article in articles)
+        state.last_published_ts = max(state.last_published_ts or latest, latest)
+    elif first_poll:
+        state.last_published_ts = int(now)
+
+    # 🔧 自適應退避：沒有新項目就拉長間隔，有新項目立刻恢復基本間隔
+    if new_articles:
+        state.interval = watch.interval
+        state.quiet_polls = 0
+    else:
+        state.interval = min((state.interval or watch.interval) * watch.backoff, watch.max_interval)
+        state.quiet_polls += 1
+    state.polled_at = now
+
+    if new_articles:
+        new_articles.sort(key=lambda article: article.published_ts)
+        analyze_news_sentiment(new_articles)
+        aggregator = ResultAggregator()
+        aggregator.add(new_articles)
+        sink.emit(watch, new_articles, aggregator.facets())
+        print(f"🆕 「{watch.keyword}」有 {len(new_articles)} 則新聞")
+    else:
+        print(
+            f"💤 「{watch.keyword}」沒有新聞（連續 {state.quiet_polls} 次），"
+            f"{state.interval:.0f} 秒後再輪詢"
+        )
+
+    store.save(watch, state, articles)
+    return new_articles, state
+
+
+def next_delay(interval, jitter):
+    """在間隔上加上 ±jitter 比例的隨機抖動"""
+    return max(1.0, interval * (1 + random.uniform(-jitter, jitter)))
+
+
+class WatchlistScheduler:
+    """
+    以最小堆積安排每個關鍵字的下一次輪詢時間，到期的關鍵字交給小型執行緒池輪詢
+    同一個關鍵字在上一次輪詢完成前不會再次排入
+    """
+
+    def __init__(self, watches, store, sink, workers=WATCHLIST_WORKERS):
+        self.watches = watches
+        self.store = store
+        self.sink = sink
+        self.workers = workers
+        self._heap = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    def _schedule(self, index, when):
+        with self._lock:
+            heapq.heappush(self._heap, (when, index))
+        self._wakeup.set()
+
+    def _poll(self, index):
+        watch = self.watches[index]
+        interval = watch.interval
+        try:
+            _, state = poll_watch(watch, self.store, self.sink)
+            interval = state.interval
+        except Exception as e:
+            print(f"❌ 輪詢「{watch.keyword}」失敗: {e}")
+            traceback.print_exc()
+        finally:
+            if not self._stopped.is_set():
+                self._schedule(index, time.time() + next_delay(interval, watch.jitter))
+
+    def run_once(self):
+        """所有關鍵字各輪詢一次（依序執行）"""
+        for watch in self.watches:
+            try:
+                poll_watch(watch, self.store, self.sink)
+            except Exception as e:
+                print(f"❌ 輪詢「{watch.keyword}」失敗: {e}")
+                traceback.print_exc()
+
+    def run(self):
+        """持續輪詢直到 stop() 被呼叫；啟動時在第一個間隔的抖動範圍內錯開各關鍵字"""
+        now = time.time()
+        for index, watch in enumerate(self.watches):
+            state = self.store.load(watch)
+            if state.polled_at is None:
+                when = now + random.uniform(0, watch.interval * watch.jitter)
+            else:
+                when = state.polled_at + next_delay(state.interval or watch.interval, watch.jitter)
+            self._schedule(index, when)
+
+        print(f"👀 開始監控 {len(self.watches)} 個關鍵字")
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="watch") as executor:
+            try:
+                while not self._stopped.is_set():
+                    self._wakeup.clear()
+                    with self._lock:
+                        due = []
+                        while self._heap and self._heap[0][0] <= time.time():
+                            due.append(heapq.heappop(self._heap)[1])
+                        timeout = self._heap[0][0] - time.time() if self._heap else None
+                    for index in due:
+                        executor.submit(self._poll, index)
+                    self._wakeup.wait(timeout)
+            finally:
+                # 中斷時不再排入下一次輪詢，等進行中的輪詢結束後離開
+                self.stop()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+
+def main(argv):
+    args = [arg for arg in argv if not arg.startswith("--")]
+    path = args[0] if args else WATCHLIST_CONFIG
+    watches, sink_config = load_watchlist(path)
+    if not watches:
+        print(f"⚠️ {path} 中沒有任何監控關鍵字")
+        return 1
+
+    scheduler = WatchlistScheduler(watches, WatchStateStore(WATCHLIST_STATE_PATH), make_sink(sink_config))
+    if "--once" in argv:
+        scheduler.run_once()
+        return 0
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        print("\n👋 停止監控")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))